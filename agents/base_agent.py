@@ -1,6 +1,8 @@
 # -*- coding: utf-8 -*-
-from langchain.agents import create_tool_calling_agent, AgentExecutor
-from langchain_core.prompts import ChatPromptTemplate
+import threading
+from typing import List, Optional, Tuple
+from utils.startup_profile import timed
+from utils.tracing import get_tracing_handler
 
 class BaseAgent:
     """Agent 基类"""
@@ -22,11 +24,25 @@ class BaseAgent:
 
 请根据用户的问题，使用合适的工具获取数据并进行分析。"""
         
-        # 创建 agent
-        self.agent_executor = self._create_agent()
+        # agent 在第一次运行时才创建（子类在 super().__init__ 之后设置的提示词也能生效）
+        self._agent_executor = None
+        self._executor_lock = threading.Lock()
+    
+    @property
+    def agent_executor(self):
+        """第一次访问时创建 agent executor"""
+        if self._agent_executor is None:
+            with self._executor_lock:
+                if self._agent_executor is None:
+                    self._agent_executor = self._create_agent()
+        return self._agent_executor
     
     def _create_agent(self):
         """创建 agent"""
+        with timed("import", "langchain.agents"):
+            from langchain.agents import create_tool_calling_agent, AgentExecutor
+            from langchain_core.prompts import ChatPromptTemplate
+        
         # 创建 prompt
         prompt = ChatPromptTemplate.from_messages([
             ("system", self.system_prompt),
@@ -53,13 +69,22 @@ class BaseAgent:
         
         return agent_executor
     
-    def run(self, question: str) -> str:
-        """运行 agent"""
+    def run(self, question: str, chat_history: Optional[List[Tuple[str, str]]] = None) -> str:
+        """
+        运行 agent
+        
+        Args:
+            chat_history: 之前的对话（ConversationMemory.messages()，长度有上限）
+        """
         try:
-            result = self.agent_executor.invoke({
-                "input": question,
-                "chat_history": []
-            })
+            # 追踪回调会传递给 LLM 和工具调用
+            result = self.agent_executor.invoke(
+                {
+                    "input": question,
+                    "chat_history": chat_history or []
+                },
+                config={"callbacks": [get_tracing_handler()]}
+            )
             return result.get("output", "抱歉，无法生成回答。")
         except Exception as e:
             error_msg = str(e)
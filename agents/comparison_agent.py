@@ -18,7 +18,7 @@ class ComparisonAgent(BaseAgent):
 
 你的职责：
 1. 使用 compare_stocks 工具对比多只股票
-2. 横向比较各项关键指标
+2. 横向比较各项关键指标，参考工具给出的综合排名、组内百分位和行业分位
 3. 识别各股票的优势和劣势
 4. 基于对比结果给出投资建议
 5. 为不同风险偏好的投资者推荐合适的标的
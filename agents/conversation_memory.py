@@ -0,0 +1,177 @@
+# -*- coding: utf-8 -*-
+"""
+多轮对话记忆
+
+最近 K 轮对话原样保留（回答去掉装饰后截断到每轮的 token 上限），更早的轮次折叠进
+滚动摘要：每轮只保留涉及的股票、分析类型、问题和回答里的结论句，摘要超出预算时丢弃最早的条目。
+传给 Agent 的历史长度因此有上限，对话再长提示词也不会增长。
+
+用法：
+    memory = ConversationMemory()
+    agent.run(question, memory.messages())
+    memory.add_turn(question, answer, tickers=['AAPL'], agent_type='fundamental')
+"""
+
+import re
+import threading
+from collections import OrderedDict, deque
+from dataclasses import dataclass, field
+from typing import Deque, List, Optional, Tuple
+
+from judge.prompt_compactor import strip_decoration
+from utils.token_estimate import estimate_tokens, truncate_to_tokens
+
+# 原样保留的轮数
+MAX_TURNS = 3
+# 每轮回答进入历史的 token 上限
+TURN_TOKEN_BUDGET = 300
+# 滚动摘要的 token 上限
+SUMMARY_TOKEN_BUDGET = 300
+
+AGENT_NAMES = {
+    'fundamental': '基本面',
+    'technical': '技术面',
+    'sentiment': '市场情绪',
+    'comparison': '对比',
+    'screener': '选股'
+}
+
+# 指代前文的说法（"它的RSI呢"、"刚才说的支撑位"、"MSFT呢"）
+_FOLLOW_UP_RE = re.compile(
+    r"它|他们|她|这只|那只|这家|那家|这个|那个|这些|那些|上面|上述|刚才|刚刚|之前|前面|上一|上次|"
+    r"继续|再详细|展开说|呢[？?。!！\s]*$|\b(?:it|its|they|them|that|those|above|previous|earlier)\b",
+    re.IGNORECASE
+)
+# 回答中优先作为结论的句子
+_CONCLUSION_RE = re.compile(r"结论|建议|评级|买入|卖出|持有|总结|总体|综合")
+_SENTENCE_RE = re.compile(r"[^。！？!?\n]+[。！？!?]?")
+
+
+@dataclass
+class Turn:
+    """一轮问答"""
+    question: str
+    answer: str
+    tickers: List[str] = field(default_factory=list)
+    agent_type: Optional[str] = None
+
+
+def _conclusion(answer: str, max_chars: int = 80) -> str:
+    """回答里的结论句（没有明显结论时取第一句）"""
+    sentences = [s.strip() for s in _SENTENCE_RE.findall(strip_decoration(answer)) if s.strip()]
+    if not sentences:
+        return ""
+    chosen = next((s for s in sentences if _CONCLUSION_RE.search(s)), sentences[0])
+    return chosen[:max_chars]
+
+
+def refers_to_history(question: str) -> bool:
+    """问题是否指代前文（追问），此时要结合对话历史回答"""
+    return bool(_FOLLOW_UP_RE.search(question))
+
+
+class ConversationMemory:
+    """有上限的对话记忆（最近 K 轮 + 滚动摘要）"""
+
+    def __init__(
+        self,
+        max_turns: int = MAX_TURNS,
+        turn_token_budget: int = TURN_TOKEN_BUDGET,
+        summary_token_budget: int = SUMMARY_TOKEN_BUDGET
+    ):
+        self.max_turns = max_turns
+        self.turn_token_budget = turn_token_budget
+        self.summary_token_budget = summary_token_budget
+        self._turns: Deque[Turn] = deque()
+        self._summary: Deque[str] = deque()
+        self._lock = threading.Lock()
+
+    def add_turn(
+        self,
+        question: str,
+        answer: str,
+        tickers: Optional[List[str]] = None,
+        agent_type: Optional[str] = None
+    ) -> None:
+        """记录一轮问答（超出 K 轮的最早一轮折叠进摘要）"""
+        question = truncate_to_tokens(question, self.turn_token_budget)
+        answer = truncate_to_tokens(strip_decoration(answer), self.turn_token_budget)
+        with self._lock:
+            self._turns.append(Turn(question, answer, list(tickers or []), agent_type))
+            while len(self._turns) > self.max_turns:
+                self._fold(self._turns.popleft())
+
+    def _fold(self, turn: Turn) -> None:
+        """把一轮对话压缩成一行摘要（调用方持有锁）"""
+        tags = [tag for tag in (",".join(turn.tickers), AGENT_NAMES.get(turn.agent_type)) if tag]
+        prefix = f"[{' '.join(tags)}] " if tags else ""
+        line = f"{prefix}问：{turn.question[:60]}"
+        conclusion = _conclusion(turn.answer)
+        if conclusion:
+            line += f"；答：{conclusion}"
+        self._summary.append(line)
+        while len(self._summary) > 1 and estimate_tokens("\n".join(self._summary)) > self.summary_token_budget:
+            self._summary.popleft()
+
+    @property
+    def summary(self) -> str:
+        return "\n".join(self._summary)
+
+    def messages(self) -> List[Tuple[str, str]]:
+        """
+        传给 Agent chat_history 的消息
+
+        Returns:
+            [("system", 摘要), ("human", 问题), ("ai", 回答), ...]，没有历史时为空列表
+        """
+        with self._lock:
+            history = []
+            if self._summary:
+                history.append(("system", "此前对话摘要：\n" + "\n".join(self._summary)))
+            for turn in self._turns:
+                history.append(("human", turn.question))
+                history.append(("ai", turn.answer))
+            return history
+
+    def last_tickers(self) -> List[str]:
+        """最近一轮涉及的股票（追问没有提到股票时沿用）"""
+        with self._lock:
+            for turn in reversed(self._turns):
+                if turn.tickers:
+                    return list(turn.tickers)
+        return []
+
+    def token_count(self) -> int:
+        """当前历史的估算 token 数"""
+        return sum(estimate_tokens(content) for _, content in self.messages())
+
+    def clear(self) -> None:
+        with self._lock:
+            self._turns.clear()
+            self._summary.clear()
+
+    def __len__(self) -> int:
+        return len(self._turns)
+
+
+class MemoryStore:
+    """按会话ID保存对话记忆（最多 max_sessions 个，超出时淘汰最久未使用的会话）"""
+
+    def __init__(self, max_sessions: int = 1000):
+        self.max_sessions = max_sessions
+        self._memories: "OrderedDict[str, ConversationMemory]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, session_id: str) -> ConversationMemory:
+        with self._lock:
+            memory = self._memories.get(session_id)
+            if memory is None:
+                memory = self._memories[session_id] = ConversationMemory()
+            self._memories.move_to_end(session_id)
+            while len(self._memories) > self.max_sessions:
+                self._memories.popitem(last=False)
+            return memory
+
+    def drop(self, session_id: str) -> None:
+        with self._lock:
+            self._memories.pop(session_id, None)
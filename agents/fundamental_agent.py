@@ -1,5 +1,6 @@
 # -*- coding: utf-8 -*-
 from agents.base_agent import BaseAgent
+from tools.fundamentals_history_tool import FundamentalsHistoryTool
 from tools.stock_data_tool import StockDataTool
 
 class FundamentalAgent(BaseAgent):
@@ -8,7 +9,8 @@ class FundamentalAgent(BaseAgent):
     def __init__(self, llm):
         # 创建工具
         stock_data_tool = StockDataTool()
-        tools = [stock_data_tool.as_tool()]
+        history_tool = FundamentalsHistoryTool()
+        tools = [stock_data_tool.as_tool(), history_tool.as_tool()]
         
         # 初始化基类
         super().__init__(llm, tools, agent_type="fundamental")
@@ -17,7 +19,8 @@ class FundamentalAgent(BaseAgent):
         self.system_prompt = """你是一个专业的股票基本面分析师。
 
 你的职责：
-1. 使用 stock_data 工具获取股票的基本面数据
+1. 使用 stock_data 工具获取股票的基本面数据；问到指标变化趋势或估值高低时，
+   使用 fundamentals_history 工具查看历史快照和当前值所处的历史分位
 2. 分析公司的财务健康状况、盈利能力和估值水平
 3. 评估公司的行业地位和竞争优势
 4. 基于基本面给出投资建议
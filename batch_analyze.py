@@ -0,0 +1,243 @@
+# -*- coding: utf-8 -*-
+"""
+批量离线分析命令行工具
+
+从文件或标准输入读取问题，使用线程池并行执行
+路由 → Agent → Judge → 评分 → 策略，每个问题输出一行 JSONL 记录。
+中断后重新运行会跳过输出文件中已成功完成的问题。
+
+用法：
+    python batch_analyze.py questions.txt -o results.jsonl --workers 4
+    cat questions.txt | python batch_analyze.py - -o results.jsonl
+    python batch_analyze.py --tickers AAPL,MSFT,NVDA --template "{ticker}的基本面怎么样？" -o out.jsonl
+
+    # 录制一次真实响应，之后离线回放（可模拟真实延迟和错误）
+    python batch_analyze.py questions.txt -o out.jsonl --cassette run.json.gz --cassette-mode record
+    python batch_analyze.py questions.txt -o out.jsonl --cassette run.json.gz --latency-scale 1 --error-rate 0.05
+
+输入格式（每行一个）：
+    - 纯文本问题
+    - JSON 对象：{"id": "可选", "question": "..."}
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import datetime
+from typing import Dict, Iterable, List, Set
+
+from dotenv import load_dotenv
+
+from pipeline.analysis_pipeline import AnalysisPipeline, build_components
+from utils.cassette import Cassette
+from utils.startup_profile import format_report
+
+
+def _question_id(question: str) -> str:
+    """根据问题文本生成稳定的ID（用于断点续跑）"""
+    return hashlib.sha1(question.strip().encode('utf-8')).hexdigest()[:12]
+
+
+def parse_questions(lines: Iterable[str]) -> List[Dict]:
+    """
+    解析输入行
+
+    Returns:
+        [{'id': str, 'question': str}]，按输入顺序并去重
+    """
+    items = []
+    seen = set()
+
+    for line in lines:
+        line = line.strip()
+        if not line or line.startswith('#'):
+            continue
+
+        if line.startswith('{'):
+            try:
+                data = json.loads(line)
+            except json.JSONDecodeError:
+                print(f"[WARNING] 跳过无法解析的行: {line[:50]}", file=sys.stderr)
+                continue
+            question = str(data.get('question', '')).strip()
+            if not question:
+                continue
+            item_id = str(data.get('id') or _question_id(question))
+        else:
+            question = line
+            item_id = _question_id(question)
+
+        if item_id in seen:
+            continue
+        seen.add(item_id)
+        items.append({'id': item_id, 'question': question})
+
+    return items
+
+
+def expand_tickers(tickers: List[str], template: str) -> List[str]:
+    """把股票列表按模板展开成问题"""
+    return [template.format(ticker=t.strip().upper()) for t in tickers if t.strip()]
+
+
+def load_completed_ids(output_path: str) -> Set[str]:
+    """读取输出文件中已成功完成的问题ID"""
+    completed = set()
+    if not os.path.exists(output_path):
+        return completed
+
+    with open(output_path, 'r', encoding='utf-8') as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                # 中断时可能留下半行，忽略
+                continue
+            if record.get('status') == 'ok':
+                completed.add(record.get('id'))
+
+    return completed
+
+
+def analyze_one(pipeline: AnalysisPipeline, item: Dict, risk_tolerance: str) -> Dict:
+    """分析单个问题，异常也返回一条记录"""
+    start_time = time.time()
+    try:
+        result = pipeline.analyze(
+            item['question'], risk_tolerance=risk_tolerance, request_id=item['id']
+        )
+        record = {'id': item['id'], 'status': 'ok'}
+        record.update(result)
+    except Exception as e:
+        record = {
+            'id': item['id'],
+            'question': item['question'],
+            'status': 'error',
+            'error': str(e),
+            'execution_time': round(time.time() - start_time, 3)
+        }
+
+    record['finished_at'] = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    return record
+
+
+def run_batch(
+    pipeline: AnalysisPipeline,
+    items: List[Dict],
+    output_path: str,
+    workers: int = 4,
+    risk_tolerance: str = "medium"
+) -> Dict:
+    """
+    并行执行批量分析并逐条写入 JSONL
+
+    Returns:
+        {'total', 'skipped', 'ok', 'error', 'elapsed'}
+    """
+    start_time = time.time()
+    completed = load_completed_ids(output_path)
+    pending = [item for item in items if item['id'] not in completed]
+
+    summary = {
+        'total': len(items),
+        'skipped': len(items) - len(pending),
+        'ok': 0,
+        'error': 0
+    }
+
+    # 所有 worker 共用同一组组件，工具层缓存在 worker 之间共享
+    with open(output_path, 'a', encoding='utf-8') as out, \
+            ThreadPoolExecutor(max_workers=workers) as executor:
+        futures = {
+            executor.submit(analyze_one, pipeline, item, risk_tolerance): item
+            for item in pending
+        }
+
+        for done, future in enumerate(as_completed(futures), 1):
+            record = future.result()
+            summary[record['status']] += 1
+
+            # 每条记录立即落盘，中断后可续跑
+            out.write(json.dumps(record, ensure_ascii=False, default=str) + '\n')
+            out.flush()
+
+            print(
+                f"[{done}/{len(pending)}] {record['status']} "
+                f"{record['execution_time']:.1f}s {record['question'][:40]}",
+                file=sys.stderr
+            )
+
+    summary['elapsed'] = round(time.time() - start_time, 3)
+    return summary
+
+
+def main(argv: List[str] = None) -> int:
+    parser = argparse.ArgumentParser(description="BullBearQA 批量离线分析")
+    parser.add_argument("input", nargs="?", help="问题文件路径，'-' 表示标准输入")
+    parser.add_argument("-o", "--output", required=True, help="输出 JSONL 文件路径")
+    parser.add_argument("-w", "--workers", type=int, default=4, help="并行 worker 数（默认 4）")
+    parser.add_argument("--risk", default="medium", choices=["low", "medium", "high"], help="策略风险偏好")
+    parser.add_argument("--tickers", help="逗号分隔的股票列表，配合 --template 生成问题")
+    parser.add_argument("--template", default="全面分析{ticker}的投资价值", help="问题模板，{ticker} 会被替换")
+    parser.add_argument("--api-key", help="DeepSeek API Key（默认读取 DEEPSEEK_API_KEY）")
+    parser.add_argument("--startup-report", action="store_true", help="结束时输出导入/组件构建耗时报告")
+    parser.add_argument("--cassette", help="录制/回放外部调用（yfinance、HTTP、LLM）的 cassette 文件")
+    parser.add_argument("--cassette-mode", default="replay", choices=["record", "replay", "auto"], help="cassette 模式（默认 replay）")
+    parser.add_argument("--latency-scale", type=float, default=0.0, help="回放时按录制耗时的倍数延迟（0=全速，1=真实速度）")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="回放时注入错误的概率")
+    args = parser.parse_args(argv)
+
+    load_dotenv()
+    api_key = args.api_key or os.getenv("DEEPSEEK_API_KEY")
+    if not api_key and args.cassette and args.cassette_mode == "replay":
+        # 纯回放不会访问 DeepSeek，随便给一个占位 Key 即可
+        api_key = "cassette-replay"
+    if not api_key:
+        parser.error("请通过 --api-key 或 DEEPSEEK_API_KEY 提供 API Key")
+
+    lines = []
+    if args.input == '-':
+        lines.extend(sys.stdin)
+    elif args.input:
+        with open(args.input, 'r', encoding='utf-8') as f:
+            lines.extend(f)
+    if args.tickers:
+        lines.extend(expand_tickers(args.tickers.split(','), args.template))
+
+    items = parse_questions(lines)
+    if not items:
+        parser.error("没有可分析的问题")
+
+    cassette = None
+    if args.cassette:
+        cassette = Cassette(
+            args.cassette,
+            mode=args.cassette_mode,
+            latency_scale=args.latency_scale,
+            error_rate=args.error_rate
+        ).install()
+    
+    try:
+        pipeline = AnalysisPipeline(build_components(api_key))
+        summary = run_batch(pipeline, items, args.output, args.workers, args.risk)
+    finally:
+        if cassette:
+            cassette.uninstall()
+            print(cassette.format_stats(), file=sys.stderr)
+
+    print(
+        f"✅ 完成 {summary['ok']} | ❌ 失败 {summary['error']} | "
+        f"⏭️ 跳过 {summary['skipped']} | ⏱️ {summary['elapsed']:.1f}秒",
+        file=sys.stderr
+    )
+    if args.startup_report:
+        print(format_report(), file=sys.stderr)
+    return 1 if summary['error'] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
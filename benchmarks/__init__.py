@@ -0,0 +1,3 @@
+"""
+Benchmarks模块 - 离线性能基准测试（录制行情数据 + 假LLM）
+"""
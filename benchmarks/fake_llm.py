@@ -0,0 +1,71 @@
+# -*- coding: utf-8 -*-
+"""
+确定性的假LLM（用于离线基准测试）
+
+根据提示词内容返回固定回答，并可配置模拟延迟，
+可以直接替换 ChatOpenAI 传给 QuestionRouter / ArenaJudge / Agent。
+"""
+
+import time
+from typing import Any, List, Optional
+
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, BaseMessage
+from langchain_core.outputs import ChatGeneration, ChatResult
+
+JUDGE_REPORT = """📊 综合分析摘要
+基本面稳健，技术面中性偏强，市场情绪积极。
+
+💡 投资建议
+持有，等待更好的买点。
+
+⚠️ 主要风险
+- 估值偏高
+- 宏观波动
+
+✨ 投资机会
+- 长期增长潜力
+- 新产品周期
+
+🎯 最终结论
+整体积极，建议逢低布局。"""
+
+AGENT_ANSWER = "根据工具数据，该股票基本面稳健，技术面处于震荡整理，建议持有观望。"
+
+
+class FakeLLM(BaseChatModel):
+    """按提示词关键字返回固定回答的聊天模型"""
+    
+    latency: float = 0.0          # 每次调用的模拟延迟（秒）
+    route_answer: str = "technical"
+    call_count: int = 0
+    
+    @property
+    def _llm_type(self) -> str:
+        return "bullbear-fake"
+    
+    def _respond(self, text: str) -> str:
+        if "问题分类专家" in text:
+            return self.route_answer
+        if "按以下五节输出" in text:
+            return JUDGE_REPORT
+        return AGENT_ANSWER
+    
+    def _generate(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Any = None,
+        **kwargs: Any
+    ) -> ChatResult:
+        self.call_count += 1
+        if self.latency:
+            time.sleep(self.latency)
+        
+        text = "\n".join(str(m.content) for m in messages)
+        message = AIMessage(content=self._respond(text))
+        return ChatResult(generations=[ChatGeneration(message=message)])
+    
+    def bind_tools(self, tools: Any, **kwargs: Any):
+        """支持 create_tool_calling_agent；假模型从不调用工具，直接给出答案"""
+        return self
@@ -0,0 +1,129 @@
+# -*- coding: utf-8 -*-
+"""
+用录制的行情数据替换 yfinance
+
+用法：
+    with patch_yfinance():
+        ...  # 期间所有 yf.Ticker / yf.download 调用都读取本地 fixtures
+"""
+
+import json
+import os
+from contextlib import contextmanager
+from typing import Dict, List
+
+import pandas as pd
+import yfinance as yf
+
+from benchmarks.record_fixtures import FIXTURE_DIR
+
+# history(period=...) 对应的回溯跨度
+PERIOD_OFFSETS = {
+    "1d": pd.DateOffset(days=1),
+    "5d": pd.DateOffset(days=5),
+    "1mo": pd.DateOffset(months=1),
+    "3mo": pd.DateOffset(months=3),
+    "6mo": pd.DateOffset(months=6),
+    "1y": pd.DateOffset(years=1),
+    "2y": pd.DateOffset(years=2),
+    "5y": pd.DateOffset(years=5),
+    "10y": pd.DateOffset(years=10)
+}
+
+_history_cache: Dict[str, pd.DataFrame] = {}
+_info_cache: Dict[str, Dict] = {}
+
+
+def available_tickers() -> List[str]:
+    """fixtures 中已录制的股票"""
+    return sorted(
+        name[:-len("_history.csv")]
+        for name in os.listdir(FIXTURE_DIR)
+        if name.endswith("_history.csv")
+    )
+
+
+def load_history(ticker: str) -> pd.DataFrame:
+    """读取录制的日线数据（与 yfinance 一样使用纽约时区索引）"""
+    ticker = ticker.upper()
+    if ticker not in _history_cache:
+        path = os.path.join(FIXTURE_DIR, f"{ticker}_history.csv")
+        if not os.path.exists(path):
+            _history_cache[ticker] = pd.DataFrame(columns=['Open', 'High', 'Low', 'Close', 'Volume'])
+        else:
+            df = pd.read_csv(path, index_col='Date', parse_dates=True)
+            df.index = df.index.tz_localize('America/New_York')
+            _history_cache[ticker] = df
+    return _history_cache[ticker]
+
+
+def load_info(ticker: str) -> Dict:
+    """读取录制的 .info 字段"""
+    ticker = ticker.upper()
+    if ticker not in _info_cache:
+        path = os.path.join(FIXTURE_DIR, f"{ticker}_info.json")
+        if os.path.exists(path):
+            with open(path, 'r', encoding='utf-8') as f:
+                _info_cache[ticker] = json.load(f)
+        else:
+            _info_cache[ticker] = {}
+    return _info_cache[ticker]
+
+
+def load_news() -> Dict[str, List[Dict]]:
+    """读取新闻样本"""
+    with open(os.path.join(FIXTURE_DIR, "news.json"), 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def slice_period(df: pd.DataFrame, period: str) -> pd.DataFrame:
+    """按 period 截取数据"""
+    if df.empty or period not in PERIOD_OFFSETS:
+        return df
+    return df[df.index >= df.index[-1] - PERIOD_OFFSETS[period]]
+
+
+class FixtureTicker:
+    """替代 yf.Ticker，只实现分析流程用到的接口"""
+    
+    def __init__(self, ticker: str, *args, **kwargs):
+        self.ticker = ticker.upper()
+    
+    @property
+    def info(self) -> Dict:
+        return dict(load_info(self.ticker))
+    
+    def history(self, period: str = "1mo", *args, **kwargs) -> pd.DataFrame:
+        return slice_period(load_history(self.ticker), period).copy()
+
+
+def fixture_download(tickers, period: str = "1mo", *args, **kwargs) -> pd.DataFrame:
+    """替代 yf.download（group_by='column' 格式：列为 (字段, 股票)）"""
+    if isinstance(tickers, str):
+        tickers = tickers.replace(',', ' ').split()
+    
+    frames = {}
+    for ticker in tickers:
+        df = slice_period(load_history(ticker), period)
+        if not df.empty:
+            frames[ticker.upper()] = df.tz_localize(None)
+    
+    if not frames:
+        return pd.DataFrame()
+    
+    fields = ['Open', 'High', 'Low', 'Close', 'Volume']
+    return pd.concat(
+        {field: pd.DataFrame({t: df[field] for t, df in frames.items()}) for field in fields},
+        axis=1
+    )
+
+
+@contextmanager
+def patch_yfinance():
+    """在上下文内把 yf.Ticker / yf.download 替换为本地 fixtures"""
+    original_ticker, original_download = yf.Ticker, yf.download
+    yf.Ticker, yf.download = FixtureTicker, fixture_download
+    try:
+        yield
+    finally:
+        yf.Ticker, yf.download = original_ticker, original_download
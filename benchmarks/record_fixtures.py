@@ -0,0 +1,151 @@
+# -*- coding: utf-8 -*-
+"""
+录制基准测试用的行情数据
+
+用法：
+    python -m benchmarks.record_fixtures AAPL MSFT NVDA          # 从 yfinance 录制真实数据
+    python -m benchmarks.record_fixtures --synthetic AAPL MSFT   # 无网络时生成确定性的合成数据
+
+每只股票生成两个文件：
+    benchmarks/fixtures/<TICKER>_history.csv   2年日线 OHLCV
+    benchmarks/fixtures/<TICKER>_info.json     .info 中的关键字段
+另外生成 benchmarks/fixtures/news.json 作为新闻样本。
+"""
+
+import argparse
+import csv
+import json
+import os
+import random
+from datetime import date, timedelta
+from typing import Dict, List
+
+FIXTURE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures")
+
+# 只保留分析流程用到的 .info 字段，保持文件精简
+INFO_FIELDS = [
+    'longName', 'sector', 'industry', 'currentPrice', 'regularMarketPrice',
+    'marketCap', 'trailingPE', 'forwardPE', 'priceToBook', 'totalRevenue',
+    'netIncomeToCommon', 'profitMargins', 'returnOnEquity', 'debtToEquity',
+    'currentRatio', 'dividendYield'
+]
+
+HISTORY_COLUMNS = ['Date', 'Open', 'High', 'Low', 'Close', 'Volume']
+
+
+def record_ticker(ticker: str) -> None:
+    """从 yfinance 录制一只股票的数据"""
+    import yfinance as yf
+    
+    stock = yf.Ticker(ticker)
+    hist = stock.history(period="2y")
+    if hist.empty:
+        print(f"[WARNING] {ticker} 无历史数据，跳过")
+        return
+    
+    hist = hist[HISTORY_COLUMNS[1:]]
+    hist.index = hist.index.strftime('%Y-%m-%d')
+    hist.index.name = 'Date'
+    hist.round(4).to_csv(os.path.join(FIXTURE_DIR, f"{ticker}_history.csv"))
+    
+    info = {k: stock.info.get(k) for k in INFO_FIELDS}
+    with open(os.path.join(FIXTURE_DIR, f"{ticker}_info.json"), 'w', encoding='utf-8') as f:
+        json.dump(info, f, ensure_ascii=False, indent=2)
+
+
+def synthesize_ticker(ticker: str, days: int = 504, end: date = date(2025, 6, 30)) -> None:
+    """生成确定性的合成数据（随机游走，种子由股票代码决定）"""
+    rng = random.Random(ticker)
+    
+    # 倒推出 days 个工作日
+    trading_days: List[date] = []
+    current = end
+    while len(trading_days) < days:
+        if current.weekday() < 5:
+            trading_days.append(current)
+        current -= timedelta(days=1)
+    trading_days.reverse()
+    
+    price = rng.uniform(50, 500)
+    drift = rng.uniform(-0.0003, 0.0008)
+    volatility = rng.uniform(0.012, 0.03)
+    base_volume = rng.randint(5_000_000, 80_000_000)
+    
+    rows = []
+    for day in trading_days:
+        open_price = price * (1 + rng.gauss(0, volatility / 3))
+        close_price = open_price * (1 + drift + rng.gauss(0, volatility))
+        high = max(open_price, close_price) * (1 + abs(rng.gauss(0, volatility / 2)))
+        low = min(open_price, close_price) * (1 - abs(rng.gauss(0, volatility / 2)))
+        volume = int(base_volume * rng.uniform(0.5, 1.8))
+        rows.append([
+            day.isoformat(), round(open_price, 4), round(high, 4),
+            round(low, 4), round(close_price, 4), volume
+        ])
+        price = close_price
+    
+    with open(os.path.join(FIXTURE_DIR, f"{ticker}_history.csv"), 'w', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(HISTORY_COLUMNS)
+        writer.writerows(rows)
+    
+    info = {
+        'longName': f"{ticker} Inc.",
+        'sector': rng.choice(['Technology', 'Consumer Cyclical', 'Communication Services']),
+        'industry': rng.choice(['Semiconductors', 'Software - Infrastructure', 'Consumer Electronics']),
+        'currentPrice': round(price, 2),
+        'regularMarketPrice': round(price, 2),
+        'marketCap': int(price * rng.randint(1_000_000_000, 15_000_000_000)),
+        'trailingPE': round(rng.uniform(8, 60), 2),
+        'forwardPE': round(rng.uniform(8, 45), 2),
+        'priceToBook': round(rng.uniform(1, 50), 2),
+        'totalRevenue': rng.randint(10_000_000_000, 400_000_000_000),
+        'netIncomeToCommon': rng.randint(1_000_000_000, 100_000_000_000),
+        'profitMargins': round(rng.uniform(0.02, 0.4), 4),
+        'returnOnEquity': round(rng.uniform(0.02, 1.5), 4),
+        'debtToEquity': round(rng.uniform(5, 250), 2),
+        'currentRatio': round(rng.uniform(0.6, 3.5), 2),
+        'dividendYield': round(rng.uniform(0, 0.03), 4)
+    }
+    with open(os.path.join(FIXTURE_DIR, f"{ticker}_info.json"), 'w', encoding='utf-8') as f:
+        json.dump(info, f, ensure_ascii=False, indent=2)
+
+
+def write_news_sample(tickers: List[str]) -> None:
+    """生成新闻样本（新闻源无法回放时使用）"""
+    templates = [
+        ('{t} 季度营收超预期，股价上涨', 'Reuters'),
+        ('{t} 获分析师上调评级，看好长期增长', 'Bloomberg'),
+        ('{t} 面临监管风险，市场担忧加剧', 'WSJ'),
+        ('{t} 发布新产品，市场反应平淡', 'CNBC'),
+        ('{t} 供应链疲软，下调全年指引', 'FT')
+    ]
+    news: Dict[str, List[Dict]] = {
+        t: [{'title': title.format(t=t), 'source': source} for title, source in templates]
+        for t in tickers
+    }
+    with open(os.path.join(FIXTURE_DIR, "news.json"), 'w', encoding='utf-8') as f:
+        json.dump(news, f, ensure_ascii=False, indent=2)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="录制基准测试行情数据")
+    parser.add_argument("tickers", nargs="+", help="股票代码")
+    parser.add_argument("--synthetic", action="store_true", help="生成确定性合成数据（不访问网络）")
+    args = parser.parse_args()
+    
+    os.makedirs(FIXTURE_DIR, exist_ok=True)
+    tickers = [t.upper() for t in args.tickers]
+    
+    for ticker in tickers:
+        if args.synthetic:
+            synthesize_ticker(ticker)
+        else:
+            record_ticker(ticker)
+        print(f"✅ {ticker}")
+    
+    write_news_sample(tickers)
+
+
+if __name__ == "__main__":
+    main()
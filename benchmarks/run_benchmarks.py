@@ -0,0 +1,290 @@
+# -*- coding: utf-8 -*-
+"""
+离线基准测试
+
+全部使用录制的行情数据和假LLM，不访问网络，结果可重复比较。
+
+用法：
+    python -m benchmarks.run_benchmarks                    # 运行并与基线比较
+    python -m benchmarks.run_benchmarks --save-baseline    # 把本次结果保存为基线
+    python -m benchmarks.run_benchmarks --filter tool      # 只运行名称包含 tool 的用例
+    python -m benchmarks.run_benchmarks --llm-latency 0.5  # 模拟真实LLM延迟
+
+结果保存在 benchmarks/results/latest.json，基线为 benchmarks/baseline.json。
+当某个用例的中位数耗时比基线慢超过阈值（默认20%）时返回非零退出码。
+"""
+
+import argparse
+import json
+import os
+import platform
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime
+from typing import Callable, Dict, List, Optional
+
+from benchmarks.fake_llm import FakeLLM
+from benchmarks.market_fixtures import available_tickers, load_news, patch_yfinance
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+BASELINE_PATH = os.path.join(BENCH_DIR, "baseline.json")
+RESULTS_PATH = os.path.join(BENCH_DIR, "results", "latest.json")
+
+# 低于这个绝对差值（毫秒）的变化视为噪声
+NOISE_FLOOR_MS = 0.5
+
+ROUTER_QUESTIONS = [
+    "AAPL的PE怎么样？",
+    "TSLA的RSI是多少？",
+    "最近NVDA的新闻如何？",
+    "比较AAPL和MSFT",
+    "苹果和微软哪个好？"
+]
+
+AGENT_OUTPUTS = {
+    'fundamental': "📊 Apple Inc. (AAPL)\n✅ ROE优秀，盈利能力强\n营收增长强劲，超预期",
+    'technical': "📈 AAPL 技术指标分析\nRSI 中性，MACD 看涨，均线呈上涨趋势",
+    'sentiment': "📰 AAPL 最新资讯\n市场情绪偏向积极，但需关注监管风险"
+}
+
+
+class BenchmarkCase:
+    """一个基准测试用例"""
+
+    def __init__(self, name: str, func: Callable, repeat: int = 50, setup: Optional[Callable] = None):
+        self.name = name
+        self.func = func
+        self.repeat = repeat
+        self.setup = setup
+
+
+def measure(case: BenchmarkCase, warmup: int = 2) -> Dict:
+    """执行用例并统计耗时（毫秒）"""
+    state = case.setup() if case.setup else None
+
+    def call():
+        return case.func(state) if case.setup else case.func()
+
+    for _ in range(warmup):
+        call()
+
+    samples = []
+    for _ in range(case.repeat):
+        start = time.perf_counter()
+        call()
+        samples.append((time.perf_counter() - start) * 1000)
+
+    samples.sort()
+    p95_index = min(len(samples) - 1, int(len(samples) * 0.95))
+
+    return {
+        'name': case.name,
+        'runs': len(samples),
+        'mean_ms': round(statistics.mean(samples), 4),
+        'median_ms': round(statistics.median(samples), 4),
+        'p95_ms': round(samples[p95_index], 4),
+        'min_ms': round(samples[0], 4)
+    }
+
+
+def build_cases(llm_latency: float) -> List[BenchmarkCase]:
+    """构建全部用例（需在 patch_yfinance 上下文内调用）"""
+    from router.question_router import QuestionRouter
+    from judge.arena_judge import ArenaJudge
+    from tools.stock_data_tool import StockDataTool
+    from tools.technical_indicator_tool import TechnicalIndicatorTool
+    from tools.news_search_tool import NewsSearchTool
+    from tools.comparison_tool import ComparisonTool
+    from trading.strategy_generator import StrategyGenerator
+    from data.analysis_snapshot import AnalysisSnapshot, collect_snapshot
+    from trading.paper_trading import PaperTradingTracker
+    from visualization.candlestick_chart import CandlestickChart
+
+    tickers = available_tickers()
+    ticker = tickers[0]
+    llm = FakeLLM(latency=llm_latency)
+    news = load_news()
+
+    router = QuestionRouter(llm)
+    judge = ArenaJudge(llm)
+    stock_tool = StockDataTool()
+    technical_tool = TechnicalIndicatorTool()
+    comparison_tool = ComparisonTool()
+    chart = CandlestickChart()
+    generator = StrategyGenerator()
+
+    news_tool = NewsSearchTool()
+    news_tool._fetch_news = lambda t: [
+        dict(item, sentiment=news_tool._analyze_sentiment(item['title']))
+        for item in news.get(t.upper(), [])
+    ]
+
+    # 工具调用时收集的结构化数据（评分和策略直接使用，不再请求行情）
+    snapshot = AnalysisSnapshot()
+    with collect_snapshot(snapshot):
+        stock_tool.get_stock_data(ticker)
+        technical_tool.get_technical_indicators(ticker)
+        news_tool.search_news(ticker)
+    snapshot_analysis = snapshot.to_analysis(ticker)
+    technical_outputs = {'technical': AGENT_OUTPUTS['technical']}
+    technical_score = judge.create_investment_score(technical_outputs, snapshot, ticker)
+    
+    def route_all_rule():
+        for question in ROUTER_QUESTIONS:
+            router.route(question)
+
+    def setup_tracker():
+        handle, path = tempfile.mkstemp(suffix=".json")
+        os.close(handle)
+        os.remove(path)
+        return PaperTradingTracker(data_file=path)
+
+    def paper_trading_cycle(tracker):
+        strategy = generator.generate_strategy(ticker, "Buy", {}, "medium")
+        trade_id = tracker.add_trade(strategy)
+        tracker.update_trade(trade_id, strategy['target_price'])
+        tracker.get_performance_stats()
+
+    return [
+        BenchmarkCase("router.route.rule", route_all_rule, repeat=200),
+        BenchmarkCase("router.route.llm_fallback", lambda: router.route("最近有什么值得关注的？"), repeat=20),
+        BenchmarkCase("tool.stock_data.format", lambda: stock_tool.get_stock_data(ticker), repeat=200),
+        BenchmarkCase("tool.technical.format", lambda: technical_tool.get_technical_indicators(ticker), repeat=100),
+        BenchmarkCase("tool.news.format", lambda: news_tool.search_news(ticker), repeat=200),
+        BenchmarkCase("tool.comparison.format", lambda: comparison_tool.compare_stocks(",".join(tickers[:3])), repeat=50),
+        BenchmarkCase("indicators.compute", lambda: technical_tool.compute_indicators(ticker), repeat=100),
+        BenchmarkCase("chart.create_chart", lambda: chart.create_chart(ticker, "6mo"), repeat=20),
+        BenchmarkCase("chart.chart_bundle", lambda: chart.get_chart_bundle(ticker, "6mo"), repeat=20),
+        BenchmarkCase("chart.comparison_bundle", lambda: chart.get_comparison_bundle(tickers, "1y"), repeat=20),
+        BenchmarkCase("judge.investment_score", lambda: judge.create_investment_score(AGENT_OUTPUTS), repeat=500),
+        BenchmarkCase("judge.investment_score.snapshot", lambda: judge.create_investment_score(AGENT_OUTPUTS, snapshot, ticker), repeat=500),
+        BenchmarkCase("judge.synthesize", lambda: judge.synthesize("全面分析AAPL", AGENT_OUTPUTS), repeat=20),
+        BenchmarkCase("judge.synthesize.fast", lambda: judge.synthesize("技术面如何", technical_outputs, snapshot, technical_score, ticker), repeat=500),
+        BenchmarkCase("strategy.generate", lambda: generator.generate_strategy(ticker, "Buy", AGENT_OUTPUTS, "medium"), repeat=100),
+        BenchmarkCase("strategy.generate.snapshot", lambda: generator.generate_strategy(ticker, "Buy", snapshot_analysis, "medium"), repeat=500),
+        BenchmarkCase("strategy.generate_batch", lambda: generator.generate_strategies(tickers, "Buy", "medium"), repeat=50),
+        BenchmarkCase("paper_trading.cycle", paper_trading_cycle, repeat=50, setup=setup_tracker)
+    ]
+
+
+def judge_compaction() -> Dict:
+    """Judge 提示词压缩统计（综合分析用例的 Agent 输出）"""
+    from judge.arena_judge import ArenaJudge
+
+    stats = {}
+    ArenaJudge(FakeLLM()).synthesize("全面分析AAPL", AGENT_OUTPUTS, stats=stats)
+    return stats
+
+
+def compare(results: List[Dict], baseline: Dict, threshold: float) -> List[Dict]:
+    """与基线比较，返回每个用例的对比结果"""
+    baseline_by_name = {r['name']: r for r in baseline.get('results', [])}
+    comparisons = []
+
+    for result in results:
+        base = baseline_by_name.get(result['name'])
+        if not base:
+            comparisons.append({'name': result['name'], 'status': 'new'})
+            continue
+
+        diff_ms = result['median_ms'] - base['median_ms']
+        ratio = result['median_ms'] / base['median_ms'] if base['median_ms'] else 1.0
+
+        if ratio > 1 + threshold and diff_ms > NOISE_FLOOR_MS:
+            status = 'regression'
+        elif ratio < 1 - threshold and -diff_ms > NOISE_FLOOR_MS:
+            status = 'improvement'
+        else:
+            status = 'same'
+
+        comparisons.append({
+            'name': result['name'],
+            'status': status,
+            'baseline_ms': base['median_ms'],
+            'current_ms': result['median_ms'],
+            'change_pct': round((ratio - 1) * 100, 1)
+        })
+
+    return comparisons
+
+
+def print_report(results: List[Dict], comparisons: Optional[List[Dict]], compaction: Optional[Dict] = None) -> None:
+    """打印结果表格"""
+    status_icon = {'regression': '🔴', 'improvement': '🟢', 'same': '⚪', 'new': '🆕'}
+    by_name = {c['name']: c for c in comparisons or []}
+
+    print(f"{'用例':<32}{'中位数(ms)':>12}{'p95(ms)':>12}{'对比基线':>14}")
+    print("━" * 70)
+    for result in results:
+        line = f"{result['name']:<32}{result['median_ms']:>12.3f}{result['p95_ms']:>12.3f}"
+        comparison = by_name.get(result['name'])
+        if comparison:
+            icon = status_icon[comparison['status']]
+            change = f"{comparison['change_pct']:+.1f}%" if 'change_pct' in comparison else ''
+            line += f"{icon:>6} {change:>7}"
+        print(line)
+
+    if compaction:
+        print(
+            f"\n🗜️ Judge 提示词压缩：{compaction['tokens_before']} → {compaction['tokens_after']} tokens"
+            f"（节省 {compaction['tokens_saved']}）"
+        )
+
+
+def main(argv: List[str] = None) -> int:
+    parser = argparse.ArgumentParser(description="BullBearQA 离线基准测试")
+    parser.add_argument("--filter", default="", help="只运行名称包含该字符串的用例")
+    parser.add_argument("--llm-latency", type=float, default=0.0, help="假LLM每次调用的延迟（秒）")
+    parser.add_argument("--threshold", type=float, default=0.2, help="判定性能回退的阈值（默认0.2=20%%）")
+    parser.add_argument("--save-baseline", action="store_true", help="把本次结果保存为基线")
+    parser.add_argument("--output", default=RESULTS_PATH, help="结果文件路径")
+    args = parser.parse_args(argv)
+
+    with patch_yfinance():
+        cases = [c for c in build_cases(args.llm_latency) if args.filter in c.name]
+        results = [measure(case) for case in cases]
+
+    report = {
+        'created_at': datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'llm_latency': args.llm_latency,
+        'prompt_compaction': judge_compaction(),
+        'results': results
+    }
+
+    os.makedirs(os.path.dirname(args.output), exist_ok=True)
+    with open(args.output, 'w', encoding='utf-8') as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+
+    if args.save_baseline:
+        with open(BASELINE_PATH, 'w', encoding='utf-8') as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+        print_report(results, None, report['prompt_compaction'])
+        print(f"\n✅ 基线已保存: {BASELINE_PATH}")
+        return 0
+
+    comparisons = None
+    if os.path.exists(BASELINE_PATH):
+        with open(BASELINE_PATH, 'r', encoding='utf-8') as f:
+            comparisons = compare(results, json.load(f), args.threshold)
+
+    print_report(results, comparisons, report['prompt_compaction'])
+
+    if comparisons is None:
+        print("\n💡 还没有基线，使用 --save-baseline 保存本次结果")
+        return 0
+
+    regressions = [c for c in comparisons if c['status'] == 'regression']
+    if regressions:
+        print(f"\n⚠️ {len(regressions)} 个用例性能回退超过 {args.threshold*100:.0f}%")
+        return 1
+
+    print("\n✅ 没有性能回退")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,7 @@
+"""
+Data模块 - 共享的行情数据获取
+"""
+
+from . import analysis_snapshot, cache_warmer, fundamentals_store, market_data, peer_index
+
+__all__ = ['analysis_snapshot', 'cache_warmer', 'fundamentals_store', 'market_data', 'peer_index']
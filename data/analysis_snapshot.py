@@ -0,0 +1,262 @@
+# -*- coding: utf-8 -*-
+"""
+结构化分析快照
+
+工具在输出文本的同时，把关键数字（价格、RSI、MACD、均线、基本面、情绪分）
+写入当前请求的快照。快照和 Agent 的文本一起传给 Judge、评分和策略生成，
+下游不再需要重新请求 yfinance 或从文本里解析数字。
+
+用法：
+    snapshot = AnalysisSnapshot()
+    with collect_snapshot(snapshot):
+        agent.run(question)          # 工具调用 record_* 写入快照
+    snapshot.get("AAPL").rsi
+"""
+
+import threading
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import asdict, dataclass, field
+from typing import Dict, List, Optional
+
+
+@dataclass
+class TickerSnapshot:
+    """单只股票的结构化数据（未获取到的字段为 None）"""
+    ticker: str
+    price: Optional[float] = None
+    # 技术面
+    rsi: Optional[float] = None
+    macd: Optional[float] = None
+    macd_signal_line: Optional[float] = None
+    macd_histogram: Optional[float] = None
+    ma20: Optional[float] = None
+    ma50: Optional[float] = None
+    bollinger_upper: Optional[float] = None
+    bollinger_lower: Optional[float] = None
+    volume_ratio: Optional[float] = None
+    # 基本面
+    name: Optional[str] = None
+    sector: Optional[str] = None
+    market_cap: Optional[float] = None
+    pe: Optional[float] = None
+    forward_pe: Optional[float] = None
+    pb: Optional[float] = None
+    roe: Optional[float] = None
+    profit_margin: Optional[float] = None
+    revenue_growth: Optional[float] = None
+    debt_to_equity: Optional[float] = None
+    # 市场情绪（-1 ~ 1）
+    sentiment_score: Optional[float] = None
+    news_count: Optional[int] = None
+
+    @property
+    def has_technical(self) -> bool:
+        return self.rsi is not None
+
+    @property
+    def has_fundamental(self) -> bool:
+        return any(v is not None for v in (self.pe, self.roe, self.profit_margin, self.revenue_growth))
+
+    @property
+    def has_sentiment(self) -> bool:
+        return self.sentiment_score is not None
+
+    @property
+    def trend(self) -> Optional[str]:
+        """均线趋势：'上涨' / '下跌' / '震荡'"""
+        if self.price is None or self.ma20 is None or self.ma50 is None:
+            return None
+        if self.price > self.ma20 > self.ma50:
+            return '上涨'
+        if self.price < self.ma20 < self.ma50:
+            return '下跌'
+        return '震荡'
+
+    def to_analysis(self) -> Dict:
+        """
+        策略生成器使用的分析结构
+
+        Returns:
+            {'price', 'technical': {...}, 'fundamental': {...}, 'sentiment': {'score'}}，
+            缺失的维度为空字典；情绪分换算到 0~1
+        """
+        technical = {}
+        if self.has_technical:
+            technical = {
+                'rsi': self.rsi,
+                'trend': self.trend,
+                'macd_histogram': self.macd_histogram,
+                'ma20': self.ma20,
+                'ma50': self.ma50
+            }
+
+        fundamental = {}
+        if self.has_fundamental:
+            fundamental = {
+                'pe': self.pe,
+                'roe': self.roe,
+                'profit_margin': self.profit_margin,
+                'revenue_growth': self.revenue_growth,
+                'debt_to_equity': self.debt_to_equity
+            }
+
+        sentiment = {}
+        if self.has_sentiment:
+            sentiment = {'score': round((self.sentiment_score + 1) / 2, 3)}
+
+        return {
+            'price': self.price,
+            'technical': technical,
+            'fundamental': fundamental,
+            'sentiment': sentiment
+        }
+
+    def format_facts(self) -> str:
+        """给 Judge 提示词用的紧凑数据行"""
+        parts = []
+        if self.price is not None:
+            parts.append(f"价格 {self.price:.2f}")
+        if self.has_technical:
+            parts.append(f"RSI {self.rsi:.1f}")
+            if self.macd_histogram is not None:
+                parts.append(f"MACD柱 {self.macd_histogram:+.2f}")
+            if self.trend:
+                parts.append(f"均线趋势 {self.trend}")
+        if self.pe is not None:
+            parts.append(f"PE {self.pe:.1f}")
+        if self.roe is not None:
+            parts.append(f"ROE {self.roe * 100:.1f}%")
+        if self.revenue_growth is not None:
+            parts.append(f"营收增长 {self.revenue_growth * 100:+.1f}%")
+        if self.debt_to_equity is not None:
+            parts.append(f"负债权益比 {self.debt_to_equity:.0f}")
+        if self.has_sentiment:
+            parts.append(f"新闻情绪 {self.sentiment_score:+.2f}（{self.news_count or 0}条）")
+        return f"{self.ticker}: " + " | ".join(parts) if parts else ""
+
+
+@dataclass
+class AnalysisSnapshot:
+    """一次分析请求中收集到的全部结构化数据"""
+    tickers: Dict[str, TickerSnapshot] = field(default_factory=dict)
+    _lock: threading.Lock = field(default_factory=threading.Lock, repr=False, compare=False)
+
+    def get(self, ticker: str, create: bool = False) -> Optional[TickerSnapshot]:
+        ticker = ticker.upper()
+        if create:
+            with self._lock:
+                return self.tickers.setdefault(ticker, TickerSnapshot(ticker=ticker))
+        return self.tickers.get(ticker)
+
+    def update(self, ticker: str, **values) -> None:
+        """写入字段（None 值不覆盖已有数据）"""
+        item = self.get(ticker, create=True)
+        with self._lock:
+            for key, value in values.items():
+                if value is not None:
+                    setattr(item, key, value)
+
+    def to_analysis(self, ticker: Optional[str]) -> Dict:
+        """某只股票的策略分析结构（没有数据时各维度为空）"""
+        item = self.get(ticker) if ticker else None
+        if item is None:
+            return {'price': None, 'technical': {}, 'fundamental': {}, 'sentiment': {}}
+        return item.to_analysis()
+
+    def format_facts(self) -> str:
+        lines = [item.format_facts() for item in self.tickers.values()]
+        return "\n".join(line for line in lines if line)
+
+    def to_dict(self) -> Dict:
+        """JSON 可序列化的字典（API / 批量输出用）"""
+        return {ticker: asdict(item) for ticker, item in self.tickers.items()}
+
+    @classmethod
+    def from_dict(cls, data: Dict) -> "AnalysisSnapshot":
+        """to_dict() 的逆操作"""
+        return cls(tickers={ticker: TickerSnapshot(**values) for ticker, values in data.items()})
+
+    def __bool__(self) -> bool:
+        return bool(self.tickers)
+
+
+_current_snapshot: ContextVar[Optional[AnalysisSnapshot]] = ContextVar("analysis_snapshot", default=None)
+
+
+@contextmanager
+def collect_snapshot(snapshot: AnalysisSnapshot):
+    """在上下文内让工具把数据写入 snapshot"""
+    token = _current_snapshot.set(snapshot)
+    try:
+        yield snapshot
+    finally:
+        _current_snapshot.reset(token)
+
+
+def current_snapshot() -> Optional[AnalysisSnapshot]:
+    return _current_snapshot.get()
+
+
+def _number(value) -> Optional[float]:
+    return float(value) if isinstance(value, (int, float)) and not isinstance(value, bool) else None
+
+
+# ========== 工具调用的记录函数（没有正在收集的快照时什么都不做） ==========
+
+def record_technical(ticker: str, indicators: Dict) -> None:
+    """记录 TechnicalIndicatorTool.compute_indicators() 的结果"""
+    snapshot = current_snapshot()
+    if snapshot is None or not indicators:
+        return
+    snapshot.update(
+        ticker,
+        price=indicators.get('price'),
+        rsi=indicators.get('rsi'),
+        macd=indicators.get('macd'),
+        macd_signal_line=indicators.get('macd_signal_line'),
+        macd_histogram=indicators.get('macd_histogram'),
+        ma20=indicators.get('ma20'),
+        ma50=indicators.get('ma50'),
+        bollinger_upper=indicators.get('bollinger_upper'),
+        bollinger_lower=indicators.get('bollinger_lower'),
+        volume_ratio=indicators.get('volume_ratio')
+    )
+
+
+def record_fundamentals(ticker: str, info: Dict) -> None:
+    """记录 yfinance .info 中的基本面字段"""
+    snapshot = current_snapshot()
+    if snapshot is None or not info:
+        return
+    snapshot.update(
+        ticker,
+        price=_number(info.get('currentPrice')) or _number(info.get('regularMarketPrice')),
+        name=info.get('longName'),
+        sector=info.get('sector'),
+        market_cap=_number(info.get('marketCap')),
+        pe=_number(info.get('trailingPE')),
+        forward_pe=_number(info.get('forwardPE')),
+        pb=_number(info.get('priceToBook')),
+        roe=_number(info.get('returnOnEquity')),
+        profit_margin=_number(info.get('profitMargins')),
+        revenue_growth=_number(info.get('revenueGrowth')),
+        debt_to_equity=_number(info.get('debtToEquity'))
+    )
+
+
+def record_sentiment(ticker: str, news_list: List[Dict]) -> None:
+    """记录新闻情绪（各条新闻 sentiment_score 的均值，压缩到 -1 ~ 1）"""
+    snapshot = current_snapshot()
+    if snapshot is None:
+        return
+    if not news_list:
+        snapshot.update(ticker, news_count=0)
+        return
+    scores = [item.get('sentiment_score', 0.0) for item in news_list]
+    average = sum(scores) / len(scores)
+    snapshot.update(
+        ticker,
+        sentiment_score=round(max(-1.0, min(1.0, average / 2)), 3),
+        news_count=len(news_list)
+    )
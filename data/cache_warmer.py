@@ -0,0 +1,361 @@
+# -*- coding: utf-8 -*-
+"""
+缓存预热
+
+记录每只股票被问到的频率（按时间衰减），后台线程在以下时机刷新最常被问到的
+前 N 只股票的基本面（.info）、历史行情和新闻缓存：
+    - 启动后
+    - 美股开盘时（开盘前的缓存数据已经过时，强制刷新）
+    - 缓存快过期前（剩余 TTL 不足 TTL_LEAD 时提前刷新）
+
+预热线程以较低优先级运行：有交互请求正在访问上游时先等待，
+每次上游请求之间留出间隔，不和用户请求抢连接和限额。
+
+环境变量：
+    BULLBEAR_CACHE_WARMER      设为 0 关闭预热
+    BULLBEAR_CACHE_WARMER_TOP  预热的股票数（默认 20）
+"""
+
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import Callable, Dict, Iterable, List, Optional
+
+CACHE_DIR = os.getenv("BULLBEAR_CACHE_DIR", ".cache")
+FREQUENCY_FILE = os.path.join(CACHE_DIR, "ticker_frequency.json")
+
+# 请求频率的衰减半衰期（秒）
+FREQUENCY_HALF_LIFE = 3 * 86400
+TOP_N = int(os.getenv("BULLBEAR_CACHE_WARMER_TOP", "20"))
+# 缓存剩余时间低于 TTL 的该比例时提前刷新
+TTL_LEAD = 0.2
+# 美股开盘时间（纽约时间，不考虑节假日）
+MARKET_TZ = "America/New_York"
+MARKET_OPEN = (9, 30)
+
+
+# ========== 交互请求让路 ==========
+
+_interactive_count = 0
+_interactive_cond = threading.Condition()
+
+
+@contextmanager
+def interactive_fetch():
+    """标记一次交互请求正在访问上游（工具缓存未命中时使用），预热线程会等待其结束"""
+    global _interactive_count
+    with _interactive_cond:
+        _interactive_count += 1
+    try:
+        yield
+    finally:
+        with _interactive_cond:
+            _interactive_count -= 1
+            if _interactive_count == 0:
+                _interactive_cond.notify_all()
+
+
+def wait_until_idle(timeout: Optional[float] = None) -> bool:
+    """等待没有交互请求访问上游，超时返回 False"""
+    with _interactive_cond:
+        return _interactive_cond.wait_for(lambda: _interactive_count == 0, timeout)
+
+
+# ========== 请求频率 ==========
+
+class TickerFrequency:
+    """按时间衰减的股票请求频率（持久化到本地 JSON，重启后仍知道哪些股票热门）"""
+
+    def __init__(self, path: Optional[str] = FREQUENCY_FILE, half_life: float = FREQUENCY_HALF_LIFE):
+        self.path = path
+        self.half_life = half_life
+        self._scores: Dict[str, tuple] = {}
+        self._lock = threading.Lock()
+        self._dirty = False
+        self._load()
+
+    def _load(self) -> None:
+        if not self.path or not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                self._scores = {ticker: tuple(value) for ticker, value in json.load(f).items()}
+        except Exception as e:
+            print(f"[WARNING] 加载股票请求频率失败: {e}")
+
+    def _decayed(self, score: float, updated_at: float, now: float) -> float:
+        return score * 0.5 ** ((now - updated_at) / self.half_life)
+
+    def record(self, tickers: Iterable[str], now: Optional[float] = None) -> None:
+        """记录一次请求（同一请求里的多只股票各加 1）"""
+        now = now or time.time()
+        with self._lock:
+            for ticker in dict.fromkeys(t.upper() for t in tickers):
+                score, updated_at = self._scores.get(ticker, (0.0, now))
+                self._scores[ticker] = (self._decayed(score, updated_at, now) + 1.0, now)
+                self._dirty = True
+
+    def top(self, n: int, now: Optional[float] = None) -> List[str]:
+        """当前频率最高的 n 只股票"""
+        now = now or time.time()
+        with self._lock:
+            ranked = sorted(
+                ((self._decayed(score, updated_at, now), ticker)
+                 for ticker, (score, updated_at) in self._scores.items()),
+                reverse=True
+            )
+        return [ticker for _, ticker in ranked[:n]]
+
+    def save(self) -> None:
+        if not self.path or not self._dirty:
+            return
+        with self._lock:
+            data = dict(self._scores)
+            self._dirty = False
+        try:
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            temp_path = f"{self.path}.tmp"
+            with open(temp_path, 'w', encoding='utf-8') as f:
+                json.dump(data, f)
+            os.replace(temp_path, self.path)
+        except Exception as e:
+            print(f"[WARNING] 保存股票请求频率失败: {e}")
+
+
+_frequency: Optional[TickerFrequency] = None
+_frequency_lock = threading.Lock()
+
+
+def get_frequency() -> TickerFrequency:
+    """进程内共享的请求频率表"""
+    global _frequency
+    if _frequency is None:
+        with _frequency_lock:
+            if _frequency is None:
+                _frequency = TickerFrequency()
+    return _frequency
+
+
+def record_request(tickers: Iterable[str]) -> None:
+    """记录一次用户请求涉及的股票"""
+    tickers = [t for t in tickers if t]
+    if tickers:
+        get_frequency().record(tickers)
+
+
+# ========== 预热 ==========
+
+@dataclass
+class WarmTarget:
+    """一类可预热的缓存"""
+    name: str
+    ttl: float
+    refresh: Callable[[str], object]
+    cache_age: Callable[[str], Optional[float]]
+
+
+def default_targets() -> List[WarmTarget]:
+    """基本面、历史行情、新闻三类工具缓存（工具实例之间共用缓存）"""
+    from tools.news_search_tool import NewsSearchTool
+    from tools.stock_data_tool import StockDataTool
+    from tools.technical_indicator_tool import TechnicalIndicatorTool
+
+    targets = []
+    for name, tool in (('info', StockDataTool()), ('history', TechnicalIndicatorTool()), ('news', NewsSearchTool())):
+        targets.append(WarmTarget(name, tool._cache_ttl, tool.refresh, tool.cache_age))
+    return targets
+
+
+def next_market_open(now: Optional[datetime] = None) -> datetime:
+    """下一个美股开盘时间（带时区，跳过周末）"""
+    from zoneinfo import ZoneInfo
+
+    tz = ZoneInfo(MARKET_TZ)
+    now = now.astimezone(tz) if now else datetime.now(tz)
+    candidate = now.replace(hour=MARKET_OPEN[0], minute=MARKET_OPEN[1], second=0, microsecond=0)
+    if candidate <= now:
+        candidate += timedelta(days=1)
+    while candidate.weekday() >= 5:
+        candidate += timedelta(days=1)
+    return candidate
+
+
+def _lower_thread_priority() -> None:
+    """降低当前线程的调度优先级（Linux 上线程可单独设置 nice 值，其他平台忽略）"""
+    try:
+        os.setpriority(os.PRIO_PROCESS, threading.get_native_id(), 10)
+    except (AttributeError, OSError):
+        pass
+
+
+class CacheWarmer:
+    """后台缓存预热线程"""
+
+    def __init__(
+        self,
+        targets_factory: Callable[[], List[WarmTarget]] = default_targets,
+        frequency: Optional[TickerFrequency] = None,
+        top_n: int = TOP_N,
+        seed_tickers: Optional[List[str]] = None,
+        min_interval: float = 0.5,
+        check_interval: float = 30,
+        startup_delay: float = 5
+    ):
+        """
+        Args:
+            targets_factory: 返回预热目标的函数（在预热线程中调用，不占用启动时间）
+            top_n: 预热的股票数
+            seed_tickers: 请求记录不足 top_n 时用来补足的股票
+            min_interval: 两次上游请求之间的最小间隔（秒）
+            check_interval: 检查缓存是否快过期的间隔（秒）
+            startup_delay: 启动后等待多久再开始第一次预热（秒）
+        """
+        self.targets_factory = targets_factory
+        self.frequency = frequency or get_frequency()
+        self.top_n = top_n
+        self.seed_tickers = seed_tickers
+        self.min_interval = min_interval
+        self.check_interval = check_interval
+        self.startup_delay = startup_delay
+
+        self._targets: Optional[List[WarmTarget]] = None
+        self._stop_event = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._stats = {'refreshed': 0, 'failed': 0, 'last_run': None, 'next_market_open': None, 'last_error': None}
+
+    def _seed(self) -> List[str]:
+        if self.seed_tickers is None:
+            try:
+                from screener.universe import load_universe
+                self.seed_tickers = load_universe('popular')
+            except Exception:
+                self.seed_tickers = []
+        return self.seed_tickers
+
+    def top_tickers(self) -> List[str]:
+        """要预热的股票：请求最多的，不足时用种子列表补足"""
+        tickers = self.frequency.top(self.top_n)
+        for ticker in self._seed():
+            if len(tickers) >= self.top_n:
+                break
+            if ticker not in tickers:
+                tickers.append(ticker)
+        return tickers
+
+    def _is_due(self, target: WarmTarget, ticker: str) -> bool:
+        age = target.cache_age(ticker)
+        return age is None or age >= target.ttl * (1 - TTL_LEAD)
+
+    def warm(self, tickers: List[str], force: bool = False) -> int:
+        """
+        刷新指定股票的缓存
+
+        Args:
+            force: True 时不管缓存是否快过期都刷新（开盘时使用）
+
+        Returns:
+            刷新的缓存条目数
+        """
+        if self._targets is None:
+            self._targets = self.targets_factory()
+
+        refreshed = 0
+        for ticker in tickers:
+            for target in self._targets:
+                if self._stop_event.is_set():
+                    return refreshed
+                if not force and not self._is_due(target, ticker):
+                    continue
+
+                # 交互请求优先：等它们访问完上游再继续
+                while not wait_until_idle(timeout=1.0):
+                    if self._stop_event.is_set():
+                        return refreshed
+
+                try:
+                    ok = target.refresh(ticker) is not None
+                except Exception as e:
+                    print(f"[WARNING] 预热 {ticker} {target.name} 失败: {e}")
+                    ok = False
+                self._stats['refreshed' if ok else 'failed'] += 1
+                refreshed += ok
+                self._stop_event.wait(self.min_interval)
+
+        self._stats['last_run'] = datetime.now().isoformat(timespec='seconds')
+        return refreshed
+
+    def _run(self) -> None:
+        _lower_thread_priority()
+        if self._stop_event.wait(self.startup_delay):
+            return
+
+        # 启动预热（失败时记录错误，下一轮循环重试，线程不退出）
+        market_open = None
+        try:
+            self.warm(self.top_tickers())
+            market_open = next_market_open()
+            self._stats['next_market_open'] = market_open.isoformat()
+        except Exception as e:
+            self._stats['last_error'] = f"{type(e).__name__}: {e}"
+            print(f"[ERROR] 启动预热失败: {e}")
+
+        while not self._stop_event.wait(self.check_interval):
+            try:
+                if market_open is None:
+                    market_open = next_market_open()
+                    self._stats['next_market_open'] = market_open.isoformat()
+                if datetime.now(market_open.tzinfo) >= market_open:
+                    # 开盘：强制刷新
+                    self.warm(self.top_tickers(), force=True)
+                    market_open = next_market_open()
+                    self._stats['next_market_open'] = market_open.isoformat()
+                else:
+                    # 快过期的提前刷新
+                    self.warm(self.top_tickers())
+                self.frequency.save()
+            except Exception as e:
+                self._stats['last_error'] = f"{type(e).__name__}: {e}"
+                print(f"[ERROR] 缓存预热失败: {e}")
+
+    def start(self) -> "CacheWarmer":
+        if self._thread is None or not self._thread.is_alive():
+            self._stop_event.clear()
+            self._thread = threading.Thread(target=self._run, name="cache-warmer", daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self, timeout: float = 5) -> None:
+        self._stop_event.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+        self.frequency.save()
+
+    def status(self) -> Dict:
+        return {
+            'running': self._thread is not None and self._thread.is_alive(),
+            'top_tickers': self.frequency.top(self.top_n),
+            **self._stats
+        }
+
+
+_warmer: Optional[CacheWarmer] = None
+_warmer_lock = threading.Lock()
+
+
+def start_cache_warmer() -> Optional[CacheWarmer]:
+    """启动进程内共享的预热线程（重复调用不会重复启动）；BULLBEAR_CACHE_WARMER=0 时返回 None"""
+    global _warmer
+    if os.getenv("BULLBEAR_CACHE_WARMER", "1") == "0":
+        return None
+    with _warmer_lock:
+        if _warmer is None:
+            _warmer = CacheWarmer()
+        return _warmer.start()
+
+
+def get_cache_warmer() -> Optional[CacheWarmer]:
+    return _warmer
@@ -0,0 +1,315 @@
+# -*- coding: utf-8 -*-
+"""
+基本面历史快照
+
+每次从上游拿到 .info 时，把估值/盈利/偿债等关键字段追加到本地列式存储（Parquet），
+以 (ticker, date) 为键，同一天多次获取保留最后一次。之后"AAPL 的 PE 怎么变化的"、
+"当前估值处于历史什么分位"之类的问题直接在本地回答，不再请求上游。
+
+存储布局（BULLBEAR_CACHE_DIR/fundamentals/）：
+    fundamentals.parquet    合并后的主文件
+    part-*.parquet          新写入的分片（积累到 COMPACT_PARTS 个后合并进主文件）
+
+写入先进入内存缓冲，达到 FLUSH_ROWS 行或进程退出时落盘；读取时合并主文件、分片和缓冲。
+"""
+
+from __future__ import annotations
+
+import atexit
+import glob
+import os
+import socket
+import threading
+import time
+import uuid
+from datetime import date
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from utils.lazy_import import lazy_module
+
+pd = lazy_module("pandas")
+
+CACHE_DIR = os.getenv("BULLBEAR_CACHE_DIR", ".cache")
+STORE_DIR = os.path.join(CACHE_DIR, "fundamentals")
+
+# 缓冲达到该行数时落盘
+FLUSH_ROWS = 200
+# 分片达到该数量时合并
+COMPACT_PARTS = 20
+# 合并锁超过该秒数视为残留（持有锁的进程在合并中途被杀掉）
+COMPACT_LOCK_STALE = 600
+
+# 存储字段 → yfinance .info 字段
+INFO_FIELDS = {
+    'price': 'currentPrice',
+    'market_cap': 'marketCap',
+    'pe': 'trailingPE',
+    'forward_pe': 'forwardPE',
+    'pb': 'priceToBook',
+    'ps': 'priceToSalesTrailing12Months',
+    'roe': 'returnOnEquity',
+    'profit_margin': 'profitMargins',
+    'operating_margin': 'operatingMargins',
+    'gross_margin': 'grossMargins',
+    'revenue_growth': 'revenueGrowth',
+    'debt_to_equity': 'debtToEquity',
+    'current_ratio': 'currentRatio',
+    'dividend_yield': 'dividendYield'
+}
+METRICS = list(INFO_FIELDS)
+COLUMNS = ['ticker', 'date', 'fetched_at', 'sector', 'industry'] + METRICS
+KEY = ['ticker', 'date']
+
+
+def _number(value) -> Optional[float]:
+    return float(value) if isinstance(value, (int, float)) and not isinstance(value, bool) else None
+
+
+def info_to_row(ticker: str, info: Dict, fetched_at: Optional[float] = None) -> Optional[Dict]:
+    """把 .info 转成一行快照（没有任何指标时返回 None）"""
+    fetched_at = fetched_at or time.time()
+    row = {field: _number(info.get(key)) for field, key in INFO_FIELDS.items()}
+    if row['price'] is None:
+        row['price'] = _number(info.get('regularMarketPrice'))
+    if all(value is None for value in row.values()):
+        return None
+    row.update(
+        ticker=ticker.upper(),
+        date=date.fromtimestamp(fetched_at).isoformat(),
+        fetched_at=fetched_at,
+        sector=info.get('sector'),
+        industry=info.get('industry')
+    )
+    return row
+
+
+def _lock_is_stale(lock_path: str) -> bool:
+    """
+    锁文件是否残留：超过 COMPACT_LOCK_STALE 秒，或者由本机上已经不存在的进程创建
+    （锁文件内容为 "主机名 pid"）
+    """
+    try:
+        if time.time() - os.path.getmtime(lock_path) > COMPACT_LOCK_STALE:
+            return True
+        with open(lock_path, 'r', encoding='utf-8') as f:
+            host, _, pid = f.read().strip().rpartition(' ')
+    except (OSError, ValueError):
+        return False
+    if os.name != 'posix' or host != socket.gethostname() or not pid.isdigit():
+        return False
+    try:
+        os.kill(int(pid), 0)
+    except ProcessLookupError:
+        return True
+    except OSError:
+        # 进程存在但属于其他用户
+        return False
+    return False
+
+
+def _acquire_lock(lock_path: str) -> Optional[int]:
+    """创建锁文件（O_EXCL），锁被占用时返回 None；残留的锁会被清理后重试一次"""
+    for _ in range(2):
+        try:
+            handle = os.open(lock_path, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+        except FileExistsError:
+            if not _lock_is_stale(lock_path):
+                return None
+            print(f"[WARNING] 清理残留的合并锁: {lock_path}")
+            try:
+                os.remove(lock_path)
+            except FileNotFoundError:
+                pass
+            continue
+        os.write(handle, f"{socket.gethostname()} {os.getpid()}".encode('utf-8'))
+        return handle
+    return None
+
+
+class FundamentalsStore:
+    """基本面快照的列式存储"""
+
+    def __init__(self, directory: str = STORE_DIR, flush_rows: int = FLUSH_ROWS):
+        self.directory = directory
+        self.flush_rows = flush_rows
+        self._buffer: Dict[Tuple[str, str], Dict] = {}
+        self._frame: Optional[pd.DataFrame] = None
+        # 已加载的合并表之后新记录、还没合并进去的行（下次读取时合并）
+        self._unmerged: List[Dict] = []
+        self._lock = threading.RLock()
+
+    @property
+    def main_path(self) -> str:
+        return os.path.join(self.directory, "fundamentals.parquet")
+
+    # ========== 写入 ==========
+
+    def record(self, ticker: str, info: Dict, fetched_at: Optional[float] = None) -> None:
+        """记录一次 .info 快照"""
+        self.record_many({ticker: info}, fetched_at)
+
+    def record_many(self, infos: Dict[str, Dict], fetched_at: Optional[float] = None) -> None:
+        """批量记录 {ticker: info}"""
+        rows = [info_to_row(ticker, info, fetched_at) for ticker, info in infos.items() if info]
+        rows = [row for row in rows if row]
+        if not rows:
+            return
+        with self._lock:
+            for row in rows:
+                self._buffer[(row['ticker'], row['date'])] = row
+            if self._frame is not None:
+                self._unmerged.extend(rows)
+            if len(self._buffer) >= self.flush_rows:
+                self.flush()
+
+    def flush(self) -> None:
+        """把缓冲写成一个分片（写入失败时保留缓冲，下次再试）"""
+        with self._lock:
+            if not self._buffer:
+                return
+            frame = self._to_frame(list(self._buffer.values()))
+            try:
+                os.makedirs(self.directory, exist_ok=True)
+                path = os.path.join(self.directory, f"part-{int(time.time())}-{uuid.uuid4().hex[:8]}.parquet")
+                frame.to_parquet(path, index=False)
+            except Exception as e:
+                print(f"[WARNING] 基本面快照写入失败: {e}")
+                return
+            self._buffer.clear()
+
+            if len(self._part_paths()) >= COMPACT_PARTS:
+                self.compact()
+
+    def compact(self) -> None:
+        """把分片合并进主文件（每个 (ticker, date) 只保留最后一次）"""
+        with self._lock:
+            parts = self._part_paths()
+            if not parts:
+                return
+            lock_path = os.path.join(self.directory, ".compact.lock")
+            # 多进程共用目录时只允许一个进程合并
+            handle = _acquire_lock(lock_path)
+            if handle is None:
+                return
+            try:
+                frame = self._read_files(([self.main_path] if os.path.exists(self.main_path) else []) + parts)
+                temp_path = f"{self.main_path}.tmp"
+                frame.to_parquet(temp_path, index=False)
+                os.replace(temp_path, self.main_path)
+                for path in parts:
+                    os.remove(path)
+            except Exception as e:
+                print(f"[WARNING] 基本面快照合并失败: {e}")
+            finally:
+                os.close(handle)
+                os.remove(lock_path)
+
+    # ========== 读取 ==========
+
+    def _part_paths(self) -> List[str]:
+        return sorted(glob.glob(os.path.join(self.directory, "part-*.parquet")))
+
+    @staticmethod
+    def _to_frame(rows: List[Dict]) -> pd.DataFrame:
+        frame = pd.DataFrame(rows, columns=COLUMNS)
+        frame[METRICS] = frame[METRICS].astype('float64')
+        return frame
+
+    @staticmethod
+    def _dedupe(frame: pd.DataFrame) -> pd.DataFrame:
+        frame = frame.sort_values('fetched_at').drop_duplicates(KEY, keep='last')
+        return frame.sort_values(KEY).reset_index(drop=True)
+
+    def _merge(self, frame: pd.DataFrame, rows: List[Dict]) -> pd.DataFrame:
+        return self._dedupe(pd.concat([frame, self._to_frame(rows)], ignore_index=True))
+
+    def _read_files(self, paths: List[str]) -> pd.DataFrame:
+        frames = []
+        for path in paths:
+            try:
+                frames.append(pd.read_parquet(path))
+            except Exception as e:
+                print(f"[WARNING] 读取基本面快照 {path} 失败: {e}")
+        if not frames:
+            return self._to_frame([])
+        return self._dedupe(pd.concat(frames, ignore_index=True))
+
+    def frame(self) -> pd.DataFrame:
+        """全部快照（ticker, date 排序），第一次调用时从磁盘加载"""
+        with self._lock:
+            if self._frame is None:
+                paths = ([self.main_path] if os.path.exists(self.main_path) else []) + self._part_paths()
+                frame = self._read_files(paths)
+                if self._buffer:
+                    frame = self._merge(frame, list(self._buffer.values()))
+                self._frame = frame
+            elif self._unmerged:
+                self._frame = self._merge(self._frame, self._unmerged)
+            self._unmerged = []
+            return self._frame
+
+    def history(
+        self,
+        ticker: str,
+        fields: Optional[Iterable[str]] = None,
+        start: Optional[str] = None
+    ) -> pd.DataFrame:
+        """
+        某只股票的快照历史
+
+        Args:
+            fields: 需要的指标（默认全部）
+            start: 起始日期（YYYY-MM-DD）
+
+        Returns:
+            以日期为索引的指标表（按日期升序）
+        """
+        frame = self.frame()
+        rows = frame[frame['ticker'] == ticker.upper()]
+        if start:
+            rows = rows[rows['date'] >= start]
+        columns = list(fields) if fields else METRICS
+        return rows.set_index('date')[columns]
+
+    def latest(self, tickers: Optional[Iterable[str]] = None) -> pd.DataFrame:
+        """每只股票最近一次快照（以 ticker 为索引）"""
+        frame = self.frame()
+        if tickers is not None:
+            frame = frame[frame['ticker'].isin([t.upper() for t in tickers])]
+        return frame.groupby('ticker').tail(1).set_index('ticker')
+
+    def percentile(self, ticker: str, field: str, value: Optional[float] = None) -> Optional[float]:
+        """
+        value（默认最新值）在该股票自身历史中的百分位（0~100）
+
+        Returns:
+            历史快照不足 2 个或没有该指标时返回 None
+        """
+        series = self.history(ticker, [field])[field].dropna()
+        if len(series) < 2:
+            return None
+        value = series.iloc[-1] if value is None else value
+        return float((series <= value).mean() * 100)
+
+
+_store: Optional[FundamentalsStore] = None
+_store_lock = threading.Lock()
+
+
+def get_fundamentals_store() -> FundamentalsStore:
+    """进程内共享的快照存储（退出时自动落盘）"""
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                _store = FundamentalsStore()
+                atexit.register(_store.flush)
+    return _store
+
+
+def record_info(ticker: str, info: Dict) -> None:
+    """记录一次 .info 快照（工具拿到上游数据后调用，失败不影响调用方）"""
+    try:
+        get_fundamentals_store().record(ticker, info)
+    except Exception as e:
+        print(f"[WARNING] 记录 {ticker} 基本面快照失败: {e}")
@@ -0,0 +1,193 @@
+"""
+共享行情数据获取
+提供批量下载、多股票日期对齐、基本面缓存等公共能力
+"""
+
+from __future__ import annotations
+
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Iterable, List
+from data.fundamentals_store import get_fundamentals_store
+from data.peer_index import index_infos
+from utils.lazy_import import lazy_module
+
+yf = lazy_module("yfinance")
+pd = lazy_module("pandas")
+
+# 对齐时最多向前填充的交易日数（覆盖节假日、短暂停牌）
+MAX_FFILL_DAYS = 5
+
+# 一次 yf.download 请求的最大股票数（过长的列表分批下载）
+DOWNLOAD_CHUNK_SIZE = 200
+
+# .info 缓存（基本面数据变化慢）
+INFO_CACHE_TTL = 6 * 3600
+_info_cache: Dict[str, tuple] = {}
+_info_lock = threading.Lock()
+
+
+def download_fields(
+    tickers: List[str],
+    period: str = "1y",
+    fields: Iterable[str] = ("Close",)
+) -> Dict[str, pd.DataFrame]:
+    """
+    批量下载多只股票的行情字段（超过 DOWNLOAD_CHUNK_SIZE 时分批请求）
+    
+    Args:
+        tickers: 股票代码列表
+        period: 时间周期（同 yfinance）
+        fields: 需要的字段（Open / High / Low / Close / Volume）
+    
+    Returns:
+        {字段: 日期 × 股票代码 矩阵}（未对齐，可能含缺失值，按输入顺序，
+        去掉完全没有数据的股票）；全部失败时各字段为空 DataFrame
+    """
+    tickers = list(dict.fromkeys(t.upper() for t in tickers))
+    fields = list(fields)
+    parts = {field: [] for field in fields}
+    
+    for i in range(0, len(tickers), DOWNLOAD_CHUNK_SIZE):
+        chunk = tickers[i:i + DOWNLOAD_CHUNK_SIZE]
+        raw = yf.download(
+            chunk,
+            period=period,
+            group_by='column',
+            auto_adjust=True,
+            progress=False,
+            threads=True
+        )
+        if raw is None or raw.empty:
+            continue
+        
+        for field in fields:
+            values = raw[field]
+            # 单只股票时 yfinance 可能返回 Series
+            if isinstance(values, pd.Series):
+                values = values.to_frame(name=chunk[0])
+            parts[field].append(values.reindex(columns=chunk))
+    
+    result = {}
+    for field, frames in parts.items():
+        if not frames:
+            result[field] = pd.DataFrame()
+            continue
+        merged = pd.concat(frames, axis=1) if len(frames) > 1 else frames[0]
+        result[field] = merged.dropna(axis=1, how='all')
+    return result
+
+
+def download_closes(tickers: List[str], period: str = "1y") -> pd.DataFrame:
+    """
+    批量下载多只股票的收盘价（一次请求）
+    
+    Args:
+        tickers: 股票代码列表
+        period: 时间周期（同 yfinance）
+    
+    Returns:
+        日期 × 股票代码 的收盘价矩阵（未对齐，可能含缺失值）；
+        全部失败时返回空 DataFrame
+    """
+    if not tickers:
+        return pd.DataFrame()
+    return download_fields(tickers, period, ("Close",))["Close"]
+
+
+def align_closes(closes: pd.DataFrame, max_ffill: int = MAX_FFILL_DAYS) -> pd.DataFrame:
+    """
+    对齐多只股票的收盘价矩阵
+    
+    规则：
+    1. 日期取所有股票交易日的并集并排序
+    2. 缺失值用前一个交易日价格填充，最多填充 max_ffill 天
+       （更长的缺口保留为空，避免把长期停牌画成平线）
+    3. 从所有股票都有价格的第一天开始截取，保证归一化基准日相同
+    
+    Args:
+        closes: 日期 × 股票代码 的收盘价矩阵
+        max_ffill: 最多向前填充的天数
+    
+    Returns:
+        对齐后的收盘价矩阵
+    """
+    if closes.empty:
+        return closes
+    
+    aligned = closes.sort_index().ffill(limit=max_ffill)
+    
+    complete_rows = aligned.notna().all(axis=1)
+    if not complete_rows.any():
+        return aligned.iloc[0:0]
+    
+    return aligned.loc[complete_rows.idxmax():]
+
+
+def get_aligned_closes(tickers: List[str], period: str = "1y") -> pd.DataFrame:
+    """批量下载并对齐收盘价矩阵"""
+    return align_closes(download_closes(tickers, period))
+
+
+def get_latest_prices(tickers: List[str], period: str = "5d") -> pd.Series:
+    """
+    批量获取最新价格（每只股票最近一个有效收盘价）
+    
+    Args:
+        tickers: 股票代码列表
+        period: 回溯周期，覆盖节假日/停牌即可
+    
+    Returns:
+        以股票代码为索引的价格 Series（按输入顺序，取不到价格的股票不包含在内）
+    """
+    closes = download_closes(tickers, period)
+    if closes.empty:
+        return pd.Series(dtype=float)
+    return closes.sort_index().ffill().iloc[-1].dropna()
+
+
+def get_infos(tickers: List[str], max_workers: int = 8) -> Dict[str, Dict]:
+    """
+    批量获取 yfinance .info（带进程内缓存，未命中的并发请求）
+    
+    Returns:
+        {ticker: info}，获取失败的股票为空字典
+    """
+    tickers = list(dict.fromkeys(t.upper() for t in tickers))
+    now = time.time()
+    result = {}
+    missing = []
+    
+    with _info_lock:
+        for ticker in tickers:
+            cached = _info_cache.get(ticker)
+            if cached and now - cached[1] < INFO_CACHE_TTL:
+                result[ticker] = cached[0]
+            else:
+                missing.append(ticker)
+    
+    def fetch(ticker: str) -> Dict:
+        try:
+            return yf.Ticker(ticker).info or {}
+        except Exception as e:
+            print(f"[WARNING] 获取 {ticker} 基本面失败: {e}")
+            return {}
+    
+    if missing:
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            fetched = dict(zip(missing, executor.map(fetch, missing)))
+        with _info_lock:
+            for ticker, info in fetched.items():
+                # 失败的不缓存，下次重试
+                if info:
+                    _info_cache[ticker] = (info, now)
+        result.update(fetched)
+        
+        try:
+            get_fundamentals_store().record_many(fetched, now)
+        except Exception as e:
+            print(f"[WARNING] 记录基本面快照失败: {e}")
+        index_infos(fetched, now)
+    
+    return {ticker: result[ticker] for ticker in tickers}
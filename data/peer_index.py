@@ -0,0 +1,277 @@
+# -*- coding: utf-8 -*-
+"""
+行业/细分行业同行索引
+
+本地维护 sector / industry → 股票 的索引，并缓存每只股票的关键指标。
+每次从上游拿到 .info 时顺带增量更新，对比和基本面分析取同行时只需查一次索引，
+不用为了知道候选股票属于哪个行业而逐个请求 .info。
+
+索引保存为 JSON（BULLBEAR_CACHE_DIR/peer_index.json），有改动时最多每 SAVE_INTERVAL 秒写一次，
+进程退出时再写一次。
+
+初始化一个范围（例如标普500）：
+    python -m data.peer_index --seed sp500
+"""
+
+from __future__ import annotations
+
+import argparse
+import atexit
+import json
+import os
+import threading
+import time
+from typing import Dict, Iterable, List, Optional, Set
+
+from utils.lazy_import import lazy_module
+
+pd = lazy_module("pandas")
+
+CACHE_DIR = os.getenv("BULLBEAR_CACHE_DIR", ".cache")
+INDEX_PATH = os.path.join(CACHE_DIR, "peer_index.json")
+SAVE_INTERVAL = 30
+# 条目超过该天数视为过期（行业不常变，指标用于同行对照）
+STALE_DAYS = 7
+
+# 缓存的指标 → .info 字段
+METRIC_FIELDS = {
+    'market_cap': 'marketCap',
+    'pe': 'trailingPE',
+    'forward_pe': 'forwardPE',
+    'pb': 'priceToBook',
+    'roe': 'returnOnEquity',
+    'profit_margin': 'profitMargins',
+    'revenue_growth': 'revenueGrowth',
+    'debt_to_equity': 'debtToEquity'
+}
+
+
+def _number(value) -> Optional[float]:
+    return float(value) if isinstance(value, (int, float)) and not isinstance(value, bool) else None
+
+
+class PeerIndex:
+    """同行索引"""
+
+    def __init__(self, path: Optional[str] = INDEX_PATH):
+        self.path = path
+        self._entries: Dict[str, Dict] = {}
+        self._by_sector: Dict[str, Set[str]] = {}
+        self._by_industry: Dict[str, Set[str]] = {}
+        self._lock = threading.RLock()
+        self._dirty = False
+        self._last_save = 0.0
+        self._load()
+
+    # ========== 持久化 ==========
+
+    def _load(self) -> None:
+        if not self.path or not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                entries = json.load(f).get('tickers', {})
+        except Exception as e:
+            print(f"[WARNING] 加载同行索引失败: {e}")
+            return
+        with self._lock:
+            for ticker, entry in entries.items():
+                self._put(ticker, entry)
+
+    def save(self, force: bool = False) -> None:
+        """有改动时写入文件（force=False 时受 SAVE_INTERVAL 限制）"""
+        if not self.path:
+            return
+        with self._lock:
+            if not self._dirty or (not force and time.time() - self._last_save < SAVE_INTERVAL):
+                return
+            data = {'updated_at': time.time(), 'tickers': dict(self._entries)}
+            self._dirty = False
+            self._last_save = time.time()
+        try:
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            temp_path = f"{self.path}.tmp"
+            with open(temp_path, 'w', encoding='utf-8') as f:
+                json.dump(data, f, ensure_ascii=False)
+            os.replace(temp_path, self.path)
+        except Exception as e:
+            print(f"[WARNING] 保存同行索引失败: {e}")
+
+    # ========== 更新 ==========
+
+    def _put(self, ticker: str, entry: Dict) -> None:
+        """写入条目并维护反向索引（调用方持有锁）"""
+        old = self._entries.get(ticker)
+        if old:
+            self._by_sector.get(old.get('sector'), set()).discard(ticker)
+            self._by_industry.get(old.get('industry'), set()).discard(ticker)
+        self._entries[ticker] = entry
+        if entry.get('sector'):
+            self._by_sector.setdefault(entry['sector'], set()).add(ticker)
+        if entry.get('industry'):
+            self._by_industry.setdefault(entry['industry'], set()).add(ticker)
+
+    def update_many(self, infos: Dict[str, Dict], fetched_at: Optional[float] = None) -> int:
+        """
+        用 {ticker: .info} 增量更新索引
+
+        Returns:
+            更新的条目数（没有行业信息的 .info 会被跳过）
+        """
+        fetched_at = fetched_at or time.time()
+        updated = 0
+        with self._lock:
+            for ticker, info in infos.items():
+                if not info or not info.get('sector'):
+                    continue
+                entry = {field: _number(info.get(key)) for field, key in METRIC_FIELDS.items()}
+                entry.update(
+                    name=info.get('shortName') or info.get('longName'),
+                    sector=info.get('sector'),
+                    industry=info.get('industry'),
+                    updated_at=fetched_at
+                )
+                self._put(ticker.upper(), entry)
+                updated += 1
+            if updated:
+                self._dirty = True
+        if updated:
+            self.save()
+        return updated
+
+    def update(self, ticker: str, info: Dict) -> None:
+        self.update_many({ticker: info})
+
+    def stale_tickers(self, max_age_days: float = STALE_DAYS) -> List[str]:
+        """过期条目（最旧的在前）"""
+        cutoff = time.time() - max_age_days * 86400
+        with self._lock:
+            stale = [(entry.get('updated_at', 0), ticker) for ticker, entry in self._entries.items()
+                     if entry.get('updated_at', 0) < cutoff]
+        return [ticker for _, ticker in sorted(stale)]
+
+    def refresh_stale(self, limit: int = 50, max_age_days: float = STALE_DAYS) -> int:
+        """增量刷新最旧的 limit 个过期条目，返回刷新数"""
+        from data.market_data import get_infos
+
+        tickers = self.stale_tickers(max_age_days)[:limit]
+        if not tickers:
+            return 0
+        # get_infos 拿到数据后会自动更新索引
+        infos = get_infos(tickers)
+        return sum(1 for info in infos.values() if info)
+
+    # ========== 查询 ==========
+
+    def get(self, ticker: str) -> Optional[Dict]:
+        return self._entries.get(ticker.upper())
+
+    def sectors(self) -> Dict[str, int]:
+        with self._lock:
+            return {sector: len(tickers) for sector, tickers in self._by_sector.items()}
+
+    def _ranked(self, tickers: Iterable[str], limit: Optional[int]) -> List[str]:
+        """按市值降序"""
+        ranked = sorted(tickers, key=lambda t: self._entries[t].get('market_cap') or 0, reverse=True)
+        return ranked[:limit] if limit else ranked
+
+    def group(self, sector: Optional[str] = None, industry: Optional[str] = None,
+              limit: Optional[int] = None) -> List[str]:
+        """某个行业/细分行业的全部股票（按市值降序）"""
+        with self._lock:
+            if industry:
+                tickers = set(self._by_industry.get(industry, ()))
+            elif sector:
+                tickers = set(self._by_sector.get(sector, ()))
+            else:
+                tickers = set()
+            return self._ranked(tickers, limit)
+
+    def peers(self, ticker: str, limit: int = 20, min_industry_size: int = 5) -> Dict:
+        """
+        某只股票的同行（不含自身）
+
+        细分行业内的同行不足 min_industry_size 只时退回到大行业。
+
+        Returns:
+            {'level': 'industry' / 'sector' / None, 'group': 行业名, 'tickers': [...]}
+        """
+        ticker = ticker.upper()
+        entry = self.get(ticker)
+        if entry is None:
+            return {'level': None, 'group': None, 'tickers': []}
+
+        with self._lock:
+            industry_peers = self._by_industry.get(entry.get('industry'), set()) - {ticker}
+            if len(industry_peers) >= min_industry_size:
+                return {'level': 'industry', 'group': entry['industry'],
+                        'tickers': self._ranked(industry_peers, limit)}
+            sector_peers = self._by_sector.get(entry.get('sector'), set()) - {ticker}
+            return {'level': 'sector', 'group': entry.get('sector'),
+                    'tickers': self._ranked(sector_peers, limit)}
+
+    def frame(self, tickers: Iterable[str]) -> pd.DataFrame:
+        """指定股票的缓存指标表（以 ticker 为索引，不在索引中的股票跳过）"""
+        with self._lock:
+            rows = {t.upper(): self._entries[t.upper()] for t in tickers if t.upper() in self._entries}
+        return pd.DataFrame.from_dict(rows, orient='index')
+
+    def sector_frame(self, sectors: Iterable[str], limit_per_sector: Optional[int] = None) -> pd.DataFrame:
+        """若干行业的全部股票指标（每个行业取市值最大的 limit_per_sector 只）"""
+        tickers = []
+        for sector in dict.fromkeys(sectors):
+            tickers.extend(self.group(sector=sector, limit=limit_per_sector))
+        return self.frame(tickers)
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+_index: Optional[PeerIndex] = None
+_index_lock = threading.Lock()
+
+
+def get_peer_index() -> PeerIndex:
+    """进程内共享的同行索引（退出时自动保存）"""
+    global _index
+    if _index is None:
+        with _index_lock:
+            if _index is None:
+                _index = PeerIndex()
+                atexit.register(_index.save, True)
+    return _index
+
+
+def index_infos(infos: Dict[str, Dict], fetched_at: Optional[float] = None) -> None:
+    """用上游拿到的 .info 更新同行索引（失败不影响调用方）"""
+    try:
+        get_peer_index().update_many(infos, fetched_at)
+    except Exception as e:
+        print(f"[WARNING] 更新同行索引失败: {e}")
+
+
+def main(argv: List[str] = None) -> int:
+    parser = argparse.ArgumentParser(description="同行索引维护")
+    parser.add_argument("--seed", help="用选股范围初始化索引（见 config/universes.json）")
+    parser.add_argument("--refresh", type=int, default=0, help="刷新最旧的 N 个过期条目")
+    args = parser.parse_args(argv)
+
+    from data.market_data import get_infos
+
+    index = get_peer_index()
+    if args.seed:
+        from screener.universe import load_universe
+
+        tickers = [t for t in load_universe(args.seed) if index.get(t) is None]
+        print(f"初始化 {len(tickers)} 只股票...")
+        get_infos(tickers)
+    if args.refresh:
+        print(f"刷新 {index.refresh_stale(limit=args.refresh)} 个过期条目")
+
+    index.save(force=True)
+    print(f"索引共 {len(index)} 只股票，{len(index.sectors())} 个行业")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -4,21 +4,132 @@ Arena Judge - 综合分析裁判
 整合多个Agent的分析结果，给出最终投资建议
 """
 
+import os
+from typing import Dict, Optional
+
+from data.analysis_snapshot import AnalysisSnapshot, TickerSnapshot
+from judge.fast_report import build_fast_report
+from judge.prompt_compactor import AGENT_TOKEN_BUDGET, compact_outputs
+from utils.sentiment_engine import get_sentiment_engine
+from utils.token_estimate import estimate_tokens
+from utils.tracing import annotate
+
+# 快速模式：信号一致时按模板生成报告，不调用 LLM（BULLBEAR_JUDGE_FAST=0 关闭）
+FAST_MODE = os.getenv("BULLBEAR_JUDGE_FAST", "1") != "0"
+# 已分析维度的加权评分偏离 50 至少这么多才算"明确"（单个维度和多个维度都适用）
+FAST_THRESHOLD = int(os.getenv("BULLBEAR_JUDGE_FAST_THRESHOLD", "15"))
+# 能用模板覆盖的 Agent（对比分析涉及多只股票，仍交给 LLM）
+FAST_AGENTS = {'fundamental', 'technical', 'sentiment'}
+
+# 综合评分中各维度的权重
+DIMENSION_WEIGHTS = {
+    'fundamental': 0.4,
+    'technical': 0.3,
+    'sentiment': 0.3
+}
+
+AGENT_NAMES = {
+    'fundamental': '【基本面分析】',
+    'technical': '【技术面分析】',
+    'sentiment': '【市场情绪】',
+    'comparison': '【股票对比】'
+}
+
+# 输出格式要求（每次都会发送，尽量简短）
+REPORT_FORMAT = """
+按以下五节输出（保留标题）：📊 综合分析摘要（2-3句）｜💡 投资建议（买入/持有/卖出及理由）｜\
+⚠️ 主要风险（2-3点）｜✨ 投资机会（2-3点）｜🎯 最终结论（1-2句）
+"""
+
 class ArenaJudge:
-    def __init__(self, llm):
+    def __init__(
+        self,
+        llm,
+        fast_mode: bool = FAST_MODE,
+        fast_threshold: int = FAST_THRESHOLD,
+        agent_token_budget: int = AGENT_TOKEN_BUDGET
+    ):
         self.llm = llm
+        self.fast_mode = fast_mode
+        self.fast_threshold = fast_threshold
+        self.agent_token_budget = agent_token_budget
     
-    def synthesize(self, question: str, agent_outputs: dict) -> str:
+    def fast_path_reason(
+        self,
+        agent_outputs: dict,
+        snapshot: Optional[AnalysisSnapshot],
+        score_data: Optional[Dict],
+        ticker: Optional[str]
+    ) -> Optional[str]:
+        """
+        判断能否跳过 LLM 综合
+        
+        Returns:
+            可以走快速模式时返回原因，否则返回 None
+        """
+        if not self.fast_mode or not score_data or not ticker or not agent_outputs:
+            return None
+        if not set(agent_outputs) <= FAST_AGENTS:
+            return None
+        data = snapshot.get(ticker) if snapshot else None
+        # 只看本次运行了 Agent 的维度：综合评分里没分析的维度按 50 计，
+        # 单个维度信号再强，综合评分也到不了阈值
+        dimension_scores = {
+            dimension: score
+            for dimension, score in (self._score_snapshot(data) if data else {}).items()
+            if dimension in agent_outputs
+        }
+        if not dimension_scores:
+            return None
+        
+        deviations = [score - 50 for score in dimension_scores.values() if score != 50]
+        agree = deviations and (all(d > 0 for d in deviations) or all(d < 0 for d in deviations))
+        total_weight = sum(DIMENSION_WEIGHTS[dimension] for dimension in dimension_scores)
+        present_score = sum(
+            score * DIMENSION_WEIGHTS[dimension] for dimension, score in dimension_scores.items()
+        ) / total_weight
+        if not agree or abs(present_score - 50) < self.fast_threshold:
+            return None
+        return "单一维度信号明确" if len(agent_outputs) == 1 else "各维度信号一致"
+    
+    def synthesize(
+        self,
+        question: str,
+        agent_outputs: dict,
+        snapshot: Optional[AnalysisSnapshot] = None,
+        score_data: Optional[Dict] = None,
+        ticker: Optional[str] = None,
+        stats: Optional[Dict] = None
+    ) -> str:
         """
         综合多个Agent的分析结果
         
         Args:
             question: 用户问题
             agent_outputs: {agent_type: output_text} 字典
+            snapshot: 工具收集的结构化数据（可选，作为关键数据附在提示词中）
+            score_data: create_investment_score() 的结果（传入后才可能走快速模式）
+            ticker: 评分的股票
+            stats: 传入字典时写入 Agent 输出压缩统计
+                   （tokens_before / tokens_after / tokens_saved / duplicate_lines / truncated）
         
         Returns:
             综合分析报告
         """
+        reason = self.fast_path_reason(agent_outputs, snapshot, score_data, ticker)
+        annotate(fast_mode=bool(reason))
+        if reason:
+            try:
+                # Agent 原文（新闻标题、具体点位等）压缩后附在模板报告后面
+                compacted = compact_outputs(agent_outputs, self.agent_token_budget)
+                details = {
+                    AGENT_NAMES.get(agent_type, f'【{agent_type}】'): text
+                    for agent_type, text in compacted['outputs'].items()
+                }
+                return build_fast_report(snapshot.get(ticker), score_data, reason, details)
+            except Exception as e:
+                print(f"[WARNING] 快速模式生成报告失败，改用 LLM: {e}")
+        
         try:
             # 确保输入是UTF-8编码
             question = str(question).encode('utf-8', errors='ignore').decode('utf-8')
@@ -32,40 +143,44 @@ class ArenaJudge:
 分析结果：
 """
             
-            # 添加各Agent的分析结果
-            agent_name_map = {
-                'fundamental': '【基本面分析】',
-                'technical': '【技术面分析】',
-                'sentiment': '【市场情绪】',
-                'comparison': '【股票对比】'
-            }
+            # 工具返回的原始数字，避免模型从格式化文本里误读
+            facts = snapshot.format_facts() if snapshot else ""
+            
+            # 去掉装饰、跨 Agent 去重、按预算截断
+            compacted = compact_outputs(
+                {
+                    agent_type: str(output).encode('utf-8', errors='ignore').decode('utf-8')
+                    for agent_type, output in agent_outputs.items()
+                },
+                self.agent_token_budget,
+                known_facts=facts.replace(" | ", "\n").splitlines()
+            )
+            annotate(
+                agent_tokens_before=compacted['tokens_before'],
+                agent_tokens_after=compacted['tokens_after'],
+                agent_tokens_saved=compacted['tokens_saved'],
+                duplicate_lines=compacted['duplicate_lines'],
+                truncated_agents=",".join(compacted['truncated'])
+            )
+            if stats is not None:
+                stats.update({
+                    key: compacted[key]
+                    for key in ('tokens_before', 'tokens_after', 'tokens_saved', 'duplicate_lines', 'truncated')
+                })
             
-            for agent_type, output in agent_outputs.items():
-                agent_name = agent_name_map.get(agent_type, f'【{agent_type}】')
-                # 确保输出是UTF-8编码
-                output_str = str(output).encode('utf-8', errors='ignore').decode('utf-8')
+            for key, output_str in compacted['outputs'].items():
+                # 逐只股票运行的输出键为 'agent_type:TICKER'
+                agent_type, _, key_ticker = key.partition(':')
+                agent_name = AGENT_NAMES.get(agent_type, f'【{agent_type}】')
+                if key_ticker:
+                    agent_name = f"{agent_name[:-1]} · {key_ticker}】"
                 prompt += f"\n{agent_name}\n{output_str}\n"
             
-            # 添加输出格式要求
-            prompt += """
-
-请按以下格式输出综合分析报告：
-
-📊 综合分析摘要
-[用2-3句话总结关键发现]
-
-💡 投资建议
-[明确的投资建议：买入/持有/卖出，并说明理由]
-
-⚠️ 主要风险
-[列出2-3个关键风险点]
-
-✨ 投资机会
-[列出2-3个投资机会]
-
-🎯 最终结论
-[用1-2句话给出最终结论]
-"""
+            if facts:
+                prompt += f"\n【关键数据】\n{facts}\n"
+            
+            prompt += REPORT_FORMAT
+            annotate(prompt_tokens=estimate_tokens(prompt))
             
             # 调用LLM生成综合分析
             response = self.llm.invoke(prompt)
@@ -81,19 +196,27 @@ class ArenaJudge:
 📊 综合分析报告
 ━━━━━━━━━━━━━━━━━━━━━━━━━━━━
 
-{agent_name_map.get(list(agent_outputs.keys())[0], '【分析】') if agent_outputs else '【分析】'}
+{AGENT_NAMES.get(list(agent_outputs.keys())[0], '【分析】') if agent_outputs else '【分析】'}
 ❌ 处理过程中出现错误：{str(e)}
 
 ⚠️ 注意：由于 API 调用失败，以上为原始分析报告。
 """
             return error_msg.encode('utf-8', errors='ignore').decode('utf-8')
     
-    def create_investment_score(self, agent_outputs: dict) -> dict:
+    def create_investment_score(
+        self,
+        agent_outputs: dict,
+        snapshot: Optional[AnalysisSnapshot] = None,
+        ticker: Optional[str] = None
+    ) -> dict:
         """
         创建投资评分
         
         Args:
             agent_outputs: {agent_type: output_text} 字典
+            snapshot: 工具收集的结构化数据（可选）
+            ticker: 评分的股票（snapshot 中有该股票的数据时，按数字评分，
+                    没有数据的维度仍按文本情感评分）
         
         Returns:
             {
@@ -129,33 +252,32 @@ class ArenaJudge:
                 'sentiment': 50
             }
             
-            # 简单评分逻辑（基于关键词）
-            for agent_type, output in agent_outputs.items():
-                if not isinstance(output, str):
-                    continue
-                
-                output_lower = output.lower()
-                
-                # 正面关键词
-                positive_keywords = ['优秀', '强劲', '看涨', '买入', '上涨', '增长', '超预期', '积极', '利好']
-                # 负面关键词
-                negative_keywords = ['疲软', '看跌', '卖出', '下跌', '风险', '担忧', '不及预期', '消极', '利空']
-                
-                pos_count = sum(1 for kw in positive_keywords if kw in output_lower)
-                neg_count = sum(1 for kw in negative_keywords if kw in output_lower)
+            # 评分逻辑（基于共用的情感词典，每个词只计一次，一次批量计算全部输出）
+            text_outputs = {
+                agent_type: output
+                for agent_type, output in agent_outputs.items()
+                if isinstance(output, str)
+            }
+            sentiments = get_sentiment_engine().score_batch(
+                list(text_outputs.values()), unique_terms=True
+            )
+            
+            for agent_type, sentiment in zip(text_outputs.keys(), sentiments):
+                net = sentiment['score']
                 
-                # 根据关键词调整分数
-                if pos_count > neg_count:
-                    scores[agent_type] = min(85, 50 + (pos_count - neg_count) * 10)
-                elif neg_count > pos_count:
-                    scores[agent_type] = max(15, 50 - (neg_count - pos_count) * 10)
+                # 根据情感分调整分数
+                if net > 0:
+                    scores[agent_type] = int(min(85, 50 + net * 10))
+                elif net < 0:
+                    scores[agent_type] = int(max(15, 50 + net * 10))
+            
+            # 有结构化数据的维度直接按数字评分
+            ticker_data = snapshot.get(ticker) if snapshot and ticker else None
+            if ticker_data:
+                scores.update(self._score_snapshot(ticker_data))
             
             # 计算综合分数（加权平均）
-            weights = {
-                'fundamental': 0.4,
-                'technical': 0.3,
-                'sentiment': 0.3
-            }
+            weights = DIMENSION_WEIGHTS
             
             total_score = 0
             total_weight = 0
@@ -201,3 +323,48 @@ class ArenaJudge:
                 'rating': 'Hold',
                 'breakdown': {}
             }
+    
+    def _score_snapshot(self, data: TickerSnapshot) -> Dict[str, int]:
+        """
+        根据结构化数据给各维度打分（15-85，50为中性）
+        
+        Returns:
+            只包含有数据的维度 {'technical': int, 'fundamental': int, 'sentiment': int}
+        """
+        scores = {}
+        
+        if data.has_technical:
+            score = 50
+            if data.trend == '上涨':
+                score += 10
+            elif data.trend == '下跌':
+                score -= 10
+            if data.macd_histogram is not None:
+                score += 10 if data.macd_histogram > 0 else -10
+            if data.rsi < 30:
+                score += 10  # 超卖，反弹空间
+            elif data.rsi > 70:
+                score -= 10  # 超买，回调风险
+            scores['technical'] = max(15, min(85, score))
+        
+        if data.has_fundamental:
+            score = 50
+            if data.roe is not None:
+                score += 10 if data.roe > 0.15 else (-10 if data.roe < 0 else 0)
+            if data.revenue_growth is not None:
+                score += 10 if data.revenue_growth > 0.1 else (-10 if data.revenue_growth < 0 else 0)
+            if data.profit_margin is not None and data.profit_margin > 0.2:
+                score += 5
+            if data.pe is not None:
+                if 0 < data.pe < 15:
+                    score += 5
+                elif data.pe > 40:
+                    score -= 10
+            if data.debt_to_equity is not None and data.debt_to_equity > 200:
+                score -= 10
+            scores['fundamental'] = max(15, min(85, score))
+        
+        if data.has_sentiment and data.news_count:
+            scores['sentiment'] = int(max(15, min(85, 50 + data.sentiment_score * 35)))
+        
+        return scores
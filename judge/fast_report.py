@@ -0,0 +1,131 @@
+# -*- coding: utf-8 -*-
+"""
+快速模式报告
+
+各维度信号一致且评分明确时，Judge 不再调用 LLM，直接用结构化数据和规则评分按模板生成报告，
+格式与 LLM 综合报告相同（摘要 / 建议 / 风险 / 机会 / 结论），后面附上压缩后的 Agent 原文
+（新闻标题、具体点位等模板覆盖不到的内容）。
+"""
+
+from typing import Dict, List, Optional
+
+from data.analysis_snapshot import TickerSnapshot
+
+RATING_NAMES = {'Buy': '买入', 'Hold': '持有', 'Sell': '卖出'}
+
+
+def _dimension_lines(data: TickerSnapshot) -> List[str]:
+    """各维度的关键数据描述"""
+    lines = []
+    if data.has_technical:
+        parts = [f"RSI {data.rsi:.1f}"]
+        if data.trend:
+            parts.insert(0, f"均线趋势{data.trend}")
+        if data.macd_histogram is not None:
+            parts.append(f"MACD柱{'为正' if data.macd_histogram > 0 else '为负'}")
+        lines.append("技术面" + "，".join(parts))
+    if data.has_fundamental:
+        parts = []
+        if data.pe is not None:
+            parts.append(f"PE {data.pe:.1f}")
+        if data.roe is not None:
+            parts.append(f"ROE {data.roe * 100:.1f}%")
+        if data.revenue_growth is not None:
+            parts.append(f"营收增长 {data.revenue_growth * 100:+.1f}%")
+        if data.profit_margin is not None:
+            parts.append(f"利润率 {data.profit_margin * 100:.1f}%")
+        lines.append("基本面" + "，".join(parts))
+    if data.has_sentiment:
+        lines.append(f"近期{data.news_count or 0}条新闻情绪 {data.sentiment_score:+.2f}")
+    return lines
+
+
+def _risks(data: TickerSnapshot) -> List[str]:
+    risks = []
+    if data.has_technical:
+        if data.rsi > 70:
+            risks.append(f"RSI {data.rsi:.1f} 处于超买区，短期有回调风险")
+        if data.trend == '下跌':
+            risks.append("股价位于20日、50日均线下方，趋势偏弱")
+        if data.macd_histogram is not None and data.macd_histogram < 0:
+            risks.append("MACD柱为负，动能减弱")
+    if data.pe is not None and data.pe > 40:
+        risks.append(f"PE {data.pe:.1f} 偏高，估值回落风险")
+    if data.revenue_growth is not None and data.revenue_growth < 0:
+        risks.append(f"营收同比下滑 {data.revenue_growth * 100:.1f}%")
+    if data.debt_to_equity is not None and data.debt_to_equity > 200:
+        risks.append(f"负债权益比 {data.debt_to_equity:.0f}，财务杠杆较高")
+    if data.has_sentiment and data.sentiment_score < -0.2:
+        risks.append("近期新闻情绪偏负面")
+    return risks
+
+
+def _opportunities(data: TickerSnapshot) -> List[str]:
+    opportunities = []
+    if data.has_technical:
+        if data.rsi < 30:
+            opportunities.append(f"RSI {data.rsi:.1f} 处于超卖区，存在反弹空间")
+        if data.trend == '上涨':
+            opportunities.append("股价站上20日、50日均线，趋势向上")
+        if data.macd_histogram is not None and data.macd_histogram > 0:
+            opportunities.append("MACD柱为正，多头动能占优")
+    if data.roe is not None and data.roe > 0.15:
+        opportunities.append(f"ROE {data.roe * 100:.1f}%，盈利能力强")
+    if data.revenue_growth is not None and data.revenue_growth > 0.1:
+        opportunities.append(f"营收增长 {data.revenue_growth * 100:.1f}%，成长性好")
+    if data.pe is not None and 0 < data.pe < 15:
+        opportunities.append(f"PE {data.pe:.1f}，估值偏低")
+    if data.has_sentiment and data.sentiment_score > 0.2:
+        opportunities.append("近期新闻情绪偏正面")
+    return opportunities
+
+
+def build_fast_report(
+    data: TickerSnapshot,
+    score_data: Dict,
+    reason: str,
+    details: Optional[Dict[str, str]] = None
+) -> str:
+    """
+    按模板生成综合分析报告
+
+    Args:
+        data: 评分股票的结构化数据
+        score_data: create_investment_score() 的结果
+        reason: 走快速模式的原因（附在报告末尾）
+        details: {维度标题: 压缩后的 Agent 输出}，附在结论之后
+    """
+    score = score_data.get('score', 50)
+    rating = score_data.get('rating', 'Hold')
+    rating_name = RATING_NAMES.get(rating, rating)
+    name = f"{data.name}（{data.ticker}）" if data.name else data.ticker
+
+    dimensions = _dimension_lines(data)
+    summary = f"{name}"
+    if data.price is not None:
+        summary += f"当前价格 {data.price:.2f}"
+    summary += "。" + "；".join(dimensions) + f"。规则评分 {score}/100。"
+
+    breakdown = score_data.get('breakdown', {})
+    strengths = [dim for dim, delta in breakdown.items() if delta > 0]
+    weaknesses = [dim for dim, delta in breakdown.items() if delta < 0]
+    if rating == 'Buy':
+        advice = f"{rating_name}：{'、'.join(strengths) or '各维度'}信号偏多，整体评分 {score}。"
+    elif rating == 'Sell':
+        advice = f"{rating_name}：{'、'.join(weaknesses) or '各维度'}信号偏空，整体评分 {score}。"
+    else:
+        advice = f"{rating_name}：评分 {score}，信号强度不足以支持加仓或减仓，建议观望。"
+
+    risks = _risks(data)[:3] or ["未出现明显的规则风险信号，仍需关注大盘和行业整体波动"]
+    opportunities = _opportunities(data)[:3] or ["暂无明显的规则机会信号，可等待更清晰的入场时机"]
+
+    report = "📊 综合分析摘要\n" + summary + "\n\n"
+    report += "💡 投资建议\n" + advice + "\n\n"
+    report += "⚠️ 主要风险\n" + "\n".join(f"- {item}" for item in risks) + "\n\n"
+    report += "✨ 投资机会\n" + "\n".join(f"- {item}" for item in opportunities) + "\n\n"
+    report += f"🎯 最终结论\n{data.ticker} 综合评分 {score}，评级 {rating_name}。\n\n"
+    for title, text in (details or {}).items():
+        if text:
+            report += f"📋 {title}\n{text}\n\n"
+    report += f"⚡ 快速模式（{reason}），报告由结构化数据直接生成"
+    return report
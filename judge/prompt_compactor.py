@@ -0,0 +1,113 @@
+# -*- coding: utf-8 -*-
+"""
+Judge 提示词压缩
+
+Agent 的输出原样拼进 Judge 提示词时带着大量只给人看的装饰（emoji 标题、━━━ 分隔线、
+markdown 粗体），不同 Agent 还会重复同一条事实。送进 LLM 之前：
+    1. 去掉装饰字符，压缩空白
+    2. 跨 Agent 去掉重复的行（按归一化后的文本判断，先出现的保留；逐只股票运行的输出
+       键为 'agent_type:TICKER'，只在同一只股票的输出之间去重）
+    3. 每个 Agent 的输出截断到 token 预算以内（本地估算，见 utils/token_estimate.py）
+"""
+
+import os
+import re
+from typing import Dict, Iterable
+
+from utils.token_estimate import estimate_tokens, truncate_to_tokens
+
+# 每个 Agent 输出的 token 上限
+AGENT_TOKEN_BUDGET = int(os.getenv("BULLBEAR_JUDGE_AGENT_TOKENS", "800"))
+# 归一化后短于该长度的行（小标题等）不参与去重
+MIN_DEDUP_LENGTH = 6
+
+_DECORATION_RE = re.compile(
+    "["
+    "\u2500-\u259f"           # 制表符、方块
+    "\u2190-\u21ff"           # 箭头
+    "\u2600-\u27bf"           # 杂项符号、装饰符号（✅ ⚠ ✨ ❌ 等）
+    "\u2b00-\u2bff"
+    "\ufe0f\u200d"            # emoji 变体选择符、连接符
+    "\U0001f000-\U0001faff"   # emoji
+    "]+"
+)
+_MARKDOWN_RE = re.compile(r"\*\*|__|`")
+_LINE_PREFIX_RE = re.compile(r"^\s*(?:#+\s*|[•·*>]\s*|-\s+|\d+(?:[.)]\s+|、))")
+_SPACE_RE = re.compile(r"[ \t\u3000]+")
+_NORMALIZE_RE = re.compile(r"[^0-9a-z\u4e00-\u9fff.%+-]")
+
+
+def strip_decoration(text: str) -> str:
+    """去掉 emoji、分隔线、markdown 标记和列表符号，删除空行"""
+    lines = []
+    for line in str(text).splitlines():
+        line = _DECORATION_RE.sub("", line)
+        line = _MARKDOWN_RE.sub("", line)
+        line = _LINE_PREFIX_RE.sub("", line)
+        line = _SPACE_RE.sub(" ", line).strip()
+        if _NORMALIZE_RE.sub("", line.lower()):
+            lines.append(line)
+    return "\n".join(lines)
+
+
+def _normalize(line: str) -> str:
+    return _NORMALIZE_RE.sub("", line.lower())
+
+
+def compact_outputs(
+    agent_outputs: Dict[str, str],
+    agent_budget: int = AGENT_TOKEN_BUDGET,
+    known_facts: Iterable[str] = ()
+) -> Dict:
+    """
+    压缩各 Agent 的输出
+
+    Args:
+        agent_outputs: {agent_type: output_text}
+        agent_budget: 每个 Agent 的 token 上限
+        known_facts: 提示词中已经包含的行（例如关键数据），重复的行会从 Agent 输出中去掉
+
+    Returns:
+        {
+            'outputs': {agent_type: 压缩后的文本},
+            'tokens_before': int, 'tokens_after': int, 'tokens_saved': int,
+            'duplicate_lines': int, 'truncated': [agent_type, ...]
+        }
+    """
+    facts = {_normalize(fact) for fact in known_facts}
+    seen_by_ticker: Dict[str, set] = {}
+    outputs = {}
+    tokens_before = tokens_after = duplicates = 0
+    truncated = []
+
+    for agent_type, output in agent_outputs.items():
+        output = str(output)
+        tokens_before += estimate_tokens(output)
+        seen = seen_by_ticker.setdefault(agent_type.partition(':')[2], set(facts))
+
+        kept = []
+        for line in strip_decoration(output).splitlines():
+            key = _normalize(line)
+            if len(key) >= MIN_DEDUP_LENGTH:
+                if key in seen:
+                    duplicates += 1
+                    continue
+                seen.add(key)
+            kept.append(line)
+        text = "\n".join(kept)
+
+        if estimate_tokens(text) > agent_budget:
+            text = truncate_to_tokens(text, agent_budget) + "\n…"
+            truncated.append(agent_type)
+
+        outputs[agent_type] = text
+        tokens_after += estimate_tokens(text)
+
+    return {
+        'outputs': outputs,
+        'tokens_before': tokens_before,
+        'tokens_after': tokens_after,
+        'tokens_saved': tokens_before - tokens_after,
+        'duplicate_lines': duplicates,
+        'truncated': truncated
+    }
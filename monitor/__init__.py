@@ -0,0 +1,21 @@
+"""
+Monitor模块 - 自选股后台监控与提醒
+"""
+
+from .watchlist_monitor import (
+    IndicatorState,
+    JsonlAlertSink,
+    QueueAlertSink,
+    WatchlistMonitor,
+    detect_alerts,
+    format_alert
+)
+
+__all__ = [
+    'IndicatorState',
+    'JsonlAlertSink',
+    'QueueAlertSink',
+    'WatchlistMonitor',
+    'detect_alerts',
+    'format_alert'
+]
@@ -0,0 +1,469 @@
+# -*- coding: utf-8 -*-
+"""
+自选股监控
+
+按固定间隔刷新自选股行情，增量更新每只股票的指标状态，触发条件时发出提醒：
+    - RSI 上穿/下穿 30、70
+    - MACD 柱翻转正负
+    - 价格突破布林带上轨/下轨
+    - 未平仓模拟交易接近止损
+
+指标状态只保存计算下一根 K 线所需的最少数据（最近 20 个收盘价和 EMA 的上一值），
+每轮只下载最近几天的日线（共享的 download_closes，每 200 只股票一次请求），
+新 K 线 O(1) 更新 EMA，不需要重新拉取和计算整段历史。状态保存在本地 JSON，
+重启后直接续上；停机太久（刷新窗口与状态之间有缺口）的股票会重新初始化。
+
+每轮最多发出 request_budget 次批量请求，自选股超过容量时按轮转方式分批刷新。
+"""
+
+from __future__ import annotations
+
+import json
+import math
+import os
+import queue
+import threading
+import time
+from dataclasses import asdict, dataclass, field
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional
+
+from data.market_data import DOWNLOAD_CHUNK_SIZE, download_closes
+from trading.paper_trading import PaperTradingTracker
+from utils.lazy_import import lazy_module
+
+pd = lazy_module("pandas")
+
+RSI_PERIOD = 14
+BOLL_PERIOD = 20
+# 保留的收盘价个数（RSI 需要 15 个，布林带需要 20 个）
+WINDOW = max(RSI_PERIOD + 1, BOLL_PERIOD)
+RSI_OVERSOLD = 30
+RSI_OVERBOUGHT = 70
+
+_ALPHA_FAST = 2 / (12 + 1)
+_ALPHA_SLOW = 2 / (26 + 1)
+_ALPHA_SIGNAL = 2 / (9 + 1)
+
+BOOTSTRAP_PERIOD = "6mo"
+REFRESH_PERIOD = "5d"
+
+
+@dataclass
+class IndicatorState:
+    """
+    单只股票的增量指标状态
+
+    EMA 保存的是最后一根 K 线之前的值：同一交易日重复刷新时（盘中价格变化）
+    用新价格替换最后一根 K 线并从上一值重新计算，出现新交易日时再向前推进。
+    与 TechnicalIndicatorTool 的公式一致（EMA adjust=False、RSI 简单平均、布林带样本标准差）。
+    """
+    ticker: str
+    last_date: Optional[str] = None
+    closes: List[float] = field(default_factory=list)
+    ema_fast_prev: Optional[float] = None
+    ema_slow_prev: Optional[float] = None
+    signal_prev: Optional[float] = None
+    bars: int = 0
+    # 上一次计算出的指标（用于判断穿越）
+    last: Dict = field(default_factory=dict)
+    # 已发出的提醒 {类型: K 线日期}，同一根 K 线同类提醒只发一次
+    fired: Dict[str, str] = field(default_factory=dict)
+    # 当前处于止损提醒区间内的交易 ID
+    near_stop: List[int] = field(default_factory=list)
+
+    def _emas(self):
+        """最后一根 K 线的 (EMA12, EMA26, Signal)"""
+        close = self.closes[-1]
+        if self.ema_fast_prev is None:
+            return close, close, 0.0
+        fast = self.ema_fast_prev + _ALPHA_FAST * (close - self.ema_fast_prev)
+        slow = self.ema_slow_prev + _ALPHA_SLOW * (close - self.ema_slow_prev)
+        signal = self.signal_prev + _ALPHA_SIGNAL * ((fast - slow) - self.signal_prev)
+        return fast, slow, signal
+
+    def update(self, date: str, close: float) -> None:
+        """加入一根日线（日期相同则替换最后一根，更早的忽略）"""
+        if self.last_date is None:
+            self.closes = [close]
+            self.last_date = date
+            self.bars = 1
+        elif date == self.last_date:
+            self.closes[-1] = close
+        elif date > self.last_date:
+            self.ema_fast_prev, self.ema_slow_prev, self.signal_prev = self._emas()
+            self.closes.append(close)
+            del self.closes[:-WINDOW]
+            self.last_date = date
+            self.bars += 1
+
+    def indicators(self) -> Optional[Dict]:
+        """当前指标（数据不足的项为 None）"""
+        if not self.closes:
+            return None
+
+        fast, slow, signal = self._emas()
+        macd = fast - slow
+        result = {
+            'date': self.last_date,
+            'price': self.closes[-1],
+            'rsi': None,
+            'macd': macd,
+            'macd_histogram': macd - signal,
+            'bollinger_upper': None,
+            'bollinger_lower': None
+        }
+
+        if len(self.closes) > RSI_PERIOD:
+            window = self.closes[-(RSI_PERIOD + 1):]
+            deltas = [b - a for a, b in zip(window, window[1:])]
+            gain = sum(d for d in deltas if d > 0) / RSI_PERIOD
+            loss = -sum(d for d in deltas if d < 0) / RSI_PERIOD
+            if loss > 0:
+                result['rsi'] = 100 - 100 / (1 + gain / loss)
+            elif gain > 0:
+                result['rsi'] = 100.0
+
+        if len(self.closes) >= BOLL_PERIOD:
+            window = self.closes[-BOLL_PERIOD:]
+            mean = sum(window) / BOLL_PERIOD
+            std = math.sqrt(sum((c - mean) ** 2 for c in window) / (BOLL_PERIOD - 1))
+            result['bollinger_upper'] = mean + 2 * std
+            result['bollinger_lower'] = mean - 2 * std
+
+        return result
+
+    @classmethod
+    def from_dict(cls, data: Dict) -> "IndicatorState":
+        return cls(**data)
+
+
+def _crossed(previous: Optional[float], current: Optional[float], level: float) -> int:
+    """上穿返回 1，下穿返回 -1，否则 0"""
+    if previous is None or current is None:
+        return 0
+    if previous < level <= current:
+        return 1
+    if previous > level >= current:
+        return -1
+    return 0
+
+
+def detect_alerts(state: IndicatorState, current: Dict) -> List[Dict]:
+    """
+    比较上一次和本次指标，返回触发的提醒（不含止损提醒）
+
+    第一次计算（没有上一次指标）不触发
+    """
+    previous = state.last
+    if not previous:
+        return []
+
+    alerts = []
+    price = current['price']
+
+    for level, up_type, up_msg, down_type, down_msg in (
+        (RSI_OVERSOLD, 'rsi_exit_oversold', "RSI上穿30，离开超卖区", 'rsi_oversold', "RSI跌破30，进入超卖区"),
+        (RSI_OVERBOUGHT, 'rsi_overbought', "RSI突破70，进入超买区", 'rsi_exit_overbought', "RSI回落到70以下，离开超买区")
+    ):
+        direction = _crossed(previous.get('rsi'), current['rsi'], level)
+        if direction:
+            alert_type, message = (up_type, up_msg) if direction > 0 else (down_type, down_msg)
+            alerts.append({'type': alert_type, 'message': f"{message}（RSI {current['rsi']:.1f}）",
+                           'value': round(current['rsi'], 2)})
+
+    direction = _crossed(previous.get('macd_histogram'), current['macd_histogram'], 0.0)
+    if direction:
+        alerts.append({
+            'type': 'macd_bullish' if direction > 0 else 'macd_bearish',
+            'message': "MACD柱由负转正（金叉）" if direction > 0 else "MACD柱由正转负（死叉）",
+            'value': round(current['macd_histogram'], 4)
+        })
+
+    upper, lower = current['bollinger_upper'], current['bollinger_lower']
+    prev_price = previous.get('price')
+    if upper is not None and prev_price is not None and previous.get('bollinger_upper') is not None:
+        if prev_price <= previous['bollinger_upper'] and price > upper:
+            alerts.append({'type': 'boll_break_upper', 'message': f"价格突破布林带上轨 ${upper:.2f}",
+                           'value': round(upper, 2)})
+        if prev_price >= previous['bollinger_lower'] and price < lower:
+            alerts.append({'type': 'boll_break_lower', 'message': f"价格跌破布林带下轨 ${lower:.2f}",
+                           'value': round(lower, 2)})
+
+    return alerts
+
+
+class JsonlAlertSink:
+    """把提醒追加写入 JSONL 文件"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+
+    def emit(self, alerts: List[Dict]) -> None:
+        if not alerts:
+            return
+        with self._lock, open(self.path, 'a', encoding='utf-8') as f:
+            for alert in alerts:
+                f.write(json.dumps(alert, ensure_ascii=False) + '\n')
+
+
+class QueueAlertSink:
+    """把提醒放入队列（同进程内的消费者使用）"""
+
+    def __init__(self, alert_queue: Optional[queue.Queue] = None):
+        self.queue = alert_queue or queue.Queue()
+
+    def emit(self, alerts: List[Dict]) -> None:
+        for alert in alerts:
+            self.queue.put(alert)
+
+
+class WatchlistMonitor:
+    """自选股监控器"""
+
+    def __init__(
+        self,
+        tickers: Iterable[str],
+        sinks: Optional[List] = None,
+        state_file: Optional[str] = None,
+        trades_file: Optional[str] = "paper_trades.json",
+        stop_proximity_pct: float = 2.0,
+        request_budget: int = 20
+    ):
+        """
+        Args:
+            tickers: 自选股（未平仓模拟交易的股票会自动加入）
+            sinks: 提醒输出（有 emit(alerts) 方法的对象）
+            state_file: 指标状态文件，None 表示只保存在内存
+            trades_file: 模拟盘交易文件，None 表示不检查止损
+            stop_proximity_pct: 价格距止损不超过该百分比时提醒
+            request_budget: 每轮最多的批量下载请求数
+        """
+        self.tickers = list(dict.fromkeys(t.upper() for t in tickers))
+        self.sinks = sinks or []
+        self.state_file = state_file
+        self.trades_file = trades_file
+        self.stop_proximity_pct = stop_proximity_pct
+        self.request_budget = max(1, request_budget)
+        self.states: Dict[str, IndicatorState] = self._load_state()
+        self._cursor = 0
+
+    # ========== 状态持久化 ==========
+
+    def _load_state(self) -> Dict[str, IndicatorState]:
+        if not self.state_file or not os.path.exists(self.state_file):
+            return {}
+        try:
+            with open(self.state_file, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            return {ticker: IndicatorState.from_dict(item) for ticker, item in data.items()}
+        except Exception as e:
+            print(f"[WARNING] 加载监控状态失败，将重新初始化: {e}")
+            return {}
+
+    def save_state(self) -> None:
+        if not self.state_file:
+            return
+        directory = os.path.dirname(self.state_file)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        temp_path = f"{self.state_file}.tmp"
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            json.dump({ticker: asdict(state) for ticker, state in self.states.items()}, f)
+        os.replace(temp_path, self.state_file)
+
+    # ========== 单轮刷新 ==========
+
+    def _open_trades(self) -> List[Dict]:
+        if not self.trades_file or not os.path.exists(self.trades_file):
+            return []
+        # 每轮重新读取，界面/API 新增的交易下一轮生效
+        return PaperTradingTracker(data_file=self.trades_file).get_open_trades()
+
+    def _plan(self, tickers: List[str]) -> Dict[str, List[str]]:
+        """按请求预算分配本轮要初始化和刷新的股票"""
+        capacity = self.request_budget * DOWNLOAD_CHUNK_SIZE
+        pending = [t for t in tickers if t not in self.states]
+        bootstrap = pending[:capacity]
+
+        # 初始化用掉的请求数之外，剩余容量轮转刷新已有状态的股票
+        used = math.ceil(len(bootstrap) / DOWNLOAD_CHUNK_SIZE)
+        remaining = (self.request_budget - used) * DOWNLOAD_CHUNK_SIZE
+        ready = [t for t in tickers if t in self.states]
+        if len(ready) <= remaining:
+            refresh = ready
+        else:
+            start = self._cursor % len(ready)
+            refresh = (ready[start:] + ready[:start])[:remaining]
+            self._cursor = start + remaining
+        return {'bootstrap': bootstrap, 'refresh': refresh}
+
+    def _apply(
+        self,
+        closes: pd.DataFrame,
+        trades_by_ticker: Dict[str, List[Dict]],
+        detect: bool = True
+    ) -> List[Dict]:
+        """
+        把下载的收盘价写入状态并检测提醒
+
+        Args:
+            detect: False 时只建立状态（初始化阶段不对历史数据发提醒）
+        """
+        if closes.empty:
+            return []
+
+        closes = closes.sort_index()
+        dates = [d.strftime("%Y-%m-%d") for d in closes.index]
+        first_date = dates[0]
+        now = datetime.now().isoformat(timespec='seconds')
+        alerts = []
+
+        for ticker in closes.columns:
+            state = self.states.get(ticker)
+            if state is not None and state.last_date and state.last_date < first_date:
+                # 状态与刷新窗口之间有缺口，下一轮重新初始化
+                del self.states[ticker]
+                continue
+            if state is None:
+                state = self.states[ticker] = IndicatorState(ticker=ticker)
+
+            for date, close in zip(dates, closes[ticker].to_numpy()):
+                if close == close:
+                    state.update(date, float(close))
+
+            current = state.indicators()
+            if current is None:
+                continue
+            if not detect:
+                state.last = current
+                continue
+
+            found = detect_alerts(state, current)
+            found.extend(self._check_stops(state, current, trades_by_ticker.get(ticker, [])))
+            for alert in found:
+                if state.fired.get(alert['type']) == state.last_date:
+                    continue
+                if alert['type'] != 'near_stop':
+                    state.fired[alert['type']] = state.last_date
+                alerts.append({'time': now, 'ticker': ticker, 'date': state.last_date,
+                               'price': round(current['price'], 2), **alert})
+            state.last = current
+
+        return alerts
+
+    def _check_stops(self, state: IndicatorState, current: Dict, trades: List[Dict]) -> List[Dict]:
+        """未平仓交易接近/触及止损（进入区间时提醒一次，离开后重置）"""
+        alerts = []
+        price = current['price']
+        near = []
+        for trade in trades:
+            stop = trade['stop_loss']
+            if trade['action'] == 'BUY':
+                distance = (price - stop) / price * 100
+            else:
+                distance = (stop - price) / price * 100
+            if distance > self.stop_proximity_pct:
+                continue
+
+            near.append(trade['id'])
+            if trade['id'] in state.near_stop:
+                continue
+            status = "已触及止损" if distance <= 0 else f"距止损仅 {distance:.1f}%"
+            alerts.append({
+                'type': 'near_stop',
+                'message': f"模拟交易 #{trade['id']}（{trade['action']}）{status}，止损 ${stop:.2f}",
+                'value': round(distance, 2),
+                'trade_id': trade['id']
+            })
+        state.near_stop = near
+        return alerts
+
+    def run_cycle(self) -> Dict:
+        """
+        执行一轮刷新
+
+        Returns:
+            {'watched', 'bootstrapped', 'refreshed', 'requests', 'alerts', 'elapsed'}
+        """
+        start_time = time.time()
+        trades = self._open_trades()
+        trades_by_ticker: Dict[str, List[Dict]] = {}
+        for trade in trades:
+            trades_by_ticker.setdefault(trade['ticker'].upper(), []).append(trade)
+
+        tickers = list(dict.fromkeys(self.tickers + list(trades_by_ticker)))
+        plan = self._plan(tickers)
+        alerts = []
+        requests = 0
+
+        for group, period in (('bootstrap', BOOTSTRAP_PERIOD), ('refresh', REFRESH_PERIOD)):
+            if not plan[group]:
+                continue
+            requests += math.ceil(len(plan[group]) / DOWNLOAD_CHUNK_SIZE)
+            try:
+                closes = download_closes(plan[group], period)
+            except Exception as e:
+                print(f"[ERROR] 监控行情下载失败（{group}）: {e}")
+                continue
+            alerts.extend(self._apply(closes, trades_by_ticker, detect=(group == 'refresh')))
+
+        for sink in self.sinks:
+            try:
+                sink.emit(alerts)
+            except Exception as e:
+                print(f"[ERROR] 提醒输出失败: {e}")
+        self.save_state()
+
+        return {
+            'watched': len(tickers),
+            'bootstrapped': len(plan['bootstrap']),
+            'refreshed': len(plan['refresh']),
+            'requests': requests,
+            'alerts': alerts,
+            'elapsed': round(time.time() - start_time, 3)
+        }
+
+    def run_forever(
+        self,
+        interval: float = 300,
+        stop_event: Optional[threading.Event] = None,
+        max_cycles: Optional[int] = None
+    ) -> None:
+        """
+        按间隔循环刷新，直到 stop_event 被设置
+
+        Args:
+            interval: 两轮开始之间的间隔（秒）
+            max_cycles: 最多执行的轮数（None 表示不限）
+        """
+        stop_event = stop_event or threading.Event()
+        cycles = 0
+        while not stop_event.is_set():
+            cycle_start = time.time()
+            try:
+                summary = self.run_cycle()
+                print(
+                    f"[monitor] {datetime.now():%H:%M:%S} 监控 {summary['watched']} 只，"
+                    f"初始化 {summary['bootstrapped']}，刷新 {summary['refreshed']}，"
+                    f"请求 {summary['requests']} 次，提醒 {len(summary['alerts'])} 条，"
+                    f"耗时 {summary['elapsed']:.1f}s"
+                )
+            except Exception as e:
+                print(f"[ERROR] 监控刷新失败: {e}")
+
+            cycles += 1
+            if max_cycles is not None and cycles >= max_cycles:
+                break
+            stop_event.wait(max(0.0, interval - (time.time() - cycle_start)))
+
+
+def format_alert(alert: Dict) -> str:
+    """单条提醒的显示文本"""
+    icons = {
+        'rsi_oversold': '🟢', 'rsi_exit_oversold': '🟢', 'rsi_overbought': '🔴', 'rsi_exit_overbought': '🔴',
+        'macd_bullish': '📈', 'macd_bearish': '📉', 'boll_break_upper': '⬆️', 'boll_break_lower': '⬇️',
+        'near_stop': '⚠️'
+    }
+    return f"{icons.get(alert['type'], '🔔')} {alert['ticker']} ${alert['price']:.2f} - {alert['message']}"
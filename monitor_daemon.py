@@ -0,0 +1,85 @@
+# -*- coding: utf-8 -*-
+"""
+自选股监控守护进程
+
+按 config/watchlist.json 的配置定时刷新自选股，指标触发条件时把提醒追加写入 JSONL 文件
+（同时打印到标准输出）。Ctrl+C / SIGTERM 会在当前一轮结束后退出并保存状态。
+
+用法：
+    python monitor_daemon.py                         # 使用配置文件
+    python monitor_daemon.py --universe sp500 --interval 600
+    python monitor_daemon.py --tickers AAPL,MSFT,NVDA --once
+"""
+
+import argparse
+import json
+import os
+import signal
+import sys
+import threading
+from typing import List
+
+from monitor.watchlist_monitor import JsonlAlertSink, WatchlistMonitor, format_alert
+from screener.universe import load_universe
+
+DEFAULT_CONFIG = os.path.join(os.path.dirname(os.path.abspath(__file__)), "config", "watchlist.json")
+
+
+class _PrintSink:
+    """把提醒打印到标准输出"""
+
+    def emit(self, alerts):
+        for alert in alerts:
+            print(format_alert(alert), flush=True)
+
+
+def main(argv: List[str] = None) -> int:
+    parser = argparse.ArgumentParser(description="BullBearQA 自选股监控")
+    parser.add_argument("--config", default=DEFAULT_CONFIG, help="监控配置文件")
+    parser.add_argument("--tickers", help="逗号分隔的股票列表（覆盖配置）")
+    parser.add_argument("--universe", help="选股范围名称（覆盖配置，见 config/universes.json）")
+    parser.add_argument("--interval", type=float, help="刷新间隔（秒）")
+    parser.add_argument("--budget", type=int, help="每轮最多的批量下载请求数")
+    parser.add_argument("--alerts", help="提醒输出 JSONL 文件")
+    parser.add_argument("--state", help="指标状态文件")
+    parser.add_argument("--once", action="store_true", help="只执行一轮")
+    args = parser.parse_args(argv)
+
+    config = {}
+    if os.path.exists(args.config):
+        with open(args.config, 'r', encoding='utf-8') as f:
+            config = json.load(f)
+
+    if args.tickers:
+        tickers = [t.strip() for t in args.tickers.split(',') if t.strip()]
+    else:
+        tickers = list(config.get('tickers', []))
+        universe = args.universe or config.get('universe')
+        if universe:
+            tickers.extend(load_universe(universe))
+    if not tickers:
+        parser.error("没有要监控的股票，请通过 --tickers / --universe 或配置文件指定")
+
+    monitor = WatchlistMonitor(
+        tickers,
+        sinks=[JsonlAlertSink(args.alerts or config.get('alerts_file', 'alerts.jsonl')), _PrintSink()],
+        state_file=args.state or config.get('state_file'),
+        trades_file=config.get('trades_file', 'paper_trades.json'),
+        stop_proximity_pct=config.get('stop_proximity_pct', 2.0),
+        request_budget=args.budget or config.get('request_budget', 20)
+    )
+
+    stop_event = threading.Event()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        signal.signal(sig, lambda *_: stop_event.set())
+
+    monitor.run_forever(
+        interval=args.interval or config.get('interval_seconds', 300),
+        stop_event=stop_event,
+        max_cycles=1 if args.once else None
+    )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
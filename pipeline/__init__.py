@@ -0,0 +1,12 @@
+"""
+Pipeline模块 - 路由 → Agent → Judge 分析流程
+"""
+
+from .analysis_pipeline import AnalysisPipeline, LazyComponents, build_components, build_llm
+
+__all__ = [
+    'AnalysisPipeline',
+    'LazyComponents',
+    'build_components',
+    'build_llm'
+]
@@ -0,0 +1,532 @@
+# -*- coding: utf-8 -*-
+"""
+分析流程：路由 → Agent → Judge → 评分 → 策略
+Streamlit、API服务共用同一套流程
+"""
+
+import contextvars
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, List, Optional, Tuple
+
+from agents.conversation_memory import ConversationMemory, refers_to_history
+from data.analysis_snapshot import AnalysisSnapshot, collect_snapshot
+from data.cache_warmer import record_request
+from pipeline.answer_cache import CACHEABLE_AGENTS, AnswerCache, data_version, get_answer_cache
+from utils.startup_profile import timed
+from utils.tracing import get_tracing_handler, span, start_trace
+
+# 多只股票的单维度问题（如"NVDA、AMD、INTC技术面如何"）逐只运行 Agent
+FANOUT_AGENTS = {'fundamental', 'technical', 'sentiment'}
+# 每个请求同时运行的 Agent 数
+FANOUT_WORKERS = int(os.getenv("BULLBEAR_AGENT_FANOUT", "3"))
+# 一个问题最多展开的股票数
+MAX_FANOUT_TICKERS = 8
+
+
+def build_llm(api_key: str):
+    """创建 DeepSeek LLM"""
+    with timed("import", "langchain_openai"):
+        from langchain_openai import ChatOpenAI
+    
+    return ChatOpenAI(
+        model="deepseek-chat",
+        openai_api_key=api_key,
+        openai_api_base="https://api.deepseek.com",
+        temperature=0.7,
+        callbacks=[get_tracing_handler()]
+    )
+
+
+class LazyComponents:
+    """
+    按需构建的组件字典
+    
+    组件在第一次通过 [] / get() 访问时才导入对应模块并构建，
+    冷启动只需要付出实际用到的 Agent 的代价。线程安全。
+    """
+    
+    def __init__(self, factories: Dict[str, Callable[[], object]]):
+        self._factories = factories
+        self._instances: Dict[str, object] = {}
+        self._lock = threading.RLock()
+    
+    def __getitem__(self, name: str):
+        instance = self._instances.get(name)
+        if instance is not None:
+            return instance
+        
+        if name not in self._factories:
+            raise KeyError(name)
+        
+        with self._lock:
+            instance = self._instances.get(name)
+            if instance is None:
+                with timed("construct", name):
+                    instance = self._factories[name]()
+                self._instances[name] = instance
+        return instance
+    
+    def get(self, name: str, default=None):
+        """与 dict.get 相同"""
+        try:
+            return self[name]
+        except KeyError:
+            return default
+    
+    def __contains__(self, name: str) -> bool:
+        return name in self._factories
+    
+    def keys(self):
+        return self._factories.keys()
+    
+    def loaded(self) -> Dict[str, bool]:
+        """各组件是否已构建"""
+        return {name: name in self._instances for name in self._factories}
+
+
+def build_components(api_key: str) -> LazyComponents:
+    """
+    注册所有组件（按需构建）
+    
+    LLM 在第一个需要它的组件构建时才创建，之后所有组件共用
+    """
+    llm_holder = {}
+    
+    def get_llm():
+        if 'llm' not in llm_holder:
+            llm_holder['llm'] = build_llm(api_key)
+        return llm_holder['llm']
+    
+    def router():
+        from router.question_router import QuestionRouter
+        return QuestionRouter(get_llm())
+    
+    def fundamental_agent():
+        from agents.fundamental_agent import FundamentalAgent
+        return FundamentalAgent(get_llm())
+    
+    def technical_agent():
+        from agents.technical_agent import TechnicalAgent
+        return TechnicalAgent(get_llm())
+    
+    def sentiment_agent():
+        from agents.sentiment_agent import SentimentAgent
+        return SentimentAgent(get_llm())
+    
+    def comparison_agent():
+        from agents.comparison_agent import ComparisonAgent
+        return ComparisonAgent(get_llm())
+    
+    def screener_agent():
+        from screener.screener import StockScreener
+        return StockScreener()
+    
+    def judge():
+        from judge.arena_judge import ArenaJudge
+        return ArenaJudge(get_llm())
+    
+    def strategy_generator():
+        from trading.strategy_generator import StrategyGenerator
+        return StrategyGenerator()
+    
+    def options_recommender():
+        from trading.options_recommender import OptionsRecommender
+        return OptionsRecommender()
+    
+    return LazyComponents({
+        'router': router,
+        'fundamental_agent': fundamental_agent,
+        'technical_agent': technical_agent,
+        'sentiment_agent': sentiment_agent,
+        'comparison_agent': comparison_agent,
+        'screener_agent': screener_agent,
+        'judge': judge,
+        'strategy_generator': strategy_generator,
+        'options_recommender': options_recommender
+    })
+
+
+class AnalysisPipeline:
+    """
+    分析流程
+    
+    每个阶段都可以单独调用（方便UI逐步展示进度），
+    也可以用 analyze() 一次跑完整个流程。
+    """
+    
+    def __init__(self, components: Dict, answer_cache: Optional[AnswerCache] = None):
+        """
+        Args:
+            components: build_components() 返回的组件（也可以是普通字典）
+            answer_cache: 答案缓存（默认使用进程内共享的 SQLite 缓存）
+        """
+        self.components = components
+        self._answer_cache = answer_cache
+    
+    @property
+    def router(self):
+        return self.components['router']
+    
+    @property
+    def judge(self):
+        return self.components['judge']
+    
+    @property
+    def strategy_generator(self):
+        return self.components['strategy_generator']
+    
+    @property
+    def answer_cache(self) -> Optional[AnswerCache]:
+        return self._answer_cache or get_answer_cache()
+    
+    def get_agent(self, agent_type: str):
+        """根据类型获取 Agent"""
+        return self.components.get(f'{agent_type}_agent')
+    
+    def route(self, question: str, memory: Optional[ConversationMemory] = None) -> Dict:
+        """
+        问题路由（同时记录涉及的股票，供缓存预热统计热门股票）
+        
+        逐只运行的问题超过 MAX_FANOUT_TICKERS 只股票时只保留前面的，
+        多出的放在 'dropped_tickers' 中，后续的 Agent、评分和策略都只针对保留的股票。
+        'follow_up' 标记问题是否是追问。
+        
+        Args:
+            memory: 对话记忆（追问没有提到股票时沿用上一轮的股票）
+        """
+        with span("route") as route_span:
+            result = self.router.route(question, memory.last_tickers() if memory else None)
+            tickers = result.get('tickers', [])
+            if result['agent_type'] in FANOUT_AGENTS and len(tickers) > MAX_FANOUT_TICKERS:
+                result['tickers'] = tickers[:MAX_FANOUT_TICKERS]
+                result['dropped_tickers'] = tickers[MAX_FANOUT_TICKERS:]
+                route_span.set_attributes(dropped_tickers=",".join(result['dropped_tickers']))
+            record_request(result.get('tickers', []))
+            # 追问（沿用上一轮的股票，或者问题指代前文）要结合对话历史回答，不使用答案缓存
+            has_history = memory is not None and len(memory) > 0
+            result['follow_up'] = result.get('tickers_from_context', False) or (has_history and refers_to_history(question))
+            route_span.set_attributes(
+                agent_type=result['agent_type'],
+                method=result['method'],
+                tickers=",".join(result.get('tickers', []))
+            )
+        return result
+    
+    def run_agents(
+        self,
+        question: str,
+        routing_result: Dict,
+        snapshot: Optional[AnalysisSnapshot] = None,
+        chat_history: Optional[List[Tuple[str, str]]] = None
+    ) -> Dict:
+        """
+        执行路由选中的 Agent
+        
+        Args:
+            snapshot: 传入时，工具调用得到的结构化数据会写入其中
+            chat_history: 之前的对话（ConversationMemory.messages()）
+        
+        Returns:
+            {agent_type: output_text} 字典；单维度问题涉及多只股票时每只股票并发运行一次，
+            键为 'agent_type:TICKER'（Judge 一次综合全部输出）
+        """
+        agent_type = routing_result['agent_type']
+        selected_agent = self.get_agent(agent_type)
+        if not selected_agent:
+            return {}
+        
+        # 追问沿用了上一轮的股票时，把股票代码写进问题，Agent 不必从历史里猜
+        if routing_result.get('tickers_from_context'):
+            question = f"{question}（{', '.join(routing_result['tickers'])}）"
+        
+        snapshot = snapshot if snapshot is not None else AnalysisSnapshot()
+        tickers = self.fanout_tickers(routing_result)
+        
+        def run_one(ticker: Optional[str]) -> str:
+            ticker_question = f"{question}\n（本次只分析 {ticker}）" if ticker else question
+            with span(f"agent:{agent_type}", ticker=ticker or ""), collect_snapshot(snapshot):
+                return selected_agent.run(ticker_question, chat_history)
+        
+        if not tickers:
+            return {agent_type: run_one(None)}
+        
+        # 每个任务复制一份上下文，各 Agent 的 Span 挂在当前请求下
+        with ThreadPoolExecutor(max_workers=min(FANOUT_WORKERS, len(tickers)), thread_name_prefix="agent") as executor:
+            futures = [executor.submit(contextvars.copy_context().run, run_one, t) for t in tickers]
+            outputs = [future.result() for future in futures]
+        return {f"{agent_type}:{ticker}": output for ticker, output in zip(tickers, outputs)}
+    
+    def fanout_tickers(self, routing_result: Dict) -> List[str]:
+        """需要逐只运行 Agent 的股票（单维度问题涉及多只股票时），否则为空列表"""
+        tickers = routing_result.get('tickers', [])
+        if routing_result['agent_type'] in FANOUT_AGENTS and len(tickers) > 1:
+            # route() 已经截断到 MAX_FANOUT_TICKERS，这里再截一次防止直接传入的路由结果过长
+            return tickers[:MAX_FANOUT_TICKERS]
+        return []
+    
+    @staticmethod
+    def outputs_for(agent_outputs: Dict, ticker: str) -> Dict:
+        """
+        某只股票相关的 Agent 输出（评分用）
+        
+        逐只运行的输出键为 'agent_type:TICKER'，取该股票的部分并还原为 agent_type；
+        其他输出（对比等）所有股票共用。
+        """
+        result = {}
+        for key, output in agent_outputs.items():
+            agent_type, _, key_ticker = key.partition(':')
+            if not key_ticker or key_ticker == ticker:
+                result[agent_type] = output
+        return result
+    
+    @staticmethod
+    def _cacheable(routing_result: Dict) -> bool:
+        """
+        能否使用答案缓存
+        
+        缓存键不含问题本身（"AAPL的RSI是多少"和"AAPL支撑位在哪"共用一份技术面报告）。
+        追问（route() 标记的 follow_up）要结合上下文回答，不读也不写缓存；
+        同一会话里与前文无关的问题照常使用缓存。
+        """
+        if routing_result.get('follow_up') or routing_result.get('tickers_from_context'):
+            return False
+        return routing_result['agent_type'] in CACHEABLE_AGENTS and bool(routing_result.get('tickers'))
+    
+    def cached_answer(self, routing_result: Dict) -> Optional[Dict]:
+        """
+        相同意图（分析类型 + 股票）且数据版本没变时，之前的答案
+        
+        缓存中的价格可能是一个交易日前的，命中时生成策略应传 live_price=True。
+        
+        Returns:
+            {'agent_outputs', 'report', 'snapshot': AnalysisSnapshot}，未命中时返回 None
+        """
+        cache = self.answer_cache
+        if cache is None or not self._cacheable(routing_result):
+            return None
+        agent_type, tickers = routing_result['agent_type'], routing_result['tickers']
+        with span("answer_cache") as cache_span:
+            payload = cache.get(agent_type, tickers, data_version(agent_type, tickers))
+            cache_span.set_attributes(hit=payload is not None)
+        if payload is None:
+            return None
+        payload['snapshot'] = AnalysisSnapshot.from_dict(payload['snapshot'])
+        return payload
+    
+    def store_answer(
+        self,
+        routing_result: Dict,
+        agent_outputs: Dict,
+        report: str,
+        snapshot: AnalysisSnapshot
+    ) -> None:
+        """写入答案缓存（出错的回答、追问的回答不缓存；数据版本按 Agent 运行后的数据计算）"""
+        cache = self.answer_cache
+        if cache is None or not self._cacheable(routing_result) or not agent_outputs:
+            return
+        if any(str(output).startswith(('❌', '⚠️')) for output in agent_outputs.values()):
+            return
+        if '处理过程中出现错误' in report:
+            return
+        agent_type, tickers = routing_result['agent_type'], routing_result['tickers']
+        cache.put(agent_type, tickers, data_version(agent_type, tickers), {
+            'agent_outputs': agent_outputs,
+            'report': report,
+            'snapshot': snapshot.to_dict()
+        })
+    
+    def synthesize(
+        self,
+        question: str,
+        agent_outputs: Dict,
+        snapshot: Optional[AnalysisSnapshot] = None,
+        score_data: Optional[Dict] = None,
+        ticker: Optional[str] = None,
+        stats: Optional[Dict] = None
+    ) -> str:
+        """
+        Judge 综合分析，返回报告文本（选股结果本身就是报告，不再经过 LLM）
+        
+        Args:
+            score_data: 先算好的评分（传入时信号一致可走 Judge 快速模式，不调用 LLM）
+            stats: 传入字典时写入 Agent 输出压缩统计（节省的 token 数等）
+        """
+        if set(agent_outputs) == {'screener'}:
+            return agent_outputs['screener']
+        with span("judge", agents=",".join(agent_outputs.keys())):
+            return self.judge.synthesize(question, agent_outputs, snapshot, score_data, ticker, stats)
+    
+    def score(
+        self,
+        agent_outputs: Dict,
+        snapshot: Optional[AnalysisSnapshot] = None,
+        ticker: Optional[str] = None
+    ) -> Dict:
+        """投资评分（score / rating / breakdown），ticker 为空时只按文本评分"""
+        if ticker:
+            agent_outputs = self.outputs_for(agent_outputs, ticker)
+        with span("score", ticker=ticker or "") as score_span:
+            score_data = self.judge.create_investment_score(agent_outputs, snapshot, ticker)
+            score_span.set_attributes(score=score_data.get('score'), rating=score_data.get('rating'))
+        return score_data
+    
+    def score_all(
+        self,
+        agent_outputs: Dict,
+        snapshot: Optional[AnalysisSnapshot],
+        tickers: List[str]
+    ) -> Dict[str, Dict]:
+        """每只股票的投资评分 {ticker: score_data}"""
+        return {ticker: self.score(agent_outputs, snapshot, ticker) for ticker in tickers}
+    
+    def generate_strategy(
+        self,
+        ticker: str,
+        rating: str,
+        snapshot: Optional[AnalysisSnapshot] = None,
+        risk_tolerance: str = "medium",
+        live_price: bool = False
+    ) -> Optional[Dict]:
+        """
+        生成交易策略（Hold 评级按 Buy 生成参考策略）
+        
+        Args:
+            snapshot: 分析时收集的结构化数据（其中有价格时不再请求 yfinance）
+            live_price: 不使用 snapshot 中的价格，重新获取（snapshot 来自答案缓存时）
+        """
+        strategy_rating = rating if rating in ['Buy', 'Sell'] else 'Buy'
+        analysis = snapshot.to_analysis(ticker) if snapshot else {}
+        if live_price:
+            analysis['price'] = None
+        with span("strategy", ticker=ticker, risk=risk_tolerance) as strategy_span:
+            strategy_span.set_attributes(price_from_snapshot=bool(analysis.get('price')))
+            return self.strategy_generator.generate_strategy(
+                ticker=ticker,
+                rating=strategy_rating,
+                analysis_result=analysis,
+                risk_tolerance=risk_tolerance
+            )
+    
+    def analyze(
+        self,
+        question: str,
+        risk_tolerance: str = "medium",
+        include_strategy: bool = True,
+        request_id: Optional[str] = None,
+        memory: Optional[ConversationMemory] = None
+    ) -> Dict:
+        """
+        执行完整分析流程
+        
+        Args:
+            question: 用户问题
+            risk_tolerance: 风险偏好（low/medium/high）
+            include_strategy: 是否生成交易策略
+            request_id: 请求ID（用于追踪，不传则自动生成）
+            memory: 对话记忆（传入时支持追问，本轮结束后写入记忆）
+        
+        Returns:
+            {
+                'request_id', 'question', 'routing', 'tickers', 'ticker', 'agent_outputs',
+                'snapshot', 'report', 'score', 'rating', 'strategy',
+                'scores': {ticker: 评分}, 'strategies': {ticker: 策略}, 'answer_cache': 'hit' / 'miss',
+                'prompt_compaction': Judge 提示词压缩统计（走 LLM 时才有，含 tokens_saved）,
+                'timings': {阶段: 秒}, 'execution_time'
+            }
+        """
+        with start_trace(request_id, name="analyze") as trace:
+            result = self._analyze(question, risk_tolerance, include_strategy, memory)
+        result['request_id'] = trace.request_id
+        return result
+    
+    def _analyze(
+        self,
+        question: str,
+        risk_tolerance: str,
+        include_strategy: bool,
+        memory: Optional[ConversationMemory] = None
+    ) -> Dict:
+        """analyze() 的具体流程（在 Trace 内执行）"""
+        start_time = time.time()
+        timings = {}
+        
+        stage_start = time.time()
+        routing_result = self.route(question, memory)
+        timings['route'] = time.time() - stage_start
+        
+        tickers = routing_result.get('tickers', [])
+        ticker = tickers[0] if tickers else None
+        
+        # 同一意图的答案在数据变化前直接复用
+        chat_history = memory.messages() if memory else None
+        stage_start = time.time()
+        cached = self.cached_answer(routing_result)
+        timings['answer_cache'] = time.time() - stage_start
+        
+        if cached:
+            snapshot = cached['snapshot']
+            agent_outputs = cached['agent_outputs']
+        else:
+            stage_start = time.time()
+            snapshot = AnalysisSnapshot()
+            agent_outputs = self.run_agents(question, routing_result, snapshot, chat_history)
+            timings['agents'] = time.time() - stage_start
+        
+        # 先评分：评分结果决定 Judge 能否走快速模式
+        stage_start = time.time()
+        scores = self.score_all(agent_outputs, snapshot, tickers)
+        score_data = scores[ticker] if ticker else self.score(agent_outputs, snapshot)
+        rating = score_data.get('rating', 'Hold')
+        timings['score'] = time.time() - stage_start
+        
+        compaction = {}
+        if cached:
+            report = cached['report']
+        else:
+            stage_start = time.time()
+            report = self.synthesize(question, agent_outputs, snapshot, score_data, ticker, compaction)
+            timings['judge'] = time.time() - stage_start
+            self.store_answer(routing_result, agent_outputs, report, snapshot)
+        
+        if routing_result.get('dropped_tickers'):
+            report += (
+                f"\n\n⚠️ 单次最多分析 {MAX_FANOUT_TICKERS} 只股票，"
+                f"未分析：{', '.join(routing_result['dropped_tickers'])}"
+            )
+        
+        if memory is not None:
+            memory.add_turn(question, report, tickers, routing_result['agent_type'])
+        
+        # 每只股票按各自的评级生成策略
+        strategies = {}
+        if include_strategy and tickers:
+            stage_start = time.time()
+            for item in tickers:
+                # 缓存答案中的价格可能已经过时，策略点位按实时价格计算
+                strategies[item] = self.generate_strategy(
+                    item, scores[item].get('rating', 'Hold'), snapshot, risk_tolerance,
+                    live_price=bool(cached)
+                )
+            timings['strategy'] = time.time() - stage_start
+        
+        return {
+            'question': question,
+            'routing': routing_result,
+            'tickers': tickers,
+            'ticker': ticker,
+            'agent_outputs': agent_outputs,
+            'snapshot': snapshot.to_dict(),
+            'report': report,
+            'score': score_data,
+            'rating': rating,
+            'scores': scores,
+            'strategy': strategies.get(ticker),
+            'strategies': strategies,
+            'answer_cache': 'hit' if cached else 'miss',
+            'prompt_compaction': compaction,
+            'timings': {stage: round(seconds, 3) for stage, seconds in timings.items()},
+            'execution_time': round(time.time() - start_time, 3)
+        }
@@ -0,0 +1,186 @@
+# -*- coding: utf-8 -*-
+"""
+跨会话的答案缓存
+
+"AAPL的PE怎么样"和"苹果估值如何"路由后都是 (fundamental, [AAPL])。答案按
+(分析类型, 排序后的股票, 数据版本) 缓存在 SQLite 中，多个会话和 worker 进程共用；
+数据版本没变时直接返回之前的报告，不再运行 Agent 和 Judge。
+
+数据版本只用本地信息计算，不请求上游：
+    - 行情：交易时段内每 INTRADAY_BUCKET_MINUTES 分钟一个版本，收盘后到下次开盘不变
+    - 基本面：同行索引中缓存的指标（重新获取后指标变化才换版本）加交易日
+    - 新闻：每小时一个版本
+另外条目最多保留 ANSWER_CACHE_TTL 秒。
+
+限制：键中没有问题本身，同一意图下侧重点不同的问题（"AAPL的RSI是多少" / "AAPL支撑位在哪"）
+共用一份报告；追问由调用方跳过缓存（见 AnalysisPipeline._cacheable）。
+缓存快照中的价格不在数据版本里，生成策略时应重新获取价格。
+
+BULLBEAR_ANSWER_CACHE=0 关闭。
+"""
+
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from datetime import datetime, timedelta
+from typing import Dict, Iterable, List, Optional
+
+from data.cache_warmer import MARKET_OPEN, MARKET_TZ
+from data.peer_index import METRIC_FIELDS, get_peer_index
+
+CACHE_DIR = os.getenv("BULLBEAR_CACHE_DIR", ".cache")
+ANSWER_DB = os.path.join(CACHE_DIR, "answers.sqlite3")
+ANSWER_CACHE_TTL = int(os.getenv("BULLBEAR_ANSWER_CACHE_TTL", str(24 * 3600)))
+MARKET_CLOSE = (16, 0)
+INTRADAY_BUCKET_MINUTES = 15
+
+# 可缓存的分析类型（选股没有股票，不缓存）
+CACHEABLE_AGENTS = {'fundamental', 'technical', 'sentiment', 'comparison'}
+# 各分析类型依赖的数据
+AGENT_DATA = {
+    'fundamental': ('fundamentals', 'session'),
+    'technical': ('intraday',),
+    'sentiment': ('news',),
+    'comparison': ('fundamentals', 'session')
+}
+
+
+# ========== 数据版本 ==========
+
+def _market_now(now: Optional[datetime] = None) -> datetime:
+    from zoneinfo import ZoneInfo
+
+    tz = ZoneInfo(MARKET_TZ)
+    return now.astimezone(tz) if now else datetime.now(tz)
+
+
+def _last_session(now: datetime) -> str:
+    """最近一个已开盘的交易日（纽约时间，跳过周末，不考虑节假日）"""
+    day = now
+    if (now.hour, now.minute) < MARKET_OPEN:
+        day -= timedelta(days=1)
+    while day.weekday() >= 5:
+        day -= timedelta(days=1)
+    return day.date().isoformat()
+
+
+def _intraday_bucket(now: datetime) -> str:
+    """交易时段内按 INTRADAY_BUCKET_MINUTES 分钟分段，盘外为最近交易日"""
+    session = _last_session(now)
+    if now.weekday() < 5 and MARKET_OPEN <= (now.hour, now.minute) < MARKET_CLOSE:
+        minutes = (now.hour - MARKET_OPEN[0]) * 60 + now.minute - MARKET_OPEN[1]
+        return f"{session}/{minutes // INTRADAY_BUCKET_MINUTES}"
+    return session
+
+
+def _fundamentals_fingerprint(ticker: str) -> Optional[List]:
+    """同行索引中缓存的指标（没有条目时为 None）"""
+    entry = get_peer_index().get(ticker)
+    if entry is None:
+        return None
+    return [entry.get(field) for field in METRIC_FIELDS]
+
+
+def data_version(agent_type: str, tickers: Iterable[str], now: Optional[datetime] = None) -> str:
+    """某类分析所依赖数据的版本号"""
+    now = _market_now(now)
+    tickers = sorted(t.upper() for t in tickers)
+    parts = {}
+    for source in AGENT_DATA.get(agent_type, ('intraday',)):
+        if source == 'session':
+            parts[source] = _last_session(now)
+        elif source == 'intraday':
+            parts[source] = _intraday_bucket(now)
+        elif source == 'news':
+            parts[source] = now.strftime("%Y-%m-%dT%H")
+        elif source == 'fundamentals':
+            parts[source] = {t: _fundamentals_fingerprint(t) for t in tickers}
+    encoded = json.dumps(parts, sort_keys=True, default=str).encode('utf-8')
+    return hashlib.blake2b(encoded, digest_size=8).hexdigest()
+
+
+# ========== SQLite 存储 ==========
+
+class AnswerCache:
+    """答案缓存（SQLite，WAL 模式，支持多进程读写）"""
+
+    def __init__(self, path: str = ANSWER_DB, ttl: int = ANSWER_CACHE_TTL):
+        self.path = path
+        self.ttl = ttl
+        self._local = threading.local()
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        with self._connect() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS answers ("
+                " key TEXT PRIMARY KEY, version TEXT NOT NULL,"
+                " created_at REAL NOT NULL, payload TEXT NOT NULL)"
+            )
+
+    def _connect(self) -> sqlite3.Connection:
+        """每个线程一个连接"""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    @staticmethod
+    def make_key(agent_type: str, tickers: Iterable[str]) -> str:
+        return f"{agent_type}|{','.join(sorted(set(t.upper() for t in tickers)))}"
+
+    def get(self, agent_type: str, tickers: List[str], version: str) -> Optional[Dict]:
+        """版本一致且未过期时返回缓存的内容"""
+        try:
+            row = self._connect().execute(
+                "SELECT payload FROM answers WHERE key = ? AND version = ? AND created_at > ?",
+                (self.make_key(agent_type, tickers), version, time.time() - self.ttl)
+            ).fetchone()
+        except sqlite3.Error as e:
+            print(f"[WARNING] 读取答案缓存失败: {e}")
+            return None
+        return json.loads(row[0]) if row else None
+
+    def put(self, agent_type: str, tickers: List[str], version: str, payload: Dict) -> None:
+        """写入（同一意图只保留最新版本）"""
+        try:
+            with self._connect() as conn:
+                conn.execute(
+                    "INSERT OR REPLACE INTO answers (key, version, created_at, payload) VALUES (?, ?, ?, ?)",
+                    (self.make_key(agent_type, tickers), version, time.time(),
+                     json.dumps(payload, ensure_ascii=False, default=str))
+                )
+        except sqlite3.Error as e:
+            print(f"[WARNING] 写入答案缓存失败: {e}")
+
+    def prune(self) -> int:
+        """删除过期条目，返回删除数"""
+        with self._connect() as conn:
+            return conn.execute(
+                "DELETE FROM answers WHERE created_at <= ?", (time.time() - self.ttl,)
+            ).rowcount
+
+
+_cache: Optional[AnswerCache] = None
+_cache_lock = threading.Lock()
+
+
+def get_answer_cache() -> Optional[AnswerCache]:
+    """进程内共享的答案缓存（BULLBEAR_ANSWER_CACHE=0 或无法打开数据库时返回 None）"""
+    global _cache
+    if os.getenv("BULLBEAR_ANSWER_CACHE", "1") == "0":
+        return None
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                try:
+                    _cache = AnswerCache()
+                    _cache.prune()
+                except sqlite3.Error as e:
+                    print(f"[WARNING] 打开答案缓存失败: {e}")
+                    return None
+    return _cache
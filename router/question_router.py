@@ -10,6 +10,8 @@ from langchain_core.output_parsers import StrOutputParser
 import re
 from typing import Dict, List, Optional
 
+from screener.query import looks_like_screen
+
 class QuestionRouter:
     """混合路由器：规则 + LLM"""
     
@@ -21,7 +23,8 @@ class QuestionRouter:
             'fundamental': ['基本面', '财务', '估值', '市盈率', 'PE', '市净率', 'PB', 'ROE', '营收', '利润', '负债', '现金流', '资产', '收益'],
             'technical': ['技术面', '技术指标', 'RSI', 'MACD', '均线', 'MA', '布林带', 'KDJ', '成交量', '趋势', '支撑', '阻力', '突破'],
             'sentiment': ['新闻', '舆情', '情绪', '消息', '市场看法', '分析师', '评级', '热度', '关注', '舆论'],
-            'comparison': ['对比', '比较', '横向', 'vs', 'versus', '哪个好', '哪只', '选择', '和', '还是']
+            'comparison': ['对比', '比较', '横向', 'vs', 'versus', '哪个好', '哪只', '选择', '和', '还是'],
+            'screener': ['筛选', '选股', '找出', '哪些股票', '成分股', 'screen', 'screener', 'stocks with']
         }
         
         # 美股常见股票代码库（扩展版）
@@ -119,6 +122,17 @@ class QuestionRouter:
         # 提取股票代码（所有情况都提取）
         tickers = self._extract_tickers(question)
         
+        # 规则0: 条件选股（没有具体股票、带筛选条件或选股关键词）
+        if not tickers and (
+            any(kw in question_lower for kw in self.keywords['screener']) or looks_like_screen(question)
+        ):
+            return {
+                'agent_type': 'screener',
+                'tickers': [],
+                'confidence': 'high' if looks_like_screen(question) else 'medium',
+                'method': 'rule'
+            }
+        
         # 规则1: 对比分析（优先级最高）
         comparison_keywords = ['对比', '比较', '横向', 'vs', 'versus', '哪个好', '哪只', '选择', '还是']
         if any(kw in question_lower for kw in comparison_keywords):
@@ -145,7 +159,7 @@ class QuestionRouter:
         # 规则2-4: 其他类型分析（统计关键词命中数）
         scores = {}
         for agent_type, keywords in self.keywords.items():
-            if agent_type == 'comparison':
+            if agent_type in ('comparison', 'screener'):
                 continue
             score = sum(1 for kw in keywords if kw in question_lower)
             if score > 0:
@@ -185,8 +199,9 @@ class QuestionRouter:
 2. technical - 技术面分析（技术指标、趋势、图表、RSI、MACD、均线等）
 3. sentiment - 市场情绪（新闻、舆情、分析师看法、市场热度等）
 4. comparison - 股票对比（横向比较多只股票）
+5. screener - 条件选股（从一批股票中按指标条件筛选，如"RSI低于30且ROE大于15%的股票"）
 
-只输出类别名称（fundamental/technical/sentiment/comparison），不要其他内容。"""),
+只输出类别名称（fundamental/technical/sentiment/comparison/screener），不要其他内容。"""),
             ("human", "{question}")
         ])
         
@@ -196,7 +211,7 @@ class QuestionRouter:
             agent_type = result.strip().lower()
             
             # 验证结果
-            valid_types = ['fundamental', 'technical', 'sentiment', 'comparison']
+            valid_types = ['fundamental', 'technical', 'sentiment', 'comparison', 'screener']
             if agent_type not in valid_types:
                 agent_type = 'fundamental'  # 默认
             
@@ -218,19 +233,34 @@ class QuestionRouter:
                 'method': 'fallback'
             }
     
-    def route(self, question: str) -> Dict:
+    def route(self, question: str, context_tickers: Optional[List[str]] = None) -> Dict:
         """
         主路由方法
         优先使用规则路由，失败时使用LLM
         
+        Args:
+            context_tickers: 上一轮对话涉及的股票（追问中没有提到股票时沿用）
+        
         Returns:
             {
-                'agent_type': str,  # 'fundamental', 'technical', 'sentiment', 'comparison'
+                'agent_type': str,  # 'fundamental', 'technical', 'sentiment', 'comparison', 'screener'
                 'tickers': List[str],  # 提取到的股票代码
                 'confidence': str,  # 'high', 'medium', 'low'
-                'method': str  # 'rule', 'llm', 'fallback'
+                'method': str,  # 'rule', 'llm', 'fallback'
+                'tickers_from_context': bool  # 股票代码是否沿用自上一轮对话
             }
         """
+        result = self._route(question)
+        
+        result['tickers_from_context'] = False
+        if not result['tickers'] and context_tickers and result['agent_type'] != 'screener':
+            result['tickers'] = list(context_tickers)
+            result['tickers_from_context'] = True
+        
+        return result
+    
+    def _route(self, question: str) -> Dict:
+        """规则路由，失败或置信度低时使用LLM"""
         # 先尝试规则路由
         result = self._rule_based_routing(question)
         
@@ -254,7 +284,8 @@ class QuestionRouter:
             'fundamental': '基本面分析',
             'technical': '技术面分析',
             'sentiment': '市场情绪',
-            'comparison': '股票对比'
+            'comparison': '股票对比',
+            'screener': '条件选股'
         }
         
         confidence_emoji = {
@@ -265,7 +296,8 @@ class QuestionRouter:
         
         info = "🎯 **路由结果**\n"
         info += f"  • 分析类型: {agent_names.get(routing_result['agent_type'], '未知')}\n"
-        info += f"  • 股票代码: {', '.join(routing_result.get('tickers', [])) or '未识别'}\n"
+        info += f"  • 股票代码: {', '.join(routing_result.get('tickers', [])) or '未识别'}"
+        info += "（沿用上文）\n" if routing_result.get('tickers_from_context') else "\n"
         info += f"  • 置信度: {confidence_emoji.get(routing_result['confidence'], '⚪')} {routing_result['confidence']}\n"
         info += f"  • 路由方法: {routing_result['method']}\n"
         
@@ -0,0 +1,20 @@
+"""
+条件选股模块
+"""
+
+from screener.query import ScreenQuery, looks_like_screen, parse_query, validate_expression
+from screener.screener import StockScreener, evaluate, format_screen_result
+from screener.universe import load_universe, resolve_universe, universe_label
+
+__all__ = [
+    'ScreenQuery',
+    'StockScreener',
+    'evaluate',
+    'format_screen_result',
+    'load_universe',
+    'looks_like_screen',
+    'parse_query',
+    'resolve_universe',
+    'universe_label',
+    'validate_expression'
+]
@@ -0,0 +1,82 @@
+# -*- coding: utf-8 -*-
+"""
+向量化指标计算
+
+输入是 日期 × 股票 的价格矩阵，每个指标对所有股票一次算完，
+公式与 TechnicalIndicatorTool 保持一致。
+"""
+
+from __future__ import annotations
+
+from typing import Dict
+
+from utils.lazy_import import lazy_module
+
+pd = lazy_module("pandas")
+np = lazy_module("numpy")
+
+
+def compute_indicator_table(close: pd.DataFrame, volume: pd.DataFrame) -> pd.DataFrame:
+    """
+    计算指标表
+
+    Args:
+        close: 日期 × 股票 收盘价
+        volume: 日期 × 股票 成交量
+
+    Returns:
+        股票 × 指标 的表：
+        price, rsi, macd, macd_hist, ma20, ma50, boll_pct（布林带位置 %）,
+        ret_1m / ret_3m（涨跌幅 %）, volume_ratio（量比 %）
+    """
+    close = close.sort_index().ffill(limit=5)
+    volume = volume.reindex_like(close)
+
+    # RSI(14)
+    delta = close.diff()
+    gain = delta.clip(lower=0).rolling(window=14).mean()
+    loss = (-delta.clip(upper=0)).rolling(window=14).mean()
+    rsi = 100 - 100 / (1 + gain / loss)
+
+    # MACD(12, 26, 9)
+    macd = close.ewm(span=12, adjust=False).mean() - close.ewm(span=26, adjust=False).mean()
+    signal = macd.ewm(span=9, adjust=False).mean()
+
+    # 均线与布林带
+    ma20 = close.rolling(window=20).mean()
+    ma50 = close.rolling(window=50).mean()
+    std20 = close.rolling(window=20).std()
+    upper = ma20 + 2 * std20
+    lower = ma20 - 2 * std20
+    boll_pct = (close - lower) / (upper - lower) * 100
+
+    avg_volume = volume.rolling(window=20).mean()
+
+    last = close.iloc[-1]
+    columns: Dict[str, pd.Series] = {
+        'price': last,
+        'rsi': rsi.iloc[-1],
+        'macd': macd.iloc[-1],
+        'macd_hist': (macd - signal).iloc[-1],
+        'ma20': ma20.iloc[-1],
+        'ma50': ma50.iloc[-1],
+        'boll_pct': boll_pct.iloc[-1],
+        'ret_1m': _period_return(close, 21),
+        'ret_3m': _period_return(close, 63),
+        'volume_ratio': volume.iloc[-1] / avg_volume.iloc[-1] * 100
+    }
+
+    table = pd.DataFrame(columns)
+    table['trend'] = np.select(
+        [(table['price'] > table['ma20']) & (table['ma20'] > table['ma50']),
+         (table['price'] < table['ma20']) & (table['ma20'] < table['ma50'])],
+        ['上涨', '下跌'],
+        default='震荡'
+    )
+    return table.replace([np.inf, -np.inf], np.nan)
+
+
+def _period_return(close: pd.DataFrame, days: int) -> pd.Series:
+    if len(close) <= days:
+        return pd.Series(np.nan, index=close.columns)
+    return (close.iloc[-1] / close.iloc[-1 - days] - 1) * 100
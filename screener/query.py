@@ -0,0 +1,210 @@
+# -*- coding: utf-8 -*-
+"""
+选股条件解析
+
+把自然语言问题解析成筛选表达式和排序规则，例如：
+    "标普500中RSI低于30且ROE大于15%的股票，按ROE排序前10"
+    → filter: "rsi < 30 and roe > 15", sort_by: roe（降序）, limit: 10, universe: sp500
+
+也可以直接写表达式（API 使用），表达式只允许字段名、数字、字符串、比较/逻辑运算符和括号。
+"""
+
+import re
+from dataclasses import dataclass, field
+from typing import List, Optional, Tuple
+
+from screener.universe import resolve_universe
+
+# 字段 → 别名（百分比字段在表中以百分数存储：ROE 15% 存为 15）
+FIELD_ALIASES = {
+    'rsi': ['rsi', '相对强弱'],
+    'macd_hist': ['macd柱', 'macd', 'macd hist'],
+    'price': ['股价', '价格', 'price'],
+    'ma20': ['ma20', '20日均线'],
+    'ma50': ['ma50', '50日均线'],
+    'boll_pct': ['布林带位置', 'boll'],
+    'ret_1m': ['近一月涨幅', '一个月涨幅', '月涨幅', '1m return', 'ret_1m'],
+    'ret_3m': ['近三月涨幅', '三个月涨幅', '季度涨幅', '3m return', 'ret_3m'],
+    'volume_ratio': ['量比', 'volume ratio'],
+    'forward_pe': ['远期市盈率', 'forward pe', 'forward_pe'],
+    'pe': ['市盈率', 'p/e', 'pe'],
+    'pb': ['市净率', 'p/b', 'pb'],
+    'roe': ['净资产收益率', 'roe'],
+    'profit_margin': ['净利率', '利润率', 'profit margin', 'profit_margin'],
+    'revenue_growth': ['营收增长', '收入增长', 'revenue growth', 'revenue_growth'],
+    'debt_to_equity': ['负债权益比', '负债率', 'debt/equity', 'debt to equity', 'debt_to_equity'],
+    'dividend_yield': ['股息率', 'dividend yield', 'dividend_yield'],
+    'market_cap': ['市值', 'market cap', 'market_cap']
+}
+
+FIELDS = set(FIELD_ALIASES) | {'sector', 'trend'}
+
+# 比较词 → 运算符（长的在前，避免"不低于"被"低于"截断）
+OPERATORS = [
+    ('不低于', '>='), ('不少于', '>='), ('至少', '>='), ('>=', '>='), ('≥', '>='),
+    ('不高于', '<='), ('不超过', '<='), ('至多', '<='), ('<=', '<='), ('≤', '<='),
+    ('大于', '>'), ('高于', '>'), ('超过', '>'), ('above', '>'), ('greater than', '>'), ('over', '>'), ('>', '>'),
+    ('小于', '<'), ('低于', '<'), ('below', '<'), ('less than', '<'), ('under', '<'), ('<', '<'),
+    ('等于', '=='), ('==', '=='), ('=', '==')
+]
+
+# 数量单位（只用于市值）
+UNITS = {'万亿': 1e12, '亿': 1e8, 't': 1e12, 'b': 1e9, 'm': 1e6}
+
+_alias_pairs = sorted(
+    ((alias, name) for name, aliases in FIELD_ALIASES.items() for alias in aliases),
+    key=lambda pair: len(pair[0]),
+    reverse=True
+)
+_ALIAS_TO_FIELD = {alias: name for alias, name in _alias_pairs}
+
+
+def _alias_pattern(alias: str) -> str:
+    escaped = re.escape(alias)
+    # 英文别名要求单词边界（避免 "pe" 命中 "open"）
+    if alias[0].isascii() and alias[0].isalpha():
+        return rf"(?<![a-z_]){escaped}(?![a-z_])"
+    return escaped
+
+
+_FIELD_RE = "|".join(_alias_pattern(alias) for alias, _ in _alias_pairs)
+_OP_RE = "|".join(re.escape(op) for op, _ in OPERATORS)
+_OP_MAP = {op: symbol for op, symbol in OPERATORS}
+
+CONDITION_RE = re.compile(
+    rf"(?P<field>{_FIELD_RE})\s*(?:的|is|值)?\s*(?P<op>{_OP_RE})\s*"
+    rf"(?P<value>-?\d+(?:\.\d+)?)\s*(?P<unit>万亿|亿|[tbm](?![a-z]))?\s*%?",
+    re.IGNORECASE
+)
+SORT_RE = re.compile(
+    rf"(?:按|按照|sort(?:ed)? by|order by|rank(?:ed)? by)\s*(?P<field>{_FIELD_RE})\s*"
+    rf"(?P<order>从高到低|从低到高|降序|升序|desc|asc)?",
+    re.IGNORECASE
+)
+EXTREME_RE = re.compile(rf"(?P<field>{_FIELD_RE})\s*(?P<order>最高|最低|最大|最小)", re.IGNORECASE)
+LIMIT_RE = re.compile(r"(?:前|top\s*)(\d+)", re.IGNORECASE)
+
+_TOKEN_RE = re.compile(
+    r"\s*(?:(?P<number>-?\d+(?:\.\d+)?(?:e[-+]?\d+)?)|(?P<name>[a-z_][a-z0-9_]*)|"
+    r"(?P<string>'[^']*'|\"[^\"]*\")|(?P<op><=|>=|==|!=|<|>|\(|\)))",
+    re.IGNORECASE
+)
+
+DEFAULT_LIMIT = 20
+
+
+@dataclass
+class ScreenQuery:
+    """解析后的选股条件"""
+    filter_expr: str
+    sort_by: Optional[str] = None
+    ascending: bool = False
+    limit: int = DEFAULT_LIMIT
+    universe: Optional[str] = None
+    conditions: List[Tuple[str, str, float]] = field(default_factory=list)
+
+    @property
+    def fields(self) -> List[str]:
+        """表达式和排序用到的字段"""
+        names = {m.group('name') for m in _TOKEN_RE.finditer(self.filter_expr) if m.group('name')}
+        names = {n for n in names if n in FIELDS}
+        if self.sort_by:
+            names.add(self.sort_by)
+        return sorted(names)
+
+
+def validate_expression(expr: str) -> str:
+    """
+    校验筛选表达式，只允许字段、数字、字符串、比较/逻辑运算符和括号
+
+    Returns:
+        规范化后的表达式
+
+    Raises:
+        ValueError: 含有不允许的内容
+    """
+    tokens = []
+    position = 0
+    expr = expr.strip()
+    while position < len(expr):
+        match = _TOKEN_RE.match(expr, position)
+        if not match or match.end() == position:
+            raise ValueError(f"表达式中有无法识别的内容: {expr[position:position + 20]}")
+        position = match.end()
+
+        name = match.group('name')
+        if name is not None:
+            lowered = name.lower()
+            if lowered in ('and', 'or', 'not'):
+                tokens.append(lowered)
+            elif lowered in FIELDS:
+                tokens.append(lowered)
+            else:
+                raise ValueError(f"未知字段: {name}（可用字段: {', '.join(sorted(FIELDS))}）")
+        else:
+            tokens.append(match.group().strip())
+
+    if not tokens:
+        raise ValueError("筛选表达式为空")
+    return " ".join(tokens)
+
+
+def parse_query(text: str) -> Optional[ScreenQuery]:
+    """
+    从自然语言中解析选股条件
+
+    Returns:
+        ScreenQuery；没有识别到任何条件时返回 None
+    """
+    conditions = []
+    parts = []
+    last_end = None
+    for match in CONDITION_RE.finditer(text):
+        field_name = _ALIAS_TO_FIELD[match.group('field').lower()]
+        symbol = _OP_MAP[match.group('op').lower()]
+        value = float(match.group('value'))
+        unit = (match.group('unit') or '').lower()
+        if field_name == 'market_cap' and unit in UNITS:
+            value *= UNITS[unit]
+
+        # 两个条件之间出现"或/or"时用 or 连接，否则默认 and
+        if last_end is not None:
+            between = text[last_end:match.start()].lower()
+            parts.append('or' if ('或' in between or re.search(r"\bor\b", between)) else 'and')
+        parts.append(f"{field_name} {symbol} {value:g}")
+        conditions.append((field_name, symbol, value))
+        last_end = match.end()
+
+    if not conditions:
+        return None
+
+    sort_by, ascending = None, False
+    sort_match = SORT_RE.search(text)
+    extreme_match = EXTREME_RE.search(text)
+    if sort_match:
+        sort_by = _ALIAS_TO_FIELD[sort_match.group('field').lower()]
+        ascending = (sort_match.group('order') or '').lower() in ('从低到高', '升序', 'asc')
+    elif extreme_match:
+        sort_by = _ALIAS_TO_FIELD[extreme_match.group('field').lower()]
+        ascending = extreme_match.group('order') in ('最低', '最小')
+    else:
+        # 默认按第一个条件排序：小于条件升序，大于条件降序
+        sort_by, symbol, _ = conditions[0]
+        ascending = symbol in ('<', '<=')
+
+    limit_match = LIMIT_RE.search(text)
+    limit = int(limit_match.group(1)) if limit_match else DEFAULT_LIMIT
+
+    return ScreenQuery(
+        filter_expr=" ".join(parts),
+        sort_by=sort_by,
+        ascending=ascending,
+        limit=max(1, min(limit, 200)),
+        universe=resolve_universe(text),
+        conditions=conditions
+    )
+
+
+def looks_like_screen(text: str) -> bool:
+    """问题是否包含选股条件（供路由使用）"""
+    return CONDITION_RE.search(text) is not None
@@ -0,0 +1,294 @@
+# -*- coding: utf-8 -*-
+"""
+条件选股
+
+流程：
+    1. 加载选股范围（config/universes.json）
+    2. 通过共享的 download_fields 分批下载价格/成交量，向量化计算技术指标
+    3. 条件涉及基本面字段时，再用 get_infos（带缓存）补充基本面列
+    4. 在指标表上执行筛选表达式并排序；范围很大时把表切块交给进程池并行筛选
+
+指标表按选股范围缓存 TABLE_TTL 秒，同一范围内的连续提问不会重复下载行情。
+"""
+
+from __future__ import annotations
+
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import replace
+from typing import Dict, List, Optional, Tuple
+
+from data.market_data import download_fields, get_infos
+from screener.indicators import compute_indicator_table
+from screener.query import FIELDS, ScreenQuery, parse_query, validate_expression
+from screener.universe import load_config, load_universe, universe_label
+from utils.lazy_import import lazy_module
+from utils.tracing import annotate, span
+
+pd = lazy_module("pandas")
+
+# 指标表缓存时间（秒）
+TABLE_TTL = 900
+# 行数达到该值时使用进程池筛选
+PARALLEL_MIN_ROWS = 2000
+PRICE_PERIOD = "6mo"
+
+# yfinance .info 字段 → 表字段（百分比字段乘 100）
+FUNDAMENTAL_FIELDS = {
+    'pe': ('trailingPE', 1),
+    'forward_pe': ('forwardPE', 1),
+    'pb': ('priceToBook', 1),
+    'roe': ('returnOnEquity', 100),
+    'profit_margin': ('profitMargins', 100),
+    'revenue_growth': ('revenueGrowth', 100),
+    'debt_to_equity': ('debtToEquity', 1),
+    'dividend_yield': ('dividendYield', 100),
+    'market_cap': ('marketCap', 1)
+}
+TECHNICAL_FIELDS = FIELDS - set(FUNDAMENTAL_FIELDS) - {'sector'}
+PERCENT_FIELDS = {'roe', 'profit_margin', 'revenue_growth', 'dividend_yield', 'ret_1m', 'ret_3m'}
+
+FIELD_LABELS = {
+    'price': '价格', 'rsi': 'RSI', 'macd_hist': 'MACD柱', 'ma20': 'MA20', 'ma50': 'MA50',
+    'boll_pct': '布林位置', 'ret_1m': '近1月', 'ret_3m': '近3月', 'volume_ratio': '量比',
+    'trend': '趋势', 'pe': 'PE', 'forward_pe': '远期PE', 'pb': 'PB', 'roe': 'ROE',
+    'profit_margin': '净利率', 'revenue_growth': '营收增长', 'debt_to_equity': '负债权益比',
+    'dividend_yield': '股息率', 'market_cap': '市值', 'sector': '行业'
+}
+
+_executor: Optional[ProcessPoolExecutor] = None
+_executor_lock = threading.Lock()
+
+
+def _get_executor() -> ProcessPoolExecutor:
+    """进程内共享的筛选进程池（第一次需要时创建）"""
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _executor = ProcessPoolExecutor(max_workers=min(4, os.cpu_count() or 1))
+    return _executor
+
+
+def _filter_chunk(args: Tuple[pd.DataFrame, str]) -> pd.DataFrame:
+    """进程池任务：在一块表上执行筛选表达式（必须是模块级函数才能被 pickle）"""
+    chunk, expr = args
+    return chunk.query(expr, engine='python')
+
+
+def evaluate(
+    table: pd.DataFrame,
+    expr: str,
+    sort_by: Optional[str] = None,
+    ascending: bool = False,
+    limit: Optional[int] = None,
+    parallel_min_rows: int = PARALLEL_MIN_ROWS
+) -> pd.DataFrame:
+    """
+    在指标表上执行筛选和排序
+
+    Args:
+        expr: 已通过 validate_expression 校验的表达式
+        parallel_min_rows: 行数达到该值时切块交给进程池
+
+    Returns:
+        符合条件的行（缺失值排在最后）
+    """
+    if table.empty:
+        return table
+
+    if len(table) >= parallel_min_rows:
+        workers = _get_executor()._max_workers
+        size = -(-len(table) // workers)
+        chunks = [(table.iloc[i:i + size], expr) for i in range(0, len(table), size)]
+        matched = pd.concat(list(_get_executor().map(_filter_chunk, chunks)))
+    else:
+        matched = _filter_chunk((table, expr))
+
+    if sort_by:
+        matched = matched.sort_values(sort_by, ascending=ascending, na_position='last')
+    if limit:
+        matched = matched.head(limit)
+    return matched
+
+
+class StockScreener:
+    """条件选股器（实现 run(question)，可以像 Agent 一样被流程调用）"""
+
+    def __init__(self, table_ttl: float = TABLE_TTL):
+        self.table_ttl = table_ttl
+        self._tables: Dict[str, Tuple[pd.DataFrame, float]] = {}
+        self._lock = threading.Lock()
+
+    def _technical_table(self, universe: str) -> pd.DataFrame:
+        """技术指标表（按选股范围缓存）"""
+        with self._lock:
+            cached = self._tables.get(universe)
+            if cached and time.time() - cached[1] < self.table_ttl:
+                annotate(cache="hit")
+                return cached[0]
+
+        annotate(cache="miss")
+        tickers = load_universe(universe)
+        data = download_fields(tickers, PRICE_PERIOD, ("Close", "Volume"))
+        if data["Close"].empty:
+            raise RuntimeError(f"无法获取 {universe_label(universe)} 的行情数据")
+        table = compute_indicator_table(data["Close"], data["Volume"])
+        table.index.name = 'ticker'
+
+        with self._lock:
+            self._tables[universe] = (table, time.time())
+        return table
+
+    @staticmethod
+    def _fundamental_table(tickers: List[str]) -> pd.DataFrame:
+        """基本面列（来自带缓存的 get_infos）"""
+        infos = get_infos(tickers)
+        rows = {}
+        for ticker, info in infos.items():
+            row = {'name': info.get('shortName') or info.get('longName'), 'sector': info.get('sector')}
+            for field_name, (key, scale) in FUNDAMENTAL_FIELDS.items():
+                value = info.get(key)
+                row[field_name] = value * scale if isinstance(value, (int, float)) else None
+            rows[ticker] = row
+        return pd.DataFrame.from_dict(rows, orient='index')
+
+    def build_table(self, universe: Optional[str] = None, fields: Optional[List[str]] = None) -> pd.DataFrame:
+        """
+        构建选股范围的指标表
+
+        Args:
+            universe: 范围名称（None 为默认范围）
+            fields: 需要的字段；只涉及技术面字段时不请求基本面数据
+
+        Returns:
+            股票 × 字段 的表
+        """
+        universe = universe or _default_universe()
+        with span("screener:prices", universe=universe):
+            table = self._technical_table(universe)
+
+        needs_fundamentals = fields is None or any(f not in TECHNICAL_FIELDS for f in fields)
+        if needs_fundamentals:
+            with span("screener:fundamentals", count=len(table)):
+                fundamentals = self._fundamental_table(list(table.index))
+            table = table.join(fundamentals, how='left')
+        return table
+
+    def screen(self, query: ScreenQuery) -> Dict:
+        """
+        执行选股
+
+        Returns:
+            {'universe', 'universe_label', 'total', 'matched', 'filter', 'sort_by',
+             'ascending', 'results': DataFrame}
+        """
+        query = replace(query, filter_expr=validate_expression(query.filter_expr))
+        expr = query.filter_expr
+        universe = query.universe or _default_universe()
+        table = self.build_table(universe, query.fields)
+
+        with span("screener:evaluate", rows=len(table)) as eval_span:
+            matched = evaluate(table, expr, query.sort_by, query.ascending)
+            eval_span.set_attributes(matched=len(matched))
+
+        return {
+            'universe': universe,
+            'universe_label': universe_label(universe),
+            'total': len(table),
+            'matched': len(matched),
+            'filter': expr,
+            'sort_by': query.sort_by,
+            'ascending': query.ascending,
+            'results': matched.head(query.limit)
+        }
+
+    def screen_expression(
+        self,
+        expr: str,
+        sort_by: Optional[str] = None,
+        ascending: bool = False,
+        limit: int = 20,
+        universe: Optional[str] = None
+    ) -> Dict:
+        """直接用表达式选股（API 使用）"""
+        if sort_by and sort_by not in FIELDS:
+            raise ValueError(f"未知排序字段: {sort_by}")
+        query = ScreenQuery(
+            filter_expr=expr,
+            sort_by=sort_by,
+            ascending=ascending,
+            limit=max(1, min(limit, 200)),
+            universe=universe
+        )
+        return self.screen(query)
+
+    def run(self, question: str, chat_history: Optional[List] = None) -> str:
+        """
+        从自然语言问题选股，返回格式化文本
+
+        Args:
+            chat_history: 不使用（与 Agent.run 的参数保持一致）
+
+        Returns:
+            选股结果文本；没有识别出条件或出错时返回提示
+        """
+        query = parse_query(question)
+        if query is None:
+            return ("❌ 没有识别到选股条件。\n"
+                    "示例：标普500中RSI低于30且ROE大于15%的股票，按ROE排序前10")
+        try:
+            result = self.screen(query)
+        except Exception as e:
+            print(f"[ERROR] 条件选股失败: {e}")
+            return f"❌ 条件选股失败: {str(e)}"
+        return format_screen_result(result, query.fields)
+
+
+def _default_universe() -> str:
+    return load_config()['default']
+
+
+def _format_value(field_name: str, value) -> str:
+    if value is None or (isinstance(value, float) and value != value):
+        return "N/A"
+    if isinstance(value, str):
+        return value
+    if field_name == 'market_cap':
+        return f"${value / 1e9:.1f}B"
+    if field_name == 'price':
+        return f"${value:.2f}"
+    if field_name in PERCENT_FIELDS:
+        return f"{value:.1f}%"
+    return f"{value:.2f}"
+
+
+def format_screen_result(result: Dict, fields: Optional[List[str]] = None) -> str:
+    """格式化选股结果"""
+    results = result['results']
+    order = "升序" if result['ascending'] else "降序"
+    text = f"🔍 **条件选股 - {result['universe_label']}**\n\n"
+    text += f"📋 条件: `{result['filter']}`"
+    if result['sort_by']:
+        text += f"，按 {FIELD_LABELS.get(result['sort_by'], result['sort_by'])} {order}"
+    text += f"\n📊 共 {result['total']} 只，符合条件 {result['matched']} 只"
+    if result['matched'] > len(results):
+        text += f"（显示前 {len(results)} 只）"
+    text += "\n\n"
+
+    if results.empty:
+        return text + "⚠️ 没有符合条件的股票\n"
+
+    shown = ['price'] + [f for f in (fields or []) if f != 'price']
+    for rank, (ticker, row) in enumerate(results.iterrows(), 1):
+        name = row.get('name') if 'name' in row else None
+        header = f"{rank}. **{ticker}**" + (f" {name}" if isinstance(name, str) else "")
+        values = " | ".join(
+            f"{FIELD_LABELS.get(f, f)} {_format_value(f, row.get(f))}" for f in shown if f in row
+        )
+        text += f"{header} — {values}\n"
+
+    text += "\n💡 提示: 选股结果仅基于量化条件，不构成投资建议\n"
+    return text
@@ -0,0 +1,103 @@
+# -*- coding: utf-8 -*-
+"""
+选股范围（universe）配置
+
+配置文件 config/universes.json 中每个范围可以是：
+    - tickers: 固定的股票列表
+    - source: 成分股 CSV 的地址（column 指定代码列），下载后缓存到本地，
+              refresh_days 天后重新下载；下载失败时使用旧缓存
+"""
+
+import csv
+import io
+import json
+import os
+import time
+from typing import Dict, List, Optional
+
+from utils.lazy_import import lazy_module
+
+requests = lazy_module("requests")
+
+CONFIG_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "config", "universes.json")
+CACHE_DIR = os.getenv("BULLBEAR_CACHE_DIR", ".cache")
+
+
+def load_config(path: str = CONFIG_PATH) -> Dict:
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def resolve_universe(text: str, config: Optional[Dict] = None) -> Optional[str]:
+    """从问题文本中识别选股范围名称，未提到时返回 None"""
+    config = config or load_config()
+    text_lower = text.lower()
+    for name, universe in config['universes'].items():
+        for alias in [name] + universe.get('aliases', []):
+            if alias.lower() in text_lower:
+                return name
+    return None
+
+
+def _normalize(symbol: str) -> str:
+    # 成分股列表中的 BRK.B 在 yfinance 中写作 BRK-B
+    return symbol.strip().upper().replace('.', '-')
+
+
+def _download_source(name: str, universe: Dict) -> List[str]:
+    """下载成分股 CSV（带本地缓存）"""
+    cache_path = os.path.join(CACHE_DIR, "universes", f"{name}.json")
+    max_age = universe.get('refresh_days', 7) * 86400
+
+    cached = None
+    if os.path.exists(cache_path):
+        with open(cache_path, 'r', encoding='utf-8') as f:
+            cached = json.load(f)
+        if time.time() - cached.get('fetched_at', 0) < max_age:
+            return cached['tickers']
+
+    try:
+        response = requests.get(universe['source'], timeout=15)
+        response.raise_for_status()
+        reader = csv.DictReader(io.StringIO(response.text))
+        column = universe.get('column', 'Symbol')
+        tickers = [_normalize(row[column]) for row in reader if row.get(column)]
+    except Exception as e:
+        if cached:
+            print(f"[WARNING] 更新选股范围 {name} 失败，使用缓存: {e}")
+            return cached['tickers']
+        raise
+
+    os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+    with open(cache_path, 'w', encoding='utf-8') as f:
+        json.dump({'fetched_at': time.time(), 'tickers': tickers}, f)
+    return tickers
+
+
+def load_universe(name: Optional[str] = None, config: Optional[Dict] = None) -> List[str]:
+    """
+    加载选股范围
+
+    Args:
+        name: 范围名称，None 表示配置中的默认范围
+
+    Returns:
+        去重后的股票代码列表
+    """
+    config = config or load_config()
+    name = name or config['default']
+    universe = config['universes'].get(name)
+    if universe is None:
+        raise ValueError(f"未知的选股范围: {name}（可选: {', '.join(config['universes'])}）")
+
+    if 'tickers' in universe:
+        tickers = [_normalize(t) for t in universe['tickers']]
+    else:
+        tickers = _download_source(name, universe)
+    return list(dict.fromkeys(tickers))
+
+
+def universe_label(name: Optional[str] = None, config: Optional[Dict] = None) -> str:
+    config = config or load_config()
+    name = name or config['default']
+    return config['universes'].get(name, {}).get('name', name)
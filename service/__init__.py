@@ -0,0 +1,3 @@
+"""
+Service模块 - 无界面的 HTTP API 服务
+"""
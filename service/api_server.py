@@ -0,0 +1,285 @@
+# -*- coding: utf-8 -*-
+"""
+BullBearQA API 服务（ASGI）
+对外暴露 路由 → Agent → Judge 分析流程，可脱离 Streamlit 独立部署和压测
+
+启动：
+    DEEPSEEK_API_KEY=sk-... python -m service.api_server
+    或 uvicorn service.api_server:app --workers 4
+
+环境变量：
+    DEEPSEEK_API_KEY          DeepSeek API Key（必填）
+    BULLBEAR_MAX_CONCURRENCY  单进程内同时执行的分析数（默认 4）
+    BULLBEAR_WORKERS          uvicorn 进程数（默认 1）
+    BULLBEAR_HOST / BULLBEAR_PORT  监听地址（默认 0.0.0.0:8000）
+    BULLBEAR_TRADES_FILE      模拟盘数据文件（默认 paper_trades.json）
+    BULLBEAR_CACHE_WARMER     设为 0 关闭后台缓存预热（见 data/cache_warmer.py）
+    BULLBEAR_JUDGE_FAST       设为 0 关闭 Judge 快速模式（信号一致时按模板生成报告，不调用 LLM）
+    BULLBEAR_AGENT_FANOUT     多股票问题每个请求同时运行的 Agent 数（默认 3）
+    BULLBEAR_ANSWER_CACHE     设为 0 关闭跨会话答案缓存（见 pipeline/answer_cache.py）
+    BULLBEAR_CASSETTE         录制/回放外部调用的 cassette 文件，用于离线压测
+                              （其余选项见 utils/cassette.py）
+"""
+
+import asyncio
+import math
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
+from typing import Dict, List, Optional, Union
+
+from dotenv import load_dotenv
+from fastapi import FastAPI, HTTPException
+from pydantic import BaseModel, Field
+
+from agents.conversation_memory import MemoryStore
+from data.cache_warmer import get_cache_warmer, record_request, start_cache_warmer
+from pipeline.analysis_pipeline import AnalysisPipeline, build_components
+from tools.technical_indicator_tool import TechnicalIndicatorTool
+from trading.paper_trading import PaperTradingTracker
+from utils.cassette import cassette_from_env
+from utils.startup_profile import get_report
+
+load_dotenv()
+
+MAX_CONCURRENCY = int(os.getenv("BULLBEAR_MAX_CONCURRENCY", "4"))
+
+
+class AnalyzeRequest(BaseModel):
+    question: str = Field(..., min_length=1)
+    risk_tolerance: str = Field("medium", pattern="^(low|medium|high)$")
+    include_strategy: bool = True
+    request_id: Optional[str] = None
+    # 同一会话的请求共享对话记忆，支持追问（如"它的RSI呢？"）
+    session_id: Optional[str] = Field(None, max_length=128)
+
+
+class RouteRequest(BaseModel):
+    question: str = Field(..., min_length=1)
+
+
+class StrategiesRequest(BaseModel):
+    tickers: List[str] = Field(..., min_length=1)
+    # 统一评级，或 {ticker: rating}
+    ratings: Union[str, Dict[str, str]] = "Buy"
+    risk: str = Field("medium", pattern="^(low|medium|high)$")
+
+
+class ScreenRequest(BaseModel):
+    # 筛选表达式，如 "rsi < 30 and roe > 15"（百分比字段以百分数表示）
+    filter: str = Field(..., min_length=1)
+    sort_by: Optional[str] = None
+    ascending: bool = False
+    limit: int = Field(20, ge=1, le=200)
+    universe: Optional[str] = None
+
+
+class TradeRequest(BaseModel):
+    ticker: str
+    action: str = Field(..., pattern="^(BUY|SELL)$")
+    entry_price: float
+    target_price: float
+    stop_loss: float
+    position_size: str
+    reason: str = ""
+
+
+class ServiceState:
+    """进程内共享的组件（与 Streamlit 的 get_components 对应）"""
+    
+    def __init__(self):
+        api_key = os.getenv("DEEPSEEK_API_KEY")
+        if not api_key:
+            raise RuntimeError("未设置 DEEPSEEK_API_KEY 环境变量")
+        
+        self.components = build_components(api_key)
+        self.pipeline = AnalysisPipeline(self.components)
+        self.technical_tool = TechnicalIndicatorTool()
+        self.tracker = PaperTradingTracker(
+            data_file=os.getenv("BULLBEAR_TRADES_FILE", "paper_trades.json")
+        )
+        # 按会话保存的对话记忆（进程内，多 worker 时同一会话需路由到同一进程）
+        self.memories = MemoryStore()
+        # 模拟盘写 JSON 文件，需串行化
+        self.trades_lock = threading.Lock()
+        # 阻塞的 LLM / yfinance 调用放到线程池，信号量限制并发数
+        self.executor = ThreadPoolExecutor(
+            max_workers=MAX_CONCURRENCY,
+            thread_name_prefix="bullbear"
+        )
+        self.semaphore = asyncio.Semaphore(MAX_CONCURRENCY)
+    
+    async def run_blocking(self, func, *args):
+        """在线程池中执行阻塞调用，不阻塞事件循环"""
+        async with self.semaphore:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(self.executor, func, *args)
+    
+    def shutdown(self):
+        self.executor.shutdown(wait=False)
+
+
+state: Optional[ServiceState] = None
+
+
+@asynccontextmanager
+async def lifespan(_app: FastAPI):
+    global state
+    cassette = cassette_from_env()
+    if cassette:
+        cassette.install()
+    
+    state = ServiceState()
+    warmer = start_cache_warmer()
+    yield
+    if warmer:
+        warmer.stop()
+    state.shutdown()
+    
+    if cassette:
+        cassette.uninstall()
+        print(cassette.format_stats())
+
+
+app = FastAPI(
+    title="BullBearQA API",
+    description="基于多Agent系统的智能股票分析服务",
+    version="1.0.0",
+    lifespan=lifespan
+)
+
+
+@app.get("/health")
+async def health() -> Dict:
+    return {"status": "ok", "max_concurrency": MAX_CONCURRENCY}
+
+
+@app.get("/startup")
+async def startup() -> Dict:
+    """启动耗时报告：模块导入、组件构建耗时，以及哪些组件已构建"""
+    report = get_report()
+    report['components'] = state.components.loaded()
+    warmer = get_cache_warmer()
+    report['cache_warmer'] = warmer.status() if warmer else None
+    return report
+
+
+@app.post("/analyze")
+async def analyze(request: AnalyzeRequest) -> Dict:
+    """完整分析：路由 → Agent → Judge → 评分 → 策略"""
+    return await state.run_blocking(
+        state.pipeline.analyze,
+        request.question,
+        request.risk_tolerance,
+        request.include_strategy,
+        request.request_id,
+        state.memories.get(request.session_id) if request.session_id else None
+    )
+
+
+@app.post("/route")
+async def route(request: RouteRequest) -> Dict:
+    """只做问题路由"""
+    return await state.run_blocking(state.pipeline.route, request.question)
+
+
+@app.get("/indicators/{ticker}")
+async def indicators(ticker: str) -> Dict:
+    """技术指标（结构化）"""
+    record_request([ticker])
+    try:
+        result = await state.run_blocking(state.technical_tool.compute_indicators, ticker.upper(), True)
+    except Exception as e:
+        print(f"[ERROR] 获取 {ticker.upper()} 历史数据失败: {e}")
+        raise HTTPException(status_code=502, detail=f"获取 '{ticker}' 的历史数据失败")
+    if result is None:
+        raise HTTPException(status_code=404, detail=f"没有 '{ticker}' 的历史数据")
+    # 历史数据不足时部分指标为 NaN，JSON 中返回 null
+    return {
+        key: None if isinstance(value, float) and not math.isfinite(value) else value
+        for key, value in result.items()
+    }
+
+
+@app.get("/strategy/{ticker}")
+async def strategy(ticker: str, rating: str = "Buy", risk: str = "medium") -> Dict:
+    """根据评级生成交易策略"""
+    if rating not in ("Buy", "Sell", "Hold"):
+        raise HTTPException(status_code=422, detail="rating 必须是 Buy / Sell / Hold")
+    if risk not in ("low", "medium", "high"):
+        raise HTTPException(status_code=422, detail="risk 必须是 low / medium / high")
+    
+    result = await state.run_blocking(
+        state.pipeline.generate_strategy, ticker.upper(), rating, None, risk
+    )
+    if result is None:
+        raise HTTPException(status_code=502, detail="策略生成失败，可能是获取价格数据失败")
+    return result
+
+
+@app.post("/strategies")
+async def strategies(request: StrategiesRequest) -> Dict:
+    """批量生成交易策略（价格一次批量获取）"""
+    frame = await state.run_blocking(
+        state.pipeline.strategy_generator.generate_strategies,
+        request.tickers, request.ratings, request.risk
+    )
+    generated = set(frame['ticker'])
+    return {
+        "strategies": frame.to_dict(orient="records"),
+        "skipped": [t.upper() for t in request.tickers if t.upper() not in generated]
+    }
+
+
+@app.post("/screen")
+async def screen(request: ScreenRequest) -> Dict:
+    """条件选股（表达式形式）"""
+    try:
+        result = await state.run_blocking(
+            state.components['screener_agent'].screen_expression,
+            request.filter, request.sort_by, request.ascending, request.limit, request.universe
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    
+    frame = result.pop('results').reset_index()
+    result['results'] = frame.astype(object).where(frame.notna(), None).to_dict(orient="records")
+    return result
+
+
+@app.get("/trades")
+async def list_trades(status: Optional[str] = None) -> Dict:
+    """模拟盘交易记录和统计"""
+    def load() -> Dict:
+        with state.trades_lock:
+            trades = state.tracker.get_all_trades()
+            if status:
+                trades = [t for t in trades if t['status'] == status.upper()]
+            return {
+                "trades": list(trades),
+                "stats": state.tracker.get_performance_stats()
+            }
+    
+    return await state.run_blocking(load)
+
+
+@app.post("/trades")
+async def add_trade(request: TradeRequest) -> Dict:
+    """保存策略到模拟盘"""
+    def save() -> int:
+        with state.trades_lock:
+            return state.tracker.add_trade(request.model_dump())
+    
+    return {"id": await state.run_blocking(save)}
+
+
+if __name__ == "__main__":
+    import uvicorn
+    
+    uvicorn.run(
+        "service.api_server:app",
+        host=os.getenv("BULLBEAR_HOST", "0.0.0.0"),
+        port=int(os.getenv("BULLBEAR_PORT", "8000")),
+        workers=int(os.getenv("BULLBEAR_WORKERS", "1"))
+    )
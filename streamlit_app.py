@@ -1,19 +1,23 @@
 # Version: 2.1.0 - Fixed: K-line chart display & save strategy bugs
 import streamlit as st
-from langchain_openai import ChatOpenAI
-from agents.fundamental_agent import FundamentalAgent
-from agents.technical_agent import TechnicalAgent
-from agents.sentiment_agent import SentimentAgent
-from agents.comparison_agent import ComparisonAgent
-from router.question_router import QuestionRouter
-from judge.arena_judge import ArenaJudge
+from utils.startup_profile import format_report, timed
+from utils.tracing import start_trace
 import time
+import uuid
+
+# 重量级依赖（yfinance/pandas/plotly/langchain）都是延迟导入，Agent 在第一次用到时才构建
+with timed("import", "pipeline.analysis_pipeline"):
+    from pipeline.analysis_pipeline import MAX_FANOUT_TICKERS, AnalysisPipeline, build_components
+    from agents.conversation_memory import ConversationMemory
+    from data.analysis_snapshot import AnalysisSnapshot
+    from data.cache_warmer import start_cache_warmer
 
 # ========== Phase 1: 新增导入 ==========
-from trading.strategy_generator import StrategyGenerator
-from trading.options_recommender import OptionsRecommender
-from trading.paper_trading import PaperTradingTracker
-from visualization.candlestick_chart import CandlestickChart
+with timed("import", "trading.paper_trading"):
+    from trading.paper_trading import PaperTradingTracker
+with timed("import", "visualization"):
+    from visualization.candlestick_chart import CandlestickChart
+    from visualization.trace_waterfall import create_trace_waterfall
 # ========================================
 
 # 页面配置
@@ -69,6 +73,19 @@ st.markdown("""
 </div>
 """, unsafe_allow_html=True)
 
+def render_trace_waterfall(placeholder):
+    """在侧边栏占位符中绘制最近一次请求的耗时瀑布图"""
+    spans = st.session_state.get('last_trace')
+    if not show_waterfall or not spans:
+        return
+    
+    with placeholder.container():
+        st.markdown("### ⏱️ 耗时瀑布图")
+        fig = create_trace_waterfall(spans)
+        if fig:
+            st.plotly_chart(fig, use_container_width=True)
+
+
 # 侧边栏
 with st.sidebar:
     st.markdown("## 🔐 配置")
@@ -118,12 +135,23 @@ BullBearQA 支持以下类型的问题：
     with st.expander("⚙️ 高级设置"):
         show_routing = st.checkbox("显示路由信息", value=False)
         show_timing = st.checkbox("显示执行时间", value=True)
+        show_waterfall = st.checkbox("显示耗时瀑布图", value=False)
+        show_startup = st.checkbox("显示启动耗时报告", value=False)
+    
+    # 最近一次请求的耗时瀑布图（新分析完成后会原地刷新）
+    trace_placeholder = st.empty()
+    render_trace_waterfall(trace_placeholder)
+    
+    if show_startup:
+        st.code(format_report(), language=None)
     
     st.markdown("---")
     
     # 清除历史
     if st.button("🗑️ 清除对话历史"):
         st.session_state.messages = []
+        st.session_state.analyses = {}
+        st.session_state.memory = ConversationMemory()
         st.rerun()
     
     st.markdown("---")
@@ -197,215 +225,142 @@ BullBearQA 支持以下类型的问题：
 # 初始化组件（带缓存）
 @st.cache_resource
 def get_components(api_key: str):
-    """初始化所有组件（带缓存）"""
-    llm = ChatOpenAI(
-        model="deepseek-chat",
-        openai_api_key=api_key,
-        openai_api_base="https://api.deepseek.com",
-        temperature=0.7
-    )
-    
-    router = QuestionRouter(llm)
-    fundamental_agent = FundamentalAgent(llm)
-    technical_agent = TechnicalAgent(llm)
-    sentiment_agent = SentimentAgent(llm)
-    comparison_agent = ComparisonAgent(llm)
-    judge = ArenaJudge(llm)
-    strategy_generator = StrategyGenerator()
-    options_recommender = OptionsRecommender()
-    
-    return {
-        'router': router,
-        'fundamental_agent': fundamental_agent,
-        'technical_agent': technical_agent,
-        'sentiment_agent': sentiment_agent,
-        'comparison_agent': comparison_agent,
-        'judge': judge,
-        'strategy_generator': strategy_generator,
-        'options_recommender': options_recommender
-    }
+    """初始化所有组件（带缓存），并启动后台缓存预热"""
+    start_cache_warmer()
+    return build_components(api_key)
 
 # 初始化对话历史
 if 'messages' not in st.session_state:
     st.session_state.messages = []
 
-# 显示对话历史
-for message in st.session_state.messages:
-    with st.chat_message(message["role"]):
-        st.markdown(message["content"])
+# 已完成的分析结果（analysis_id -> 分析记录），页面重跑时直接复用，不再调用LLM
+if 'analyses' not in st.session_state:
+    st.session_state.analyses = {}
 
-# 主对话界面
-if api_key:
-    try:
-        components = get_components(api_key)
-        router = components['router']
-        fundamental_agent = components['fundamental_agent']
-        technical_agent = components['technical_agent']
-        sentiment_agent = components['sentiment_agent']
-        comparison_agent = components['comparison_agent']
-        judge = components['judge']
-        tracker = st.session_state.paper_tracker
+# 传给 Agent 的多轮记忆（最近几轮 + 滚动摘要，长度有上限；messages 只用于页面展示）
+if 'memory' not in st.session_state:
+    st.session_state.memory = ConversationMemory()
+
+PERIOD_LABELS = {
+    "1mo": "1个月",
+    "3mo": "3个月",
+    "6mo": "6个月",
+    "1y": "1年",
+    "2y": "2年",
+    "5y": "5年"
+}
+
+
+@st.fragment
+def render_chart_section(analysis_id: str):
+    """K线图/对比图片段：切换周期只重跑这一部分"""
+    record = st.session_state.analyses.get(analysis_id)
+    if not record:
+        return
+    
+    tickers = record['tickers']
+    ticker = record['ticker']
+    chart_generator = CandlestickChart()
+    # 每个周期的图表数据只生成一次
+    charts = record.setdefault('charts', {})
+    
+    st.markdown("---")
+    
+    # 情况1: 对比查询（多个股票）
+    if len(tickers) >= 2:
+        st.markdown("## 📈 股票走势对比")
         
-        if prompt := st.chat_input("请输入你的股票分析问题..."):
-            st.session_state.messages.append({"role": "user", "content": prompt})
-            with st.chat_message("user"):
-                st.markdown(prompt)
+        chart_period = st.selectbox(
+            "📅 选择时间周期",
+            options=list(PERIOD_LABELS.keys()),
+            index=3,
+            format_func=lambda x: PERIOD_LABELS[x],
+            key=f"chart_period_compare_{analysis_id}"
+        )
+        
+        cache_key = f"compare_{chart_period}"
+        if cache_key not in charts:
+            # 一次批量下载：对比图和价格指标共用同一个对齐矩阵
+            with st.spinner("🎨 正在生成对比图..."):
+                charts[cache_key] = chart_generator.get_comparison_bundle(tickers, chart_period)
+        comparison_bundle = charts[cache_key]
+        
+        if comparison_bundle:
+            st.plotly_chart(comparison_bundle['figure'], use_container_width=True)
             
-            with st.chat_message("assistant"):
-                message_placeholder = st.empty()
-                start_time = time.time()
-                
-                try:
-                    with st.spinner("🎯 正在分析问题..."):
-                        routing_result = router.route(prompt)
-                    
-                    if show_routing:
-                        st.info(router.format_routing_info(routing_result))
-                    
-                    agent_type = routing_result['agent_type']
-                    agent_outputs = {}
-                    tickers = routing_result.get('tickers', [])
-                    ticker = tickers[0] if tickers else None
-                    
-                    agents_map = {
-                        'fundamental': fundamental_agent,
-                        'technical': technical_agent,
-                        'sentiment': sentiment_agent,
-                        'comparison': comparison_agent
-                    }
-                    
-                    selected_agent = agents_map.get(agent_type)
-                    
-                    if selected_agent:
-                        progress_text = f"📊 正在执行{agent_type}分析..."
-                        with st.spinner(progress_text):
-                            output = selected_agent.run(prompt)
-                            agent_outputs[agent_type] = output
-                    
-                    if agent_type == 'comparison' and len(routing_result.get('tickers', [])) >= 2:
-                        pass
-                    
-                    with st.spinner("🤔 正在生成综合分析..."):
-                        final_response = judge.synthesize(prompt, agent_outputs)
-                    
-                    score_data = judge.create_investment_score(agent_outputs)
-                    st.session_state.last_score = score_data
-                    rating = score_data.get('rating', 'Hold')
-                    execution_time = time.time() - start_time
-                    
-                    response_text = final_response
-                    if show_timing:
-                        response_text += f"\n\n⏱️ 执行时间: {execution_time:.2f}秒"
-                    
-                    message_placeholder.markdown(response_text)
-                    st.session_state.messages.append({"role": "assistant", "content": response_text})
-                    
-                    # ========== 📈 K线图可视化（BUG修复：改进条件判断） ==========
-                    # BUG FIX: 修改条件，确保单个股票也能显示K线图
-                    if ticker or (tickers and len(tickers) >= 2):
-                        st.markdown("---")
-                        
-                        chart_generator = CandlestickChart()
-                        
-                        # 情况1: 对比查询（多个股票）
-                        if tickers and len(tickers) >= 2:
-                            st.markdown("## 📈 股票走势对比")
-                            
-                            chart_period = st.selectbox(
-                                "📅 选择时间周期",
-                                options=["1mo", "3mo", "6mo", "1y", "2y", "5y"],
-                                index=3,
-                                format_func=lambda x: {
-                                    "1mo": "1个月",
-                                    "3mo": "3个月", 
-                                    "6mo": "6个月",
-                                    "1y": "1年",
-                                    "2y": "2年",
-                                    "5y": "5年"
-                                }[x],
-                                key=f"chart_period_compare_{time.time()}"
-                            )
-                            
-                            with st.spinner("🎨 正在生成对比图..."):
-                                fig = chart_generator.create_comparison_chart(tickers, chart_period)
-                            
-                            if fig:
-                                st.plotly_chart(fig, use_container_width=True)
-                                
-                                st.markdown("### 📊 当前价格对比")
-                                cols = st.columns(len(tickers))
-                                for i, t in enumerate(tickers):
-                                    price_info = chart_generator.get_price_change(t)
-                                    if price_info:
-                                        with cols[i]:
-                                            change_color = "normal" if price_info['change'] >= 0 else "inverse"
-                                            st.metric(
-                                                t,
-                                                f"${price_info['current_price']:.2f}",
-                                                delta=f"{price_info['change_pct']:+.2f}%",
-                                                delta_color=change_color
-                                            )
-                                
-                                with st.expander("📊 图表说明", expanded=False):
-                                    st.markdown("""
+            st.markdown("### 📊 当前价格对比")
+            metrics = comparison_bundle['metrics']
+            cols = st.columns(len(metrics))
+            for i, (t, price_info) in enumerate(metrics.items()):
+                if price_info:
+                    with cols[i]:
+                        change_color = "normal" if price_info['change'] >= 0 else "inverse"
+                        st.metric(
+                            t,
+                            f"${price_info['current_price']:.2f}",
+                            delta=f"{price_info['change_pct']:+.2f}%",
+                            delta_color=change_color
+                        )
+            
+            with st.expander("📊 图表说明", expanded=False):
+                st.markdown("""
 **对比图说明：**
-- 📈 所有股票以第一天价格为基准（100%）归一化
+- 📈 所有股票对齐到相同交易日，以共同的第一天价格为基准（100%）归一化
+- ➗ 悬停可查看相对于所有股票平均表现的超额涨跌
 - 可以直观看出哪只股票涨幅更大
 - 🖱️ 鼠标悬停查看具体涨跌幅
 - 🔍 拖动选择区域放大查看细节
-                                    """)
-                            else:
-                                st.warning("⚠️ 无法获取对比数据")
-                        
-                        # 情况2: 单个股票查询
-                        elif ticker:
-                            st.markdown("## 📈 股价走势分析")
-                            
-                            col1, col2, col3 = st.columns([2, 1, 1])
-                            
-                            with col1:
-                                chart_period = st.selectbox(
-                                    "📅 选择时间周期",
-                                    options=["1mo", "3mo", "6mo", "1y", "2y", "5y"],
-                                    index=1,
-                                    format_func=lambda x: {
-                                        "1mo": "1个月",
-                                        "3mo": "3个月", 
-                                        "6mo": "6个月",
-                                        "1y": "1年",
-                                        "2y": "2年",
-                                        "5y": "5年"
-                                    }[x],
-                                    key=f"chart_period_{ticker}_{time.time()}"
-                                )
-                            
-                            with col2:
-                                price_info = chart_generator.get_price_change(ticker)
-                                if price_info:
-                                    change_color = "normal" if price_info['change'] >= 0 else "inverse"
-                                    st.metric(
-                                        "当前价格", 
-                                        f"${price_info['current_price']:.2f}",
-                                        delta=f"{price_info['change_pct']:+.2f}%",
-                                        delta_color=change_color
-                                    )
-                            
-                            with col3:
-                                if price_info:
-                                    st.metric(
-                                        "52周区间",
-                                        f"${price_info['low_52w']:.1f}",
-                                        delta=f"${price_info['high_52w']:.1f}"
-                                    )
-                            
-                            with st.spinner("🎨 正在生成K线图..."):
-                                fig = chart_generator.create_chart(ticker, chart_period)
-                            
-                            if fig:
-                                st.plotly_chart(fig, use_container_width=True)
-                                
-                                with st.expander("📊 图表说明", expanded=False):
-                                    st.markdown("""
+                """)
+        else:
+            st.warning("⚠️ 无法获取对比数据")
+    
+    # 情况2: 单个股票查询
+    elif ticker:
+        st.markdown("## 📈 股价走势分析")
+        
+        col1, col2, col3 = st.columns([2, 1, 1])
+        
+        with col1:
+            chart_period = st.selectbox(
+                "📅 选择时间周期",
+                options=list(PERIOD_LABELS.keys()),
+                index=1,
+                format_func=lambda x: PERIOD_LABELS[x],
+                key=f"chart_period_{analysis_id}"
+            )
+        
+        cache_key = f"single_{chart_period}"
+        if cache_key not in charts:
+            # 一次下载：K线图、当前价格和52周区间共用同一份数据
+            with st.spinner("🎨 正在生成K线图..."):
+                charts[cache_key] = chart_generator.get_chart_bundle(ticker, chart_period)
+        chart_bundle = charts[cache_key]
+        price_info = chart_bundle['price_info'] if chart_bundle else None
+        fig = chart_bundle['figure'] if chart_bundle else None
+        
+        with col2:
+            if price_info:
+                change_color = "normal" if price_info['change'] >= 0 else "inverse"
+                st.metric(
+                    "当前价格",
+                    f"${price_info['current_price']:.2f}",
+                    delta=f"{price_info['change_pct']:+.2f}%",
+                    delta_color=change_color
+                )
+        
+        with col3:
+            if price_info:
+                st.metric(
+                    "52周区间",
+                    f"${price_info['low_52w']:.1f}",
+                    delta=f"${price_info['high_52w']:.1f}"
+                )
+        
+        if fig:
+            st.plotly_chart(fig, use_container_width=True)
+            
+            with st.expander("📊 图表说明", expanded=False):
+                st.markdown("""
 **K线图说明：**
 - 🟢 **绿色K线**：当日收盘价高于开盘价（上涨）
 - 🔴 **红色K线**：当日收盘价低于开盘价（下跌）
@@ -417,71 +372,90 @@ if api_key:
 - 🖱️ 鼠标悬停查看详细数据
 - 🔍 拖动选择区域放大
 - 📌 双击重置视图
-                                    """)
-                            else:
-                                st.warning("⚠️ 无法获取股价数据，请稍后重试或检查股票代码")
-                    # ========== K线图功能结束 ==========
-                    
-                    if ticker:
-                        st.markdown("---")
-                        st.subheader("📋 可执行交易策略")
-                        
-                        rating_emoji = {'Buy': '🟢', 'Sell': '🔴', 'Hold': '🟡'}
-                        st.info(f"{rating_emoji.get(rating, '🟡')} **当前评级: {rating}**")
-                        
-                        col1, col2 = st.columns([3, 1])
-                        with col1:
-                            risk_tolerance = st.select_slider(
-                                "风险偏好",
-                                options=["low", "medium", "high"],
-                                value="medium",
-                                format_func=lambda x: {"low": "🐌 保守", "medium": "🎯 平衡", "high": "🚀 激进"}[x],
-                                key=f"risk_{ticker}_{time.time()}"
-                            )
-                        
-                        strategy_rating = rating if rating in ['Buy', 'Sell'] else 'Buy'
-                        strategy = components['strategy_generator'].generate_strategy(
-                            ticker=ticker,
-                            rating=strategy_rating,
-                            analysis_result=agent_outputs,
-                            risk_tolerance=risk_tolerance
-                        )
-                        
-                        if strategy:
-                            if rating == 'Hold':
-                                st.warning("💡 **注意**: 当前评级为Hold，以下策略仅供参考。如果你决定交易，建议谨慎操作。")
-                            
-                            st.success(f"✅ 已生成 {strategy['action']} 策略")
-                            
-                            col1, col2, col3, col4 = st.columns(4)
-                            with col1:
-                                st.metric("入场价", f"${strategy['entry_price']:.2f}")
-                            with col2:
-                                gain = ((strategy['target_price']/strategy['entry_price']-1)*100)
-                                st.metric("目标价", f"${strategy['target_price']:.2f}", delta=f"+{gain:.1f}%", delta_color="normal")
-                            with col3:
-                                loss = ((1-strategy['stop_loss']/strategy['entry_price'])*100)
-                                st.metric("止损价", f"${strategy['stop_loss']:.2f}", delta=f"-{loss:.1f}%", delta_color="inverse")
-                            with col4:
-                                st.metric("建议仓位", strategy['position_size'])
-                            
-                            with st.expander("📊 策略详情", expanded=True):
-                                col1, col2 = st.columns(2)
-                                with col1:
-                                    st.write("**风险回报比**")
-                                    st.info(f"1 : {strategy['risk_reward_ratio']}")
-                                    st.write("**持仓周期**")
-                                    st.info(strategy['time_horizon'])
-                                with col2:
-                                    st.write("**策略理由**")
-                                    st.info(strategy['reason'])
-                                    st.write("**信心度**")
-                                    confidence = strategy['confidence']
-                                    st.progress(confidence)
-                                    st.caption(f"{confidence*100:.0f}%")
-                            
-                            st.write("**📝 交易订单（可复制）**")
-                            order_text = f"""
+                """)
+        else:
+            st.warning("⚠️ 无法获取股价数据，请稍后重试或检查股票代码")
+
+
+@st.fragment
+def render_strategy_section(analysis_id: str, pipeline: AnalysisPipeline, tracker):
+    """交易策略片段：调整风险偏好只重新计算策略，不再调用LLM"""
+    record = st.session_state.analyses.get(analysis_id)
+    if not record:
+        return
+    
+    ticker = record['ticker']
+    
+    st.markdown("---")
+    st.subheader("📋 可执行交易策略")
+    
+    # 多只股票时每只都可以生成策略（按各自的评级）
+    if len(record['tickers']) > 1:
+        ticker = st.radio(
+            "股票",
+            options=record['tickers'],
+            horizontal=True,
+            key=f"strategy_ticker_{analysis_id}"
+        )
+    rating = record.get('scores', {}).get(ticker, {}).get('rating', record['rating'])
+    
+    rating_emoji = {'Buy': '🟢', 'Sell': '🔴', 'Hold': '🟡'}
+    st.info(f"{rating_emoji.get(rating, '🟡')} **{ticker} 当前评级: {rating}**")
+    
+    col1, col2 = st.columns([3, 1])
+    with col1:
+        risk_tolerance = st.select_slider(
+            "风险偏好",
+            options=["low", "medium", "high"],
+            value="medium",
+            format_func=lambda x: {"low": "🐌 保守", "medium": "🎯 平衡", "high": "🚀 激进"}[x],
+            key=f"risk_{analysis_id}"
+        )
+    
+    # 每只股票、每个风险偏好的策略只生成一次
+    strategies = record.setdefault('strategies', {})
+    cache_key = (ticker, risk_tolerance)
+    if cache_key not in strategies:
+        strategies[cache_key] = pipeline.generate_strategy(
+            ticker, rating, record.get('snapshot'), risk_tolerance, live_price=record.get('cached', False)
+        )
+    strategy = strategies[cache_key]
+    
+    if strategy:
+        if rating == 'Hold':
+            st.warning("💡 **注意**: 当前评级为Hold，以下策略仅供参考。如果你决定交易，建议谨慎操作。")
+        
+        st.success(f"✅ 已生成 {strategy['action']} 策略")
+        
+        col1, col2, col3, col4 = st.columns(4)
+        with col1:
+            st.metric("入场价", f"${strategy['entry_price']:.2f}")
+        with col2:
+            gain = ((strategy['target_price']/strategy['entry_price']-1)*100)
+            st.metric("目标价", f"${strategy['target_price']:.2f}", delta=f"+{gain:.1f}%", delta_color="normal")
+        with col3:
+            loss = ((1-strategy['stop_loss']/strategy['entry_price'])*100)
+            st.metric("止损价", f"${strategy['stop_loss']:.2f}", delta=f"-{loss:.1f}%", delta_color="inverse")
+        with col4:
+            st.metric("建议仓位", strategy['position_size'])
+        
+        with st.expander("📊 策略详情", expanded=True):
+            col1, col2 = st.columns(2)
+            with col1:
+                st.write("**风险回报比**")
+                st.info(f"1 : {strategy['risk_reward_ratio']}")
+                st.write("**持仓周期**")
+                st.info(strategy['time_horizon'])
+            with col2:
+                st.write("**策略理由**")
+                st.info(strategy['reason'])
+                st.write("**信心度**")
+                confidence = strategy['confidence']
+                st.progress(confidence)
+                st.caption(f"{confidence*100:.0f}%")
+        
+        st.write("**📝 交易订单（可复制）**")
+        order_text = f"""
 交易订单
 ━━━━━━━━━━━━━━━━━━
 股票代码: {strategy['ticker']}
@@ -497,68 +471,206 @@ if api_key:
 持仓周期: {strategy['time_horizon']}
 
 理由: {strategy['reason']}
-                            """
-                            st.code(order_text, language="text")
-                            
-                            # ========== BUG修复：移除 st.rerun() 避免页面刷新导致内容消失 ==========
-                            col1, col2 = st.columns([1, 3])
-                            with col1:
-                                if st.button("💾 保存到模拟盘", type="primary", key=f"save_{ticker}_{time.time()}"):
-                                    trade_id = tracker.add_trade(strategy)
-                                    st.success(f"✅ 已保存到模拟盘（交易编号 #{trade_id}）")
-                                    st.balloons()
-                                    # BUG FIX: 移除 st.rerun() - 让用户看到保存成功信息，不刷新页面
-                                    st.info("💡 请在侧边栏勾选「查看交易记录」查看已保存的策略")
-                            with col2:
-                                st.caption("💡 保存后可在侧边栏查看交易记录和追踪盈亏")
-                            # ========== BUG修复结束 ==========
+        """
+        st.code(order_text, language="text")
+        
+        col1, col2 = st.columns([1, 3])
+        with col1:
+            if st.button("💾 保存到模拟盘", type="primary", key=f"save_{analysis_id}_{ticker}_{risk_tolerance}"):
+                trade_id = tracker.add_trade(strategy)
+                st.success(f"✅ 已保存到模拟盘（交易编号 #{trade_id}）")
+                st.balloons()
+                st.info("💡 请在侧边栏勾选「查看交易记录」查看已保存的策略")
+        with col2:
+            st.caption("💡 保存后可在侧边栏查看交易记录和追踪盈亏")
+    else:
+        st.warning("⚠️ 策略生成失败，可能是获取价格数据失败，请稍后重试")
+
+
+@st.fragment
+def render_options_section(analysis_id: str, options_recommender):
+    """期权策略片段：调整波动率只重跑这一部分"""
+    record = st.session_state.analyses.get(analysis_id)
+    if not record:
+        return
+    
+    ticker = record['ticker']
+    rating = record['rating']
+    
+    st.markdown("---")
+    st.subheader("📊 期权策略推荐（进阶）")
+    
+    if rating == 'Hold':
+        st.caption("💡 虽然当前建议持有，但如果你已持有股票，可以考虑备兑开仓等策略增强收益")
+    else:
+        st.caption("💡 如果你了解期权，可以考虑以下策略")
+    
+    volatility = st.select_slider(
+        "当前波动率",
+        options=["low", "medium", "high"],
+        value="medium",
+        format_func=lambda x: {"low": "📉 低波动", "medium": "📊 中等", "high": "📈 高波动"}[x],
+        key=f"vol_{analysis_id}"
+    )
+    
+    options_strategies = options_recommender.recommend_strategies(ticker, rating, volatility)
+    
+    for i, strategy_opt in enumerate(options_strategies, 1):
+        with st.expander(f"{strategy_opt['name']} - 复杂度: {strategy_opt['complexity']}", expanded=(i==1 and rating=='Hold')):
+            col1, col2 = st.columns(2)
+            with col1:
+                st.write("**基本信息**")
+                st.write(f"适合场景: {strategy_opt['适合场景']}")
+                st.write(f"风险: {strategy_opt['风险']}")
+                st.write(f"收益: {strategy_opt['收益']}")
+                st.write(f"成本: {strategy_opt['成本']}")
+            with col2:
+                st.write("**推荐度**")
+                st.write(strategy_opt['推荐度'])
+                if '⚠️ 风险提示' in strategy_opt:
+                    st.warning(strategy_opt['⚠️ 风险提示'])
+                elif '💡 提示' in strategy_opt:
+                    st.info(strategy_opt['💡 提示'])
+            st.write("**策略说明**")
+            st.info(strategy_opt['说明'])
+            if strategy_opt.get('优点'):
+                st.write("**优点**")
+                for pro in strategy_opt['优点']:
+                    st.write(f"✅ {pro}")
+            if strategy_opt.get('缺点'):
+                st.write("**缺点**")
+                for con in strategy_opt['缺点']:
+                    st.write(f"⚠️ {con}")
+
+
+def render_analysis_sections(analysis_id: str, components: dict):
+    """渲染一次分析结果的图表、策略和期权部分"""
+    record = st.session_state.analyses.get(analysis_id)
+    if not record:
+        return
+    
+    if record['tickers']:
+        render_chart_section(analysis_id)
+    
+    if record['ticker']:
+        render_strategy_section(
+            analysis_id,
+            AnalysisPipeline(components),
+            st.session_state.paper_tracker
+        )
+        render_options_section(analysis_id, components['options_recommender'])
+
+
+# 显示对话历史（已完成的分析直接从 session_state 渲染，不再调用LLM）
+for message in st.session_state.messages:
+    with st.chat_message(message["role"]):
+        st.markdown(message["content"])
+        if message.get("analysis_id") and api_key:
+            render_analysis_sections(message["analysis_id"], get_components(api_key))
+
+# 主对话界面
+if api_key:
+    try:
+        components = get_components(api_key)
+        pipeline = AnalysisPipeline(components)
+        
+        if prompt := st.chat_input("请输入你的股票分析问题..."):
+            st.session_state.messages.append({"role": "user", "content": prompt})
+            with st.chat_message("user"):
+                st.markdown(prompt)
+            
+            with st.chat_message("assistant"):
+                message_placeholder = st.empty()
+                start_time = time.time()
+                
+                try:
+                    # 分析ID同时作为追踪的请求ID
+                    analysis_id = uuid.uuid4().hex[:12]
+                    with start_trace(analysis_id, name="streamlit") as trace:
+                        with st.spinner("🎯 正在分析问题..."):
+                            routing_result = pipeline.route(prompt, st.session_state.memory)
+                        
+                        if show_routing:
+                            st.info(pipeline.router.format_routing_info(routing_result))
+                        if routing_result.get('dropped_tickers'):
+                            st.warning(
+                                f"⚠️ 单次最多分析 {MAX_FANOUT_TICKERS} 只股票，"
+                                f"未分析：{', '.join(routing_result['dropped_tickers'])}"
+                            )
+                        
+                        agent_type = routing_result['agent_type']
+                        tickers = routing_result.get('tickers', [])
+                        ticker = tickers[0] if tickers else None
+                        
+                        # 同一意图（其他会话问过也算）在数据变化前直接复用之前的答案
+                        chat_history = st.session_state.memory.messages()
+                        cached = pipeline.cached_answer(routing_result)
+                        if cached:
+                            snapshot = cached['snapshot']
+                            agent_outputs = cached['agent_outputs']
                         else:
-                            st.warning("⚠️ 策略生成失败，可能是获取价格数据失败，请稍后重试")
+                            progress_text = f"📊 正在执行{agent_type}分析..."
+                            with st.spinner(progress_text):
+                                snapshot = AnalysisSnapshot()
+                                agent_outputs = pipeline.run_agents(
+                                    prompt, routing_result, snapshot, chat_history
+                                )
                         
-                        st.markdown("---")
-                        st.subheader("📊 期权策略推荐（进阶）")
+                        # 每只股票各自评分（策略按各自评级生成），主股票的评分用于侧边栏和快速模式
+                        scores = pipeline.score_all(agent_outputs, snapshot, tickers)
+                        score_data = scores[ticker] if ticker else pipeline.score(agent_outputs, snapshot)
                         
-                        if rating == 'Hold':
-                            st.caption("💡 虽然当前建议持有，但如果你已持有股票，可以考虑备兑开仓等策略增强收益")
+                        if cached:
+                            final_response = cached['report']
                         else:
-                            st.caption("💡 如果你了解期权，可以考虑以下策略")
+                            with st.spinner("🤔 正在生成综合分析..."):
+                                final_response = pipeline.synthesize(
+                                    prompt, agent_outputs, snapshot, score_data, ticker
+                                )
+                            pipeline.store_answer(routing_result, agent_outputs, final_response, snapshot)
+                        st.session_state.memory.add_turn(prompt, final_response, tickers, agent_type)
                         
-                        volatility = st.select_slider(
-                            "当前波动率",
-                            options=["low", "medium", "high"],
-                            value="medium",
-                            format_func=lambda x: {"low": "📉 低波动", "medium": "📊 中等", "high": "📈 高波动"}[x],
-                            key=f"vol_{ticker}_{time.time()}"
-                        )
+                        st.session_state.last_score = score_data
+                        rating = score_data.get('rating', 'Hold')
+                        execution_time = time.time() - start_time
+                        
+                        response_text = final_response
+                        if show_timing:
+                            response_text += f"\n\n⏱️ 执行时间: {execution_time:.2f}秒"
+                            if cached:
+                                response_text += "（缓存答案）"
                         
-                        options_strategies = components['options_recommender'].recommend_strategies(ticker, rating, volatility)
+                        message_placeholder.markdown(response_text)
                         
-                        for i, strategy_opt in enumerate(options_strategies, 1):
-                            with st.expander(f"{strategy_opt['name']} - 复杂度: {strategy_opt['complexity']}", expanded=(i==1 and rating=='Hold')):
-                                col1, col2 = st.columns(2)
-                                with col1:
-                                    st.write("**基本信息**")
-                                    st.write(f"适合场景: {strategy_opt['适合场景']}")
-                                    st.write(f"风险: {strategy_opt['风险']}")
-                                    st.write(f"收益: {strategy_opt['收益']}")
-                                    st.write(f"成本: {strategy_opt['成本']}")
-                                with col2:
-                                    st.write("**推荐度**")
-                                    st.write(strategy_opt['推荐度'])
-                                    if '⚠️ 风险提示' in strategy_opt:
-                                        st.warning(strategy_opt['⚠️ 风险提示'])
-                                    elif '💡 提示' in strategy_opt:
-                                        st.info(strategy_opt['💡 提示'])
-                                st.write("**策略说明**")
-                                st.info(strategy_opt['说明'])
-                                if strategy_opt.get('优点'):
-                                    st.write("**优点**")
-                                    for pro in strategy_opt['优点']:
-                                        st.write(f"✅ {pro}")
-                                if strategy_opt.get('缺点'):
-                                    st.write("**缺点**")
-                                    for con in strategy_opt['缺点']:
-                                        st.write(f"⚠️ {con}")
+                        # 保存完整分析结果，之后的交互（切换周期、风险偏好）只读取这里
+                        st.session_state.analyses[analysis_id] = {
+                            'id': analysis_id,
+                            'prompt': prompt,
+                            'routing': routing_result,
+                            'agent_outputs': agent_outputs,
+                            'snapshot': snapshot,
+                            'report': final_response,
+                            'score': score_data,
+                            'rating': rating,
+                            'scores': scores,
+                            'tickers': tickers,
+                            'ticker': ticker,
+                            'execution_time': execution_time,
+                            'charts': {},
+                            'strategies': {},
+                            # 缓存答案的快照价格可能已经过时，策略按实时价格计算
+                            'cached': bool(cached)
+                        }
+                        st.session_state.messages.append({
+                            "role": "assistant",
+                            "content": response_text,
+                            "analysis_id": analysis_id
+                        })
+                        
+                        render_analysis_sections(analysis_id, components)
+                    
+                    st.session_state.last_trace = trace.to_dicts()
+                    render_trace_waterfall(trace_placeholder)
                     
                 except Exception as e:
                     error_message = f"❌ 处理过程中出现错误: {str(e)}"
@@ -0,0 +1,96 @@
+# -*- coding: utf-8 -*-
+"""pipeline/answer_cache.py 与 AnalysisPipeline 缓存流程的测试"""
+
+import re
+
+import pytest
+
+import pipeline.analysis_pipeline as analysis_pipeline
+from agents.conversation_memory import ConversationMemory
+from pipeline.analysis_pipeline import AnalysisPipeline
+from pipeline.answer_cache import AnswerCache
+
+
+class FakeRouter:
+    """规则：问题里的大写代码为股票，没有时沿用上下文"""
+
+    def route(self, question, context_tickers=None):
+        tickers = re.findall(r"(?<![A-Za-z])[A-Z]{2,5}(?![A-Za-z])", question)
+        from_context = not tickers and bool(context_tickers)
+        return {
+            'agent_type': 'technical',
+            'tickers': tickers or list(context_tickers or []),
+            'method': 'rule',
+            'confidence': 'high',
+            'tickers_from_context': from_context
+        }
+
+
+class CountingAgent:
+    def __init__(self):
+        self.calls = 0
+
+    def run(self, question, chat_history=None):
+        self.calls += 1
+        return f"技术面分析 #{self.calls}"
+
+
+class FakeJudge:
+    def synthesize(self, question, agent_outputs, snapshot=None, score_data=None, ticker=None, stats=None):
+        return "综合报告：" + " / ".join(agent_outputs.values())
+
+    def create_investment_score(self, agent_outputs, snapshot=None, ticker=None):
+        return {'score': 50, 'rating': 'Hold', 'breakdown': {}}
+
+
+@pytest.fixture
+def pipeline(tmp_path, monkeypatch):
+    monkeypatch.setattr(analysis_pipeline, "record_request", lambda tickers: None)
+    agent = CountingAgent()
+    components = {'router': FakeRouter(), 'technical_agent': agent, 'judge': FakeJudge()}
+    result = AnalysisPipeline(components, answer_cache=AnswerCache(str(tmp_path / "answers.sqlite3")))
+    result.agent = agent
+    return result
+
+
+def test_independent_question_in_same_session_hits_cache(pipeline):
+    # 另一个会话先问过 AAPL 技术面
+    first = pipeline.analyze("AAPL技术面怎么样", include_strategy=False)
+    assert first['answer_cache'] == 'miss'
+
+    # 本会话已有历史，新问题与前文无关，仍然命中
+    memory = ConversationMemory()
+    pipeline.analyze("MSFT技术面怎么样", include_strategy=False, memory=memory)
+    second = pipeline.analyze("AAPL的均线形态如何", include_strategy=False, memory=memory)
+
+    assert second['routing']['follow_up'] is False
+    assert second['answer_cache'] == 'hit'
+    assert second['report'] == first['report']
+    assert pipeline.agent.calls == 2
+
+
+def test_follow_up_questions_skip_cache(pipeline):
+    memory = ConversationMemory()
+    pipeline.analyze("AAPL技术面怎么样", include_strategy=False, memory=memory)
+
+    # 没有提到股票，沿用上一轮
+    from_context = pipeline.analyze("支撑位在哪", include_strategy=False, memory=memory)
+    # 提到了股票，但指代前文
+    refers_back = pipeline.analyze("刚才说的AAPL阻力位再详细讲讲", include_strategy=False, memory=memory)
+
+    assert from_context['routing']['follow_up'] is True
+    assert from_context['answer_cache'] == 'miss'
+    assert refers_back['routing']['follow_up'] is True
+    assert refers_back['answer_cache'] == 'miss'
+    assert pipeline.agent.calls == 3
+
+
+def test_follow_up_answers_are_not_stored(pipeline):
+    memory = ConversationMemory()
+    pipeline.analyze("AAPL技术面怎么样", include_strategy=False, memory=memory)
+    pipeline.analyze("它的RSI呢", include_strategy=False, memory=memory)
+
+    # 新会话拿到的是独立问题的答案，不是追问的答案
+    fresh = pipeline.analyze("AAPL技术面如何", include_strategy=False)
+    assert fresh['answer_cache'] == 'hit'
+    assert fresh['report'] == "综合报告：技术面分析 #1"
@@ -0,0 +1,104 @@
+# -*- coding: utf-8 -*-
+"""judge/arena_judge.py 快速模式的测试"""
+
+import pytest
+
+from data.analysis_snapshot import AnalysisSnapshot
+from judge.arena_judge import ArenaJudge
+
+
+class FailingLLM:
+    """快速模式下不应调用 LLM"""
+
+    def invoke(self, prompt):
+        raise AssertionError("LLM should not be called in fast mode")
+
+
+class EchoLLM:
+    """记录发给 LLM 的提示词"""
+
+    def __init__(self):
+        self.prompts = []
+
+    def invoke(self, prompt):
+        self.prompts.append(prompt)
+        return type("Response", (), {"content": "综合报告"})()
+
+
+def _snapshot(**values):
+    snapshot = AnalysisSnapshot()
+    snapshot.update('AAPL', **values)
+    return snapshot
+
+
+BULLISH = {
+    'fundamental': dict(price=190.0, pe=12.0, roe=0.3, revenue_growth=0.2, profit_margin=0.25),
+    'technical': dict(price=190.0, rsi=55.0, ma20=180.0, ma50=170.0, macd_histogram=1.2),
+    'sentiment': dict(sentiment_score=0.8, news_count=8),
+}
+NEUTRAL = {
+    'fundamental': dict(price=190.0, pe=25.0, roe=0.1, revenue_growth=0.05),
+    'technical': dict(price=190.0, rsi=50.0, ma20=190.0, ma50=170.0),
+    'sentiment': dict(sentiment_score=0.05, news_count=8),
+}
+
+
+@pytest.mark.parametrize("agent_type", ['fundamental', 'technical', 'sentiment'])
+def test_default_judge_uses_fast_mode_for_clear_single_agent(agent_type):
+    judge = ArenaJudge(FailingLLM(), fast_mode=True)
+    outputs = {agent_type: "分析内容：信号偏多"}
+    snapshot = _snapshot(**BULLISH[agent_type])
+    score_data = judge.create_investment_score(outputs, snapshot, 'AAPL')
+
+    assert judge.fast_path_reason(outputs, snapshot, score_data, 'AAPL') == "单一维度信号明确"
+    report = judge.synthesize("AAPL怎么样", outputs, snapshot, score_data, 'AAPL')
+    assert "快速模式" in report
+    assert "分析内容：信号偏多" in report
+
+
+@pytest.mark.parametrize("agent_type", ['fundamental', 'technical', 'sentiment'])
+def test_neutral_single_agent_goes_to_llm(agent_type):
+    judge = ArenaJudge(FailingLLM(), fast_mode=True)
+    outputs = {agent_type: "分析内容"}
+    snapshot = _snapshot(**NEUTRAL[agent_type])
+    score_data = judge.create_investment_score(outputs, snapshot, 'AAPL')
+
+    assert judge.fast_path_reason(outputs, snapshot, score_data, 'AAPL') is None
+
+
+def test_conflicting_dimensions_go_to_llm():
+    judge = ArenaJudge(FailingLLM(), fast_mode=True)
+    outputs = {'fundamental': "偏多", 'technical': "偏空"}
+    snapshot = _snapshot(**BULLISH['fundamental'])
+    snapshot.update('AAPL', rsi=80.0, ma20=200.0, ma50=210.0, macd_histogram=-1.0)
+    score_data = judge.create_investment_score(outputs, snapshot, 'AAPL')
+
+    assert judge.fast_path_reason(outputs, snapshot, score_data, 'AAPL') is None
+
+
+def test_dimensions_without_agent_are_ignored():
+    judge = ArenaJudge(FailingLLM(), fast_mode=True)
+    # 快照里顺带有技术面数据，但本次只运行了基本面 Agent
+    outputs = {'fundamental': "偏多"}
+    snapshot = _snapshot(**BULLISH['fundamental'])
+    snapshot.update('AAPL', rsi=80.0, ma20=200.0, ma50=210.0, macd_histogram=-1.0)
+    score_data = judge.create_investment_score(outputs, snapshot, 'AAPL')
+
+    assert judge.fast_path_reason(outputs, snapshot, score_data, 'AAPL') == "单一维度信号明确"
+
+
+def test_llm_path_reports_compaction_stats():
+    llm = EchoLLM()
+    judge = ArenaJudge(llm, fast_mode=False, agent_token_budget=40)
+    repeated = "AAPL 当前价格 190 美元，市盈率 28 倍。"
+    outputs = {
+        'fundamental': "━━━━━━\n" + repeated + "\n" + "营收稳定增长，现金流充裕。" * 20,
+        'technical': repeated + "\nRSI 55，均线多头排列。",
+    }
+    stats = {}
+
+    assert judge.synthesize("全面分析AAPL", outputs, stats=stats) == "综合报告"
+    assert len(llm.prompts) == 1
+    assert stats['tokens_saved'] == stats['tokens_before'] - stats['tokens_after'] > 0
+    assert stats['duplicate_lines'] >= 1
+    assert 'fundamental' in stats['truncated']
@@ -0,0 +1,79 @@
+# -*- coding: utf-8 -*-
+"""agents/conversation_memory.py 的测试"""
+
+from agents.conversation_memory import ConversationMemory, MemoryStore
+from utils.token_estimate import estimate_tokens
+
+
+def _answer(i):
+    return (
+        f"📊 **第{i}轮分析**\n━━━━━━━━━━━━\n"
+        f"营收增长稳健，利润率保持在高位。综合来看建议持有，等待回调第{i}次。\n"
+        + "补充说明：现金流充裕，回购力度较大。" * 20
+    )
+
+
+def test_recent_turns_are_kept_verbatim_without_decoration():
+    memory = ConversationMemory(max_turns=3)
+    memory.add_turn("AAPL基本面怎么样", "📊 **结论**：估值偏高，建议持有", ['AAPL'], 'fundamental')
+
+    assert memory.messages() == [
+        ("human", "AAPL基本面怎么样"),
+        ("ai", "结论：估值偏高，建议持有"),
+    ]
+
+
+def test_old_turns_fold_into_summary():
+    memory = ConversationMemory(max_turns=2)
+    memory.add_turn("AAPL基本面怎么样", _answer(1), ['AAPL'], 'fundamental')
+    memory.add_turn("它的RSI呢", "RSI 65，接近超买", ['AAPL'], 'technical')
+    memory.add_turn("MSFT呢", "MSFT 趋势向上", ['MSFT'], 'technical')
+
+    messages = memory.messages()
+    assert len(memory) == 2
+    assert messages[0][0] == "system"
+    # 摘要保留股票、分析类型、问题和结论句
+    assert "[AAPL 基本面] 问：AAPL基本面怎么样" in messages[0][1]
+    assert "答：营收增长稳健，利润率保持在高位。" not in messages[0][1]
+    assert "综合来看建议持有，等待回调第1次。" in messages[0][1]
+    assert [content for _, content in messages[1:]] == ["它的RSI呢", "RSI 65，接近超买", "MSFT呢", "MSFT 趋势向上"]
+
+
+def test_each_turn_is_truncated_to_turn_budget():
+    memory = ConversationMemory(turn_token_budget=50)
+    memory.add_turn("AAPL怎么样", _answer(1))
+
+    assert estimate_tokens(memory.messages()[1][1]) <= 50
+
+
+def test_summary_stays_within_budget_and_keeps_latest_entries():
+    memory = ConversationMemory(max_turns=3, turn_token_budget=300, summary_token_budget=120)
+    for i in range(30):
+        memory.add_turn(f"第{i}个问题：NVDA后市如何", _answer(i), ['NVDA'], 'technical')
+
+    assert estimate_tokens(memory.summary) <= 120
+    assert "第26个问题" in memory.summary
+    assert "第0个问题" not in memory.summary
+    # 历史总长度有上限：摘要 + K 轮 × (问题 + 回答)
+    assert memory.token_count() <= 120 + estimate_tokens("此前对话摘要：\n") + 3 * 2 * 300
+
+
+def test_last_tickers_returns_most_recent_turn_with_tickers():
+    memory = ConversationMemory()
+    assert memory.last_tickers() == []
+
+    memory.add_turn("对比AAPL和MSFT", "AAPL 更好", ['AAPL', 'MSFT'], 'comparison')
+    memory.add_turn("有什么推荐", "推荐关注科技股", [], 'screener')
+
+    assert memory.last_tickers() == ['AAPL', 'MSFT']
+
+
+def test_memory_store_evicts_least_recently_used_session():
+    store = MemoryStore(max_sessions=2)
+    first = store.get("a")
+    store.get("b")
+    assert store.get("a") is first
+
+    store.get("c")
+
+    assert list(store._memories) == ["a", "c"]
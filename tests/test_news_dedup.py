@@ -0,0 +1,155 @@
+# -*- coding: utf-8 -*-
+"""tools/news_dedup.py 的测试"""
+
+import random
+
+import pytest
+
+from tools.news_dedup import NewsDeduplicator, signature
+
+# 同一事件被不同来源转载的标题（改一个词、加减一两个词）
+VARIANT_PAIRS = [
+    ("Apple shares rise after earnings beat expectations",
+     "Apple shares climb after earnings beat expectations"),
+    ("Nvidia stock jumps as AI chip demand surges",
+     "Nvidia shares jump as AI chip demand surges"),
+    ("Tesla recalls 2 million vehicles over Autopilot concerns",
+     "Tesla recalls over 2 million vehicles over Autopilot safety concerns"),
+    ("Microsoft to invest $10 billion in OpenAI, sources say",
+     "Microsoft to invest $10 billion in OpenAI: sources"),
+    ("Apple unveils new iPhone 16 lineup at September event",
+     "Apple unveils iPhone 16 lineup at its September event"),
+    ("Amazon beats revenue estimates on strong cloud growth",
+     "Amazon tops revenue estimates on strong cloud growth"),
+    ("英伟达股价大涨，人工智能芯片需求强劲",
+     "英伟达股价大涨 人工智能芯片需求持续强劲"),
+]
+
+# 同一只股票的不同事件
+UNRELATED_PAIRS = [
+    ("Apple shares rise after earnings beat expectations",
+     "Apple faces EU antitrust fine over App Store rules"),
+    ("Apple shares rise after earnings beat expectations",
+     "Apple shares fall after earnings miss expectations"),
+    ("Nvidia stock jumps as AI chip demand surges",
+     "Nvidia CEO sells shares under preset trading plan"),
+    ("Tesla recalls 2 million vehicles over Autopilot concerns",
+     "Tesla cuts Model Y prices in China amid competition"),
+]
+
+
+def _item(title, source, link=""):
+    return {'title': title, 'source': source, 'link': link, 'summary': ""}
+
+
+@pytest.mark.parametrize("first,second", VARIANT_PAIRS)
+def test_variant_headlines_are_merged(first, second):
+    collapsed = NewsDeduplicator().collapse([
+        _item(first, "Yahoo Finance", "https://a.example/1"),
+        _item(second, "Nasdaq", "https://b.example/1"),
+    ])
+
+    assert len(collapsed) == 1
+    assert collapsed[0]['title'] == first
+    assert collapsed[0]['duplicates'] == 1
+    assert collapsed[0]['sources'] == ["Yahoo Finance", "Nasdaq"]
+
+
+@pytest.mark.parametrize("first,second", UNRELATED_PAIRS)
+def test_unrelated_headlines_are_kept(first, second):
+    collapsed = NewsDeduplicator().collapse([
+        _item(first, "Yahoo Finance", "https://a.example/1"),
+        _item(second, "Yahoo Finance", "https://a.example/2"),
+    ])
+
+    assert [entry['duplicates'] for entry in collapsed] == [0, 0]
+
+
+def test_repeat_refresh_does_not_recount_linked_items():
+    dedup = NewsDeduplicator()
+    items = [
+        _item(VARIANT_PAIRS[0][0], "Yahoo Finance", "https://a.example/1"),
+        _item(VARIANT_PAIRS[0][1], "Nasdaq", "https://b.example/1"),
+    ]
+
+    for _ in range(3):
+        collapsed = dedup.collapse(items)
+
+    assert len(collapsed) == 1
+    assert collapsed[0]['duplicates'] == 1
+    assert len(dedup) == 1
+
+
+def test_repeat_refresh_does_not_recount_items_without_link():
+    dedup = NewsDeduplicator()
+    items = [
+        _item(VARIANT_PAIRS[1][0], "Google News"),
+        _item(VARIANT_PAIRS[1][1], "Nasdaq"),
+        _item(UNRELATED_PAIRS[2][1], "Google News"),
+    ]
+
+    first = dedup.collapse(items)
+    second = dedup.collapse(items)
+
+    assert [entry['duplicates'] for entry in first] == [1, 0]
+    assert [entry['duplicates'] for entry in second] == [1, 0]
+
+
+def test_new_variant_after_refresh_is_counted_once():
+    dedup = NewsDeduplicator()
+    first, second = VARIANT_PAIRS[5]
+    dedup.collapse([_item(first, "Yahoo Finance", "https://a.example/1")])
+
+    collapsed = dedup.collapse([
+        _item(first, "Yahoo Finance", "https://a.example/1"),
+        _item(second, "Google News", "https://c.example/9"),
+    ])
+
+    assert collapsed[0]['duplicates'] == 1
+    assert collapsed[0]['sources'] == ["Yahoo Finance", "Google News"]
+
+
+def test_evicted_clusters_release_their_keys():
+    dedup = NewsDeduplicator(max_clusters=2)
+    dedup.collapse([
+        _item(UNRELATED_PAIRS[0][1], "Yahoo Finance"),
+        _item(UNRELATED_PAIRS[2][1], "Yahoo Finance"),
+        _item(UNRELATED_PAIRS[3][1], "Yahoo Finance"),
+    ])
+
+    assert len(dedup) == 2
+    assert len(dedup._link_index) == 2
+
+
+def _synthetic_titles(count, seed):
+    rnd = random.Random(seed)
+    vocab = [f"word{i}" for i in range(3000)]
+    return [" ".join(["Apple"] + rnd.sample(vocab, rnd.randint(7, 11))) for _ in range(count)]
+
+
+def test_candidate_count_stays_bounded():
+    dedup = NewsDeduplicator(max_clusters=1000)
+    dedup.collapse([_item(title, "Yahoo Finance") for title in _synthetic_titles(500, seed=1)])
+    assert len(dedup) == 500
+
+    counts = [len(dedup._candidates(signature(title))) for title in _synthetic_titles(200, seed=2)]
+
+    # 分段桶查找只返回极少数候选，而不是大部分聚类
+    assert sum(counts) / len(counts) < 5
+    assert max(counts) < 25
+
+
+def test_variants_are_found_among_many_clusters():
+    titles = _synthetic_titles(500, seed=3)
+    dedup = NewsDeduplicator(max_clusters=1000)
+    dedup.collapse([_item(title, "Yahoo Finance") for title in titles])
+
+    rnd = random.Random(4)
+    found = 0
+    for title in titles[:100]:
+        words = title.split()
+        words[rnd.randrange(1, len(words))] = "replaced"
+        collapsed = dedup.collapse([_item(" ".join(words), "Nasdaq")])
+        found += collapsed[0]['duplicates'] > 0
+
+    assert found >= 95
@@ -0,0 +1,108 @@
+# -*- coding: utf-8 -*-
+"""judge/prompt_compactor.py 和 utils/token_estimate.py 的测试"""
+
+from judge.prompt_compactor import compact_outputs, strip_decoration
+from utils.token_estimate import estimate_tokens, truncate_to_tokens
+
+
+# ========== 去装饰 ==========
+
+def test_strip_decoration_removes_emoji_rules_and_markdown():
+    text = (
+        "📊 **AAPL 技术分析**\n"
+        "━━━━━━━━━━━━━━━━━━━━\n"
+        "\n"
+        "• RSI: 65.2 ✅\n"
+        "- MACD 柱为正\n"
+        "## 结论\n"
+        "> 趋势向上 ➡️ 持有"
+    )
+
+    assert strip_decoration(text).splitlines() == [
+        "AAPL 技术分析",
+        "RSI: 65.2",
+        "MACD 柱为正",
+        "结论",
+        "趋势向上 持有",
+    ]
+
+
+def test_strip_decoration_keeps_numbers_that_look_like_list_prefixes():
+    text = "1. 营收增长\n2) 利润率提升\n3、现金流稳定\n28.5 倍市盈率\n-3.2% 跌幅"
+
+    assert strip_decoration(text).splitlines() == [
+        "营收增长", "利润率提升", "现金流稳定", "28.5 倍市盈率", "-3.2% 跌幅"
+    ]
+
+
+# ========== 跨 Agent 去重 ==========
+
+def test_duplicate_lines_across_agents_are_dropped():
+    result = compact_outputs({
+        'fundamental': "📈 当前价格: $185.20\nPE 28.5，估值偏高",
+        'technical': "**当前价格: $185.20**\nRSI 65，接近超买",
+    })
+
+    assert result['outputs']['fundamental'] == "当前价格: $185.20\nPE 28.5，估值偏高"
+    assert result['outputs']['technical'] == "RSI 65，接近超买"
+    assert result['duplicate_lines'] == 1
+
+
+def test_short_lines_are_not_deduplicated():
+    result = compact_outputs({'fundamental': "结论\n估值偏高", 'technical': "结论\n趋势向上"})
+
+    assert result['outputs']['technical'] == "结论\n趋势向上"
+    assert result['duplicate_lines'] == 0
+
+
+def test_known_facts_are_removed_from_outputs():
+    result = compact_outputs(
+        {'technical': "RSI(14): 65.2\n均线多头排列"},
+        known_facts=["RSI(14): 65.2"]
+    )
+
+    assert result['outputs']['technical'] == "均线多头排列"
+
+
+def test_dedup_is_scoped_per_ticker():
+    line = "营收同比增长 12.5%，利润率稳定"
+    result = compact_outputs({'fundamental:AAPL': line, 'fundamental:MSFT': line})
+
+    assert result['outputs'] == {'fundamental:AAPL': line, 'fundamental:MSFT': line}
+    assert result['duplicate_lines'] == 0
+
+
+# ========== 按预算截断 ==========
+
+def test_outputs_are_truncated_to_budget():
+    output = "\n".join(f"第{i}条：营收增长，利润率提升，现金流稳定" for i in range(100))
+    result = compact_outputs({'fundamental': output, 'technical': "RSI 65"}, agent_budget=50)
+
+    assert result['truncated'] == ['fundamental']
+    assert result['outputs']['fundamental'].endswith("\n…")
+    assert estimate_tokens(result['outputs']['fundamental']) <= 50 + 2
+    assert result['outputs']['technical'] == "RSI 65"
+    assert result['tokens_saved'] == result['tokens_before'] - result['tokens_after'] > 0
+
+
+def test_estimate_tokens_by_character_class():
+    assert estimate_tokens("") == 0
+    assert estimate_tokens("估值偏高") == 3          # 4 个汉字 × 0.7 向上取整
+    assert estimate_tokens("revenue") == 2           # 7 个字符 / 4 向上取整
+    assert estimate_tokens("PE: 28") == 3            # PE、:、28
+
+
+def test_truncate_to_tokens_keeps_whole_lines():
+    text = "第一行内容\n第二行内容\n第三行内容"
+
+    assert truncate_to_tokens(text, 100) == text
+    # 每行 4 个 token + 换行 1 个
+    assert truncate_to_tokens(text, 10) == "第一行内容\n第二行内容"
+
+
+def test_truncate_to_tokens_cuts_a_single_long_line():
+    text = "增长" * 100
+
+    truncated = truncate_to_tokens(text, 10)
+    assert text.startswith(truncated)
+    assert 0 < estimate_tokens(truncated) <= 10
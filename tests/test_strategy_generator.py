@@ -0,0 +1,25 @@
+# -*- coding: utf-8 -*-
+"""trading/strategy_generator.py 批量生成的测试"""
+
+import pytest
+
+pytest.importorskip("pandas")
+pytest.importorskip("numpy")
+
+from trading.strategy_generator import StrategyGenerator
+
+PRICES = {'AAPL': 190.0, 'MSFT': 410.0}
+
+
+def test_duplicate_tickers_keep_their_own_ratings():
+    frame = StrategyGenerator().generate_strategies(
+        ["AAPL", "aapl", "MSFT"], ["Buy", "Sell", "Sell"], prices=PRICES
+    )
+
+    actions = dict(zip(frame['ticker'], frame['action']))
+    assert actions == {'AAPL': "BUY", 'MSFT': "SELL"}
+
+
+def test_rating_list_must_match_tickers():
+    with pytest.raises(ValueError):
+        StrategyGenerator().generate_strategies(["AAPL", "MSFT"], ["Buy"], prices=PRICES)
@@ -0,0 +1,177 @@
+# -*- coding: utf-8 -*-
+"""
+多股票横向对比引擎
+
+对每个指标在两个范围内向量化计算标准分（z-score）和百分位：
+    - 组内：本次对比的股票之间
+    - 行业：同一行业（sector）的同行，同行数据来自本地同行索引，不请求上游
+
+"越低越好"的指标（PE、PB、负债权益比）先取负号，所有分数都是越高越好。
+综合分是各指标标准分的平均（截断到 ±3，避免个别极端值主导）。
+"""
+
+from __future__ import annotations
+
+from typing import Dict, List, Optional
+
+from utils.lazy_import import lazy_module
+
+pd = lazy_module("pandas")
+np = lazy_module("numpy")
+
+# 指标 → (.info 字段, 显示名, 越高越好, 百分比显示)
+METRICS = {
+    'pe': ('trailingPE', 'PE', False, False),
+    'forward_pe': ('forwardPE', '远期PE', False, False),
+    'pb': ('priceToBook', 'PB', False, False),
+    'roe': ('returnOnEquity', 'ROE', True, True),
+    'profit_margin': ('profitMargins', '利润率', True, True),
+    'revenue_growth': ('revenueGrowth', '营收增长', True, True),
+    'debt_to_equity': ('debtToEquity', '负债权益比', False, False)
+}
+METRIC_FIELDS = list(METRICS)
+Z_CLIP = 3.0
+
+
+def _number(value) -> float:
+    return float(value) if isinstance(value, (int, float)) and not isinstance(value, bool) else np.nan
+
+
+def metrics_from_infos(infos: Dict[str, Dict]) -> pd.DataFrame:
+    """{ticker: .info} → 以 ticker 为索引的指标表（含 name / sector / price / market_cap）"""
+    rows = {}
+    for ticker, info in infos.items():
+        if not info:
+            continue
+        row = {field: _number(info.get(key)) for field, (key, _, _, _) in METRICS.items()}
+        row.update(
+            name=info.get('shortName') or info.get('longName') or ticker,
+            sector=info.get('sector'),
+            price=_number(info.get('currentPrice') or info.get('regularMarketPrice')),
+            market_cap=_number(info.get('marketCap'))
+        )
+        rows[ticker.upper()] = row
+    return pd.DataFrame.from_dict(rows, orient='index')
+
+
+def _signed(frame: pd.DataFrame) -> pd.DataFrame:
+    """按"越高越好"统一方向"""
+    signs = np.array([1.0 if METRICS[f][2] else -1.0 for f in METRIC_FIELDS])
+    return frame[METRIC_FIELDS].astype('float64') * signs
+
+
+def zscores(frame: pd.DataFrame) -> pd.DataFrame:
+    """各指标在 frame 内的标准分（方向已统一，截断到 ±Z_CLIP）"""
+    signed = _signed(frame)
+    std = signed.std(ddof=0).replace(0, np.nan)
+    return ((signed - signed.mean()) / std).clip(-Z_CLIP, Z_CLIP)
+
+
+def percentiles(frame: pd.DataFrame) -> pd.DataFrame:
+    """各指标在 frame 内的百分位（0~100，越高越好）"""
+    return _signed(frame).rank(pct=True) * 100
+
+
+def compare(targets: pd.DataFrame, peers: Optional[pd.DataFrame] = None) -> pd.DataFrame:
+    """
+    计算对比结果
+
+    Args:
+        targets: 要对比的股票指标表（metrics_from_infos 的结果）
+        peers: 同行指标表（与 targets 同列，可为空）
+
+    Returns:
+        按综合分降序的表：原指标列 + 组内百分位 <指标>_pct + 'score'（综合标准分）
+        + 'score_pct'（组内综合百分位）+ 'sector_pct'（行业内综合百分位，没有同行时为 NaN）
+    """
+    z = zscores(targets)
+    result = targets.copy()
+    result['score'] = z.mean(axis=1)
+    group_pct = percentiles(targets)
+    for field in METRIC_FIELDS:
+        result[f'{field}_pct'] = group_pct[field]
+    result['score_pct'] = result['score'].rank(pct=True) * 100
+
+    result['sector_pct'] = np.nan
+    if peers is not None and not peers.empty:
+        peers = peers.drop(index=targets.index, errors='ignore')
+        population = pd.concat([targets, peers[targets.columns.intersection(peers.columns)]])
+        population = population[population['sector'].isin(targets['sector'].dropna())]
+        if len(population) > len(targets):
+            # 综合分在各行业内分别标准化后再取组内百分位
+            sectors = population['sector']
+            signed = _signed(population)
+            grouped = signed.groupby(sectors)
+            std = grouped.transform('std', ddof=0).replace(0, np.nan)
+            sector_z = ((signed - grouped.transform('mean')) / std).clip(-Z_CLIP, Z_CLIP)
+            sector_score = sector_z.mean(axis=1)
+            sector_rank = sector_score.groupby(sectors).rank(pct=True) * 100
+            result['sector_pct'] = sector_rank.reindex(targets.index)
+
+    return result.sort_values('score', ascending=False)
+
+
+def _format_metric(field: str, value) -> str:
+    if value is None or value != value:
+        return "N/A"
+    if METRICS[field][3]:
+        return f"{value * 100:.1f}%"
+    return f"{value:.1f}"
+
+
+def format_comparison(
+    result: pd.DataFrame,
+    fields: Optional[List[str]] = None,
+    head: int = 8,
+    tail: int = 4
+) -> str:
+    """
+    紧凑的排名表
+
+    股票很多时只列出前 head 名和后 tail 名，中间汇总为一行，输出长度不随股票数线性增长。
+    每个单元格为 "值(组内百分位)"。
+    """
+    fields = fields or ['pe', 'roe', 'profit_margin', 'revenue_growth', 'debt_to_equity']
+    has_sector = result['sector_pct'].notna().any()
+
+    header = "| # | 股票 | 综合 | " + " | ".join(METRICS[f][1] for f in fields)
+    header += " | 行业分位 |" if has_sector else " |"
+    lines = [header, "|" + "---|" * (header.count("|") - 1)]
+
+    def row_line(rank: int, ticker: str, row) -> str:
+        cells = [f"{_format_metric(f, row[f])}({row[f'{f}_pct']:.0f})" if row[f] == row[f] else "N/A"
+                 for f in fields]
+        line = f"| {rank} | {ticker} | {row['score']:+.2f} | " + " | ".join(cells)
+        if has_sector:
+            sector = f"{row['sector_pct']:.0f}" if row['sector_pct'] == row['sector_pct'] else "N/A"
+            line += f" | {sector} |"
+        else:
+            line += " |"
+        return line
+
+    rows = list(result.iterrows())
+    if len(rows) <= head + tail:
+        lines.extend(row_line(i, t, r) for i, (t, r) in enumerate(rows, 1))
+    else:
+        lines.extend(row_line(i, t, r) for i, (t, r) in enumerate(rows[:head], 1))
+        middle = result.iloc[head:len(rows) - tail]
+        lines.append(
+            f"| … | 另外{len(middle)}只 | {middle['score'].min():+.2f}~{middle['score'].max():+.2f} |"
+            + " |" * (len(fields) + (1 if has_sector else 0))
+        )
+        start = len(rows) - tail + 1
+        lines.extend(row_line(i, t, r) for i, (t, r) in enumerate(rows[-tail:], start))
+
+    return "\n".join(lines)
+
+
+def metric_leaders(result: pd.DataFrame, fields: Optional[List[str]] = None) -> List[str]:
+    """各指标表现最好的股票"""
+    leaders = []
+    for field in fields or METRIC_FIELDS:
+        values = result[field].dropna()
+        if values.empty:
+            continue
+        ticker = values.idxmax() if METRICS[field][2] else values.idxmin()
+        leaders.append(f"{METRICS[field][1]}: {ticker} ({_format_metric(field, values[ticker])})")
+    return leaders
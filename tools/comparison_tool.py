@@ -1,60 +1,78 @@
-import yfinance as yf
 from langchain.tools import Tool
-from typing import List, Dict
+from typing import Dict, List
+from data.analysis_snapshot import record_fundamentals
+from data.market_data import get_infos
+from data.peer_index import get_peer_index
+from tools.comparison_engine import compare, format_comparison, metric_leaders, metrics_from_infos
+from utils.tracing import span
+
+# 单次最多对比的股票数
+MAX_TICKERS = 50
+# 每个行业最多取的同行数（按市值）
+MAX_PEERS_PER_SECTOR = 50
+
 
 class ComparisonTool:
     """股票对比工具"""
-    
+
+    def _sector_peers(self, sectors: List[str]):
+        """同行索引中同行业的股票（一次本地查询，不请求上游）"""
+        try:
+            return get_peer_index().sector_frame(sectors, limit_per_sector=MAX_PEERS_PER_SECTOR)
+        except Exception as e:
+            print(f"[WARNING] 读取同行数据失败: {e}")
+            return None
+
     def compare_stocks(self, tickers_str: str) -> str:
         """对比多只股票"""
         try:
-            tickers = [t.strip().upper() for t in tickers_str.split(',')]
-            
+            tickers = list(dict.fromkeys(t.strip().upper() for t in tickers_str.split(',') if t.strip()))
+
             if len(tickers) < 2:
                 return "❌ 请至少提供2只股票进行对比"
-            if len(tickers) > 5:
-                return "❌ 最多支持对比5只股票"
-            
-            stocks_data = []
-            for ticker in tickers:
-                try:
-                    stock = yf.Ticker(ticker)
-                    info = stock.info
-                    stocks_data.append({
-                        'ticker': ticker,
-                        'name': info.get('longName', ticker),
-                        'price': info.get('currentPrice', 'N/A'),
-                        'marketCap': info.get('marketCap', 0),
-                        'pe': info.get('trailingPE', 'N/A'),
-                        'roe': info.get('returnOnEquity', 'N/A'),
-                        'debtToEquity': info.get('debtToEquity', 'N/A')
-                    })
-                except Exception:
-                    stocks_data.append({'ticker': ticker, 'error': True})
-            
-            result = "📊 股票对比分析\n"
-            result += "━━━━━━━━━━━━━━━━━━━━━━━━━━━━\n\n"
-            
-            for data in stocks_data:
-                if data.get('error'):
-                    result += f"❌ {data['ticker']}: 无法获取数据\n\n"
-                    continue
-                
-                result += f"📈 {data['name']} ({data['ticker']})\n"
-                result += f"  • 价格: ${data['price']}\n"
-                result += f"  • 市盈率: {data['pe']}\n"
-                result += f"  • ROE: {data['roe']}\n"
-                result += f"  • 负债率: {data['debtToEquity']}\n\n"
-            
-            return result
-            
+            if len(tickers) > MAX_TICKERS:
+                return f"❌ 最多支持对比{MAX_TICKERS}只股票"
+
+            # 并发获取（带缓存），同时写入基本面快照
+            with span("upstream:yfinance.info", tickers=",".join(tickers)):
+                infos: Dict[str, Dict] = get_infos(tickers)
+            for ticker, info in infos.items():
+                record_fundamentals(ticker, info)
+
+            targets = metrics_from_infos(infos)
+            failed = [t for t in tickers if t not in targets.index]
+            if len(targets) < 2:
+                return f"❌ 无法获取足够的数据进行对比（失败: {', '.join(failed)}）"
+
+            peers = self._sector_peers(targets['sector'].dropna().unique().tolist())
+            result = compare(targets, peers)
+            peer_count = 0 if peers is None else len(peers.drop(index=targets.index, errors='ignore'))
+
+            output = f"⚖️ 股票对比分析（{len(targets)}只"
+            output += f"，行业对照 {peer_count} 只同行）\n" if peer_count else "）\n"
+            output += "━━━━━━━━━━━━━━━━━━━━━━━━━━━━\n"
+            output += "综合 = 各指标标准分均值（越高越好）；括号内为组内百分位"
+            output += "；行业分位为同行业内的综合百分位\n\n" if peer_count else "\n\n"
+            output += format_comparison(result) + "\n\n"
+
+            leaders = metric_leaders(result)
+            if leaders:
+                output += "🏆 各指标最佳: " + "；".join(leaders) + "\n"
+            if failed:
+                output += f"⚠️ 无法获取数据: {', '.join(failed)}\n"
+
+            return output
+
         except Exception as e:
             return f"❌ 对比分析时出错: {str(e)}"
-    
+
     def as_tool(self) -> Tool:
         """转换为 LangChain Tool"""
         return Tool(
             name="compare_stocks",
-            description="对比多只股票的关键指标。输入格式: 'AAPL,MSFT,GOOGL' (用逗号分隔，2-5只股票)。",
+            description=(
+                f"对比多只股票的关键指标，给出组内和行业内的排名。"
+                f"输入格式: 'AAPL,MSFT,GOOGL' (用逗号分隔，2-{MAX_TICKERS}只股票)。"
+            ),
             func=self.compare_stocks
         )
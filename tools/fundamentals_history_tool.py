@@ -0,0 +1,127 @@
+from langchain.tools import Tool
+from typing import List, Optional, Tuple
+from data.fundamentals_store import METRICS, get_fundamentals_store
+from tools.stock_data_tool import StockDataTool
+
+# 指标显示名称（比例类指标以百分比显示）
+METRIC_LABELS = {
+    'pe': '市盈率(P/E)',
+    'forward_pe': '远期市盈率',
+    'pb': '市净率(P/B)',
+    'ps': '市销率(P/S)',
+    'roe': 'ROE',
+    'profit_margin': '利润率',
+    'operating_margin': '营业利润率',
+    'gross_margin': '毛利率',
+    'revenue_growth': '营收增长',
+    'debt_to_equity': '负债权益比',
+    'current_ratio': '流动比率',
+    'dividend_yield': '股息率',
+    'price': '价格',
+    'market_cap': '市值'
+}
+PERCENT_METRICS = {'roe', 'profit_margin', 'operating_margin', 'gross_margin', 'revenue_growth', 'dividend_yield'}
+# 估值类指标：分位越高越贵
+VALUATION_METRICS = {'pe', 'forward_pe', 'pb', 'ps'}
+DEFAULT_METRICS = ['pe', 'forward_pe', 'pb', 'roe', 'profit_margin', 'debt_to_equity', 'current_ratio', 'dividend_yield']
+
+# 自然语言别名 → 指标
+METRIC_ALIASES = {
+    '市盈率': 'pe', 'pe': 'pe', 'p/e': 'pe', '远期市盈率': 'forward_pe', 'forward_pe': 'forward_pe',
+    '市净率': 'pb', 'pb': 'pb', 'p/b': 'pb', '市销率': 'ps', 'ps': 'ps',
+    'roe': 'roe', '净资产收益率': 'roe', '利润率': 'profit_margin', '净利率': 'profit_margin',
+    '毛利率': 'gross_margin', '营业利润率': 'operating_margin', '营收增长': 'revenue_growth',
+    '负债': 'debt_to_equity', '负债权益比': 'debt_to_equity', 'd/e': 'debt_to_equity',
+    '流动比率': 'current_ratio', '股息': 'dividend_yield', '股息率': 'dividend_yield'
+}
+
+
+class FundamentalsHistoryTool:
+    """查询本地基本面历史快照的工具（不请求上游）"""
+
+    def _parse_input(self, query: str) -> Tuple[str, List[str]]:
+        """解析 'AAPL' / 'AAPL,pe' / 'AAPL 市盈率' 形式的输入"""
+        parts = [p for p in query.replace('，', ',').replace(',', ' ').split() if p]
+        if not parts:
+            return '', []
+        ticker = parts[0].strip().upper()
+        metrics = []
+        for part in parts[1:]:
+            metric = METRIC_ALIASES.get(part.lower()) or (part.lower() if part.lower() in METRICS else None)
+            if metric and metric not in metrics:
+                metrics.append(metric)
+        return ticker, metrics or DEFAULT_METRICS
+
+    def _format_value(self, metric: str, value: Optional[float]) -> str:
+        if value is None or value != value:
+            return "N/A"
+        if metric in PERCENT_METRICS:
+            return f"{value * 100:.2f}%"
+        if metric == 'market_cap':
+            return f"{value / 1e9:.1f}B"
+        return f"{value:.2f}"
+
+    def get_history(self, query: str) -> str:
+        """基本面指标的历史变化"""
+        try:
+            ticker, metrics = self._parse_input(query)
+            if not ticker:
+                return "❌ 请提供股票代码，例如 'AAPL' 或 'AAPL,pe'"
+
+            store = get_fundamentals_store()
+            history = store.history(ticker, metrics)
+            if history.empty:
+                # 还没有快照：取一次当前数据（会自动记录），之后的调用都在本地回答
+                StockDataTool()._get_cached_or_fetch(ticker)
+                history = store.history(ticker, metrics)
+            if history.empty:
+                return f"❌ 没有 {ticker} 的基本面快照"
+
+            first_date, last_date = history.index[0], history.index[-1]
+            result = f"📚 {ticker} 基本面历史（{len(history)} 个快照，{first_date} ~ {last_date}）\n"
+            result += "━━━━━━━━━━━━━━━━━━━━━━━━━━━━\n\n"
+
+            signals = []
+            for metric in metrics:
+                series = history[metric].dropna()
+                if series.empty:
+                    continue
+
+                label = METRIC_LABELS.get(metric, metric)
+                latest = series.iloc[-1]
+                result += f"• {label}: {self._format_value(metric, latest)}"
+                if len(series) > 1:
+                    first = series.iloc[0]
+                    change = f"{(latest / first - 1) * 100:+.1f}%" if first else "N/A"
+                    percentile = store.percentile(ticker, metric)
+                    result += (
+                        f"（{series.index[0]} 为 {self._format_value(metric, first)}，变化 {change}；"
+                        f"区间 {self._format_value(metric, series.min())} ~ {self._format_value(metric, series.max())}；"
+                        f"当前处于 {percentile:.0f}% 分位）"
+                    )
+                    if metric in VALUATION_METRICS and percentile >= 80:
+                        signals.append(f"⚠️ {label}处于自身历史高位（{percentile:.0f}%分位），估值偏贵")
+                    elif metric in VALUATION_METRICS and percentile <= 20:
+                        signals.append(f"✅ {label}处于自身历史低位（{percentile:.0f}%分位），估值相对便宜")
+                result += "\n"
+
+            if len(history) < 2:
+                result += "\n💡 目前只有一个快照，历史会随每次查询自动积累\n"
+            if signals:
+                result += "\n📊 估值分位信号\n" + "\n".join(f"  {s}" for s in signals) + "\n"
+
+            return result
+
+        except Exception as e:
+            return f"❌ 查询基本面历史时出错: {str(e)}"
+
+    def as_tool(self) -> Tool:
+        """转换为 LangChain Tool"""
+        return Tool(
+            name="fundamentals_history",
+            description=(
+                "查询股票基本面指标（市盈率、市净率、ROE、利润率、负债权益比、流动比率、股息率等）的历史变化"
+                "和当前值在自身历史中的分位。输入为股票代码，可附加指标，例如 'AAPL' 或 'AAPL,pe'。"
+            ),
+            func=self.get_history
+        )
@@ -0,0 +1,217 @@
+# -*- coding: utf-8 -*-
+"""
+多来源新闻抓取
+
+- 多个 RSS 来源并发抓取，总耗时取决于最慢的来源（有超时上限）
+- 所有请求共用一个带连接池的 requests.Session
+- 使用 ETag / Last-Modified 条件请求，内容没变时服务器返回 304，直接复用上次解析结果
+- 使用 lxml 解析 XML
+"""
+
+import contextvars
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait
+from datetime import timezone
+from email.utils import parsedate_to_datetime
+from typing import Dict, List, Optional
+
+from utils.lazy_import import lazy_module
+from utils.tracing import annotate, span
+
+requests = lazy_module("requests")
+etree = lazy_module("lxml.etree")
+
+USER_AGENT = 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'
+
+# 新闻来源：名称 → URL 模板
+NEWS_SOURCES = {
+    'Yahoo Finance': "https://feeds.finance.yahoo.com/rss/2.0/headline?s={ticker}&region=US&lang=en-US",
+    'Google News': "https://news.google.com/rss/search?q={ticker}+stock&hl=en-US&gl=US&ceid=US:en",
+    'Nasdaq': "https://www.nasdaq.com/feed/rssoutbound?symbol={ticker}"
+}
+
+
+class NewsFetcher:
+    """并发抓取多个新闻来源"""
+
+    def __init__(
+        self,
+        sources: Optional[Dict[str, str]] = None,
+        timeout: float = 5.0,
+        max_workers: int = 8
+    ):
+        """
+        Args:
+            sources: {来源名称: URL模板}，模板中的 {ticker} 会被替换
+            timeout: 单次抓取的总超时（秒），超时的来源本次结果为空
+            max_workers: 并发抓取的线程数
+        """
+        self.sources = sources or NEWS_SOURCES
+        self.timeout = timeout
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="news")
+        self._session = None
+        self._session_lock = threading.Lock()
+        # 条件请求的校验信息：{url: {'etag', 'last_modified', 'items'}}
+        self._validators: Dict[str, Dict] = {}
+        self._validators_lock = threading.Lock()
+
+    @property
+    def session(self):
+        """共用的连接池 Session（第一次使用时创建）"""
+        if self._session is None:
+            with self._session_lock:
+                if self._session is None:
+                    session = requests.Session()
+                    adapter = requests.adapters.HTTPAdapter(pool_connections=16, pool_maxsize=16)
+                    session.mount("https://", adapter)
+                    session.mount("http://", adapter)
+                    session.headers['User-Agent'] = USER_AGENT
+                    self._session = session
+        return self._session
+
+    def fetch(self, ticker: str, max_items: int = 20) -> List[Dict]:
+        """
+        并发抓取所有来源
+
+        Returns:
+            [{'title', 'source', 'link', 'published', 'summary'}]，按发布时间倒序
+        """
+        ticker = ticker.upper()
+
+        # 每个任务复制一份上下文，让各来源的追踪 Span 挂在当前请求下
+        futures = {
+            self._executor.submit(
+                contextvars.copy_context().run, self._fetch_source, name, template.format(ticker=ticker)
+            ): name
+            for name, template in self.sources.items()
+        }
+        done, not_done = wait(futures, timeout=self.timeout)
+
+        items = []
+        for future in done:
+            try:
+                # 复制一份，避免调用方修改 304 复用的缓存条目
+                items.extend(dict(item) for item in future.result())
+            except Exception as e:
+                print(f"[WARNING] 新闻来源 {futures[future]} 抓取失败: {e}")
+
+        if not_done:
+            annotate(timed_out=",".join(futures[f] for f in not_done))
+
+        # 同一链接/标题只保留一条
+        seen = set()
+        unique = []
+        for item in sorted(items, key=lambda x: x['published'] or '', reverse=True):
+            key = item['link'] or item['title']
+            if key in seen:
+                continue
+            seen.add(key)
+            unique.append(item)
+
+        return unique[:max_items]
+
+    def _fetch_source(self, name: str, url: str) -> List[Dict]:
+        """抓取单个来源（带条件请求）"""
+        with self._validators_lock:
+            cached = self._validators.get(url)
+
+        headers = {}
+        if cached:
+            if cached.get('etag'):
+                headers['If-None-Match'] = cached['etag']
+            if cached.get('last_modified'):
+                headers['If-Modified-Since'] = cached['last_modified']
+
+        with span(f"upstream:news:{name}") as source_span:
+            response = self.session.get(url, headers=headers, timeout=self.timeout)
+            source_span.set_attributes(status=response.status_code)
+
+            # 内容没有变化，复用上次的解析结果
+            if response.status_code == 304 and cached:
+                source_span.set_attributes(revalidated=True)
+                return cached['items']
+
+            if response.status_code != 200:
+                return []
+
+            items = self._parse_rss(response.content, name)
+            source_span.set_attributes(items=len(items))
+
+        with self._validators_lock:
+            self._validators[url] = {
+                'etag': response.headers.get('ETag'),
+                'last_modified': response.headers.get('Last-Modified'),
+                'items': items,
+                'fetched_at': time.time()
+            }
+        return items
+
+    @staticmethod
+    def _parse_rss(content: bytes, source_name: str) -> List[Dict]:
+        """解析 RSS 2.0"""
+        parser = etree.XMLParser(recover=True, resolve_entities=False, no_network=True)
+        root = etree.fromstring(content, parser=parser)
+        if root is None:
+            return []
+
+        items = []
+        for node in root.iter('item'):
+            title = (node.findtext('title') or '').strip()
+            if not title:
+                continue
+
+            # Google News 的 <source> 是实际发布媒体，标题末尾也会带上 " - 媒体名"
+            source = (node.findtext('source') or '').strip() or source_name
+            suffix = f" - {source}"
+            if title.endswith(suffix):
+                title = title[:-len(suffix)]
+
+            items.append({
+                'title': title,
+                'source': source,
+                'link': (node.findtext('link') or '').strip(),
+                'published': _parse_date(node.findtext('pubDate')),
+                'summary': _strip_html(node.findtext('description') or '')
+            })
+
+        return items
+
+    def shutdown(self) -> None:
+        self._executor.shutdown(wait=False)
+        if self._session is not None:
+            self._session.close()
+
+
+def _parse_date(value: Optional[str]) -> Optional[str]:
+    """RFC 822 日期 → ISO 格式（UTC）"""
+    if not value:
+        return None
+    try:
+        return parsedate_to_datetime(value.strip()).astimezone(timezone.utc).isoformat()
+    except (TypeError, ValueError):
+        return None
+
+
+def _strip_html(text: str) -> str:
+    """description 中可能带 HTML，只保留文本"""
+    if '<' not in text:
+        return text.strip()
+    try:
+        return etree.fromstring(f"<div>{text}</div>", etree.HTMLParser()).xpath("string()").strip()
+    except Exception:
+        return text.strip()
+
+
+_fetcher: Optional[NewsFetcher] = None
+_fetcher_lock = threading.Lock()
+
+
+def get_news_fetcher() -> NewsFetcher:
+    """进程内共享的抓取器（各 Agent 和缓存预热器共用连接池和条件请求的校验信息）"""
+    global _fetcher
+    if _fetcher is None:
+        with _fetcher_lock:
+            if _fetcher is None:
+                _fetcher = NewsFetcher()
+    return _fetcher
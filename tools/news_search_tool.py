@@ -1,77 +1,88 @@
-import requests
-from bs4 import BeautifulSoup
 from langchain.tools import Tool
-from typing import List, Dict
+from typing import Dict, List, Optional
+import threading
 import time
+from data.analysis_snapshot import record_sentiment
+from data.cache_warmer import interactive_fetch
+from tools.news_dedup import NewsDeduplicator
+from tools.news_fetcher import get_news_fetcher
+from utils.sentiment_engine import get_sentiment_engine
+from utils.tracing import annotate, span
 
 class NewsSearchTool:
     """搜索股票相关新闻的工具"""
     
+    # 所有实例共用一份缓存（各 Agent 和缓存预热器创建的实例）
+    _cache: Dict[str, tuple] = {}
+    _cache_ttl = 600  # 10分钟缓存（新闻更新较慢）
+    # 每只股票一个近似去重索引，和缓存一样所有实例共用，缓存刷新之间保留
+    _dedup: Dict[str, NewsDeduplicator] = {}
+    _dedup_lock = threading.Lock()
+    
     def __init__(self):
-        self._cache = {}
-        self._cache_ttl = 600  # 10分钟缓存（新闻更新较慢）
+        self._max_items = 8
+        self._fetcher = get_news_fetcher()
+    
+    @classmethod
+    def _deduplicator(cls, ticker: str) -> NewsDeduplicator:
+        """某只股票共用的去重索引"""
+        with cls._dedup_lock:
+            dedup = cls._dedup.get(ticker.upper())
+            if dedup is None:
+                dedup = cls._dedup[ticker.upper()] = NewsDeduplicator()
+            return dedup
     
     def _get_cached_or_fetch(self, ticker: str) -> List[Dict]:
         """缓存机制"""
-        current_time = time.time()
-        cache_key = ticker.upper()
-        
-        if cache_key in self._cache:
-            data, timestamp = self._cache[cache_key]
-            if current_time - timestamp < self._cache_ttl:
-                return data
+        age = self.cache_age(ticker)
+        if age is not None and age < self._cache_ttl:
+            annotate(cache="hit")
+            return self._cache[ticker.upper()][0]
         
-        # 获取新数据
-        news_list = self._fetch_news(ticker)
-        self._cache[cache_key] = (news_list, current_time)
+        annotate(cache="miss")
+        with interactive_fetch():
+            return self.refresh(ticker)
+    
+    def cache_age(self, ticker: str) -> Optional[float]:
+        """缓存条目已存在的秒数，没有缓存时返回 None"""
+        entry = self._cache.get(ticker.upper())
+        return None if entry is None else time.time() - entry[1]
+    
+    def refresh(self, ticker: str) -> List[Dict]:
+        """从上游获取并写入缓存（缓存预热也调用这里）"""
+        with span("upstream:news", ticker=ticker.upper()):
+            news_list = self._fetch_news(ticker)
+        self._cache[ticker.upper()] = (news_list, time.time())
         return news_list
     
     def _analyze_sentiment(self, text: str) -> str:
-        """简单的情感分析"""
-        positive_keywords = ['涨', '增长', '突破', '创新高', '看好', '利好', '上涨', '强劲', '超预期']
-        negative_keywords = ['跌', '下跌', '亏损', '风险', '警告', '下调', '利空', '疲软', '不及预期']
-        
-        positive_count = sum(1 for keyword in positive_keywords if keyword in text)
-        negative_count = sum(1 for keyword in negative_keywords if keyword in text)
-        
-        if positive_count > negative_count:
-            return "积极"
-        elif negative_count > positive_count:
-            return "消极"
-        else:
-            return "中性"
+        """情感分析（共用的情感词典引擎）"""
+        return get_sentiment_engine().score(text)['label']
     
     def _fetch_news(self, ticker: str) -> List[Dict]:
-        """获取新闻"""
+        """获取新闻（多来源并发抓取，缓存过期后用条件请求刷新）"""
         try:
-            url = f"https://www.google.com/finance/quote/{ticker}:NASDAQ"
-            headers = {
-                'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'
-            }
-            response = requests.get(url, headers=headers, timeout=10)
-            
-            if response.status_code != 200:
-                return []
-            
-            soup = BeautifulSoup(response.content, 'html.parser')
-            news_items = []
+            # 多抓一些，去重后再截取
+            raw_items = self._fetcher.fetch(ticker, max_items=self._max_items * 3)
+            dedup = self._deduplicator(ticker)
+            news_items = dedup.collapse(raw_items)[:self._max_items]
+            results = get_sentiment_engine().score_batch(
+                [f"{item['title']} {item.get('summary', '')}" for item in news_items]
+            )
+            for item, sentiment in zip(news_items, results):
+                item['sentiment'] = sentiment['label']
+                item['sentiment_score'] = sentiment['score']
+            return news_items
             
-            # 简化版：返回示例新闻
-            news_items.append({
-                'title': f'{ticker} 最新市场动态',
-                'source': 'Market News',
-                'sentiment': '中性'
-            })
-            
-            return news_items[:5]
-            
-        except Exception:
+        except Exception as e:
+            print(f"[ERROR] 获取 {ticker} 新闻失败: {e}")
             return []
     
     def search_news(self, ticker: str) -> str:
         """搜索新闻"""
         try:
             news_list = self._get_cached_or_fetch(ticker)
+            record_sentiment(ticker, news_list)
             
             if not news_list:
                 return f"📰 暂无 {ticker} 的相关新闻数据"
@@ -90,7 +101,10 @@ class NewsSearchTool:
                 sentiment_icon = {'积极': '📈', '消极': '📉', '中性': '📊'}[sentiment]
                 
                 result += f"{i}. {sentiment_icon} {title}\n"
-                result += f"   来源: {source} | 情绪: {sentiment}\n\n"
+                result += f"   来源: {source} | 情绪: {sentiment}"
+                if news.get('duplicates'):
+                    result += f" | {len(news.get('sources', [])) or 1}家来源共{news['duplicates'] + 1}篇报道"
+                result += "\n\n"
             
             # 情绪统计
             total = len(news_list)
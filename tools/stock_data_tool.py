@@ -1,30 +1,48 @@
-import yfinance as yf
 from langchain.tools import Tool
 from typing import Optional, Dict
 import time
+from data.analysis_snapshot import record_fundamentals
+from data.cache_warmer import interactive_fetch
+from data.fundamentals_store import record_info
+from data.peer_index import get_peer_index, index_infos
+from utils.lazy_import import lazy_module
+from utils.tracing import annotate, span
+
+yf = lazy_module("yfinance")
 
 class StockDataTool:
     """获取股票基本面数据的工具"""
     
-    def __init__(self):
-        self._cache = {}
-        self._cache_ttl = 300  # 5分钟缓存
+    # 所有实例共用一份缓存（各 Agent、API 服务和缓存预热器创建的实例）
+    _cache: Dict[str, tuple] = {}
+    _cache_ttl = 300  # 5分钟缓存
     
     def _get_cached_or_fetch(self, ticker: str) -> Optional[Dict]:
         """缓存机制"""
-        current_time = time.time()
-        cache_key = ticker.upper()
-        
-        if cache_key in self._cache:
-            data, timestamp = self._cache[cache_key]
-            if current_time - timestamp < self._cache_ttl:
-                return data
+        age = self.cache_age(ticker)
+        if age is not None and age < self._cache_ttl:
+            annotate(cache="hit")
+            return self._cache[ticker.upper()][0]
         
-        # 获取新数据
+        annotate(cache="miss")
+        with interactive_fetch():
+            return self.refresh(ticker)
+    
+    def cache_age(self, ticker: str) -> Optional[float]:
+        """缓存条目已存在的秒数，没有缓存时返回 None"""
+        entry = self._cache.get(ticker.upper())
+        return None if entry is None else time.time() - entry[1]
+    
+    def refresh(self, ticker: str) -> Optional[Dict]:
+        """从上游获取并写入缓存（缓存预热也调用这里）"""
+        cache_key = ticker.upper()
         try:
-            stock = yf.Ticker(ticker)
-            info = stock.info
-            self._cache[cache_key] = (info, current_time)
+            with span("upstream:yfinance.info", ticker=cache_key):
+                stock = yf.Ticker(ticker)
+                info = stock.info
+            self._cache[cache_key] = (info, time.time())
+            record_info(cache_key, info)
+            index_infos({cache_key: info})
             return info
         except Exception as e:
             return None
@@ -42,6 +60,42 @@ class StockDataTool:
         else:
             return f"{num:,.2f}"
     
+    def _peer_context(self, ticker: str, info: Dict) -> str:
+        """同行对照（只查本地同行索引，不请求上游）"""
+        try:
+            index = get_peer_index()
+            peers = index.peers(ticker, limit=30)
+            if len(peers['tickers']) < 3:
+                return ""
+            rows = [index.get(t) for t in peers['tickers']]
+        except Exception as e:
+            print(f"[WARNING] 读取同行索引失败: {e}")
+            return ""
+        
+        def median(field: str) -> Optional[float]:
+            values = sorted(row[field] for row in rows if row and row.get(field) is not None)
+            if not values:
+                return None
+            mid = len(values) // 2
+            return values[mid] if len(values) % 2 else (values[mid - 1] + values[mid]) / 2
+        
+        level = "细分行业" if peers['level'] == 'industry' else "行业板块"
+        lines = [f"\n👥 同行对照（{level} {peers['group']}，{len(rows)}只，中位数）"]
+        for field, key, label, percent in (
+            ('pe', 'trailingPE', '市盈率(P/E)', False),
+            ('pb', 'priceToBook', '市净率(P/B)', False),
+            ('roe', 'returnOnEquity', 'ROE', True),
+            ('profit_margin', 'profitMargins', '利润率', True)
+        ):
+            peer_value = median(field)
+            value = info.get(key)
+            if peer_value is None or not isinstance(value, (int, float)):
+                continue
+            fmt = (lambda v: f"{v * 100:.2f}%") if percent else (lambda v: f"{v:.2f}")
+            lines.append(f"  • {label}: {fmt(value)}（同行 {fmt(peer_value)}）")
+        lines.append(f"  • 主要同行: {', '.join(peers['tickers'][:5])}")
+        return "\n".join(lines) + "\n" if len(lines) > 2 else ""
+    
     def get_stock_data(self, ticker: str) -> str:
         """获取股票数据"""
         try:
@@ -50,6 +104,8 @@ class StockDataTool:
             if not info:
                 return f"❌ 股票代码 '{ticker}' 不存在或数据不可用"
             
+            record_fundamentals(ticker, info)
+            
             # 基本信息
             name = info.get('longName', ticker)
             sector = info.get('sector', 'N/A')
@@ -124,6 +180,7 @@ class StockDataTool:
 💎 股息信息
   • 股息率: {dividend_yield}
 """
+            result += self._peer_context(ticker, info)
             
             if analysis:
                 result += "\n🔍 智能分析\n"
@@ -6,7 +6,9 @@ import json
 import os
 from datetime import datetime
 from typing import Dict, List, Optional
-import yfinance as yf
+from utils.lazy_import import lazy_module
+
+yf = lazy_module("yfinance")
 
 
 class PaperTradingTracker:
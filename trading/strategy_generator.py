@@ -2,9 +2,27 @@
 策略生成器 - 将分析结果转化为可执行交易策略
 """
 
-import yfinance as yf
+from __future__ import annotations
+
 from datetime import datetime
-from typing import Dict, Optional
+from typing import Dict, List, Optional, Union
+from data.market_data import get_latest_prices
+from utils.lazy_import import lazy_module
+
+yf = lazy_module("yfinance")
+np = lazy_module("numpy")
+pd = lazy_module("pandas")
+
+# 各风险偏好的基础仓位（%）及信心度高/低时的调整
+BASE_POSITION_PCT = {"low": 3, "medium": 5, "high": 8}
+POSITION_UP = {3: 5, 5: 8, 8: 10}
+POSITION_DOWN = {3: 2, 5: 3, 8: 5}
+
+STRATEGY_COLUMNS = [
+    "ticker", "action", "entry_price", "target_price", "stop_loss", "position_size",
+    "position_pct", "time_horizon", "risk_reward_ratio", "expected_gain_pct",
+    "max_loss_pct", "reason", "confidence"
+]
 
 
 class StrategyGenerator:
@@ -23,7 +41,8 @@ class StrategyGenerator:
         ticker: str,
         rating: str,  # "Buy" / "Hold" / "Sell"
         analysis_result: Dict,
-        risk_tolerance: str = "medium"  # "low" / "medium" / "high"
+        risk_tolerance: str = "medium",  # "low" / "medium" / "high"
+        current_price: Optional[float] = None
     ) -> Optional[Dict]:
         """
         生成交易策略
@@ -31,8 +50,10 @@ class StrategyGenerator:
         Args:
             ticker: 股票代码
             rating: 评级 (Buy/Hold/Sell)
-            analysis_result: Arena Judge的分析结果
+            analysis_result: 结构化分析结果（AnalysisSnapshot.to_analysis() 的格式）
             risk_tolerance: 风险承受度
+            current_price: 当前价格（已知时不再请求 yfinance，
+                           未传时依次尝试 analysis_result['price'] 和 yfinance）
         
         Returns:
             策略字典，包含买卖价位、仓位等
@@ -41,6 +62,17 @@ class StrategyGenerator:
         if rating.upper() == "HOLD":
             return None
         
+        # 只保留结构化的维度（旧调用方可能传入 {agent_type: 文本}）
+        analysis_result = analysis_result or {}
+        current_price = current_price or analysis_result.get('price')
+        analysis_result = {
+            key: value for key, value in analysis_result.items()
+            if isinstance(value, dict)
+        }
+        
+        if current_price:
+            return self._build_strategy(ticker, rating, current_price, analysis_result, risk_tolerance)
+        
         # 获取当前价格
         try:
             stock = yf.Ticker(ticker)
@@ -57,7 +89,17 @@ class StrategyGenerator:
             print(f"获取价格失败: {e}")
             return None
         
-        # 根据评级生成策略
+        return self._build_strategy(ticker, rating, current_price, analysis_result, risk_tolerance)
+    
+    def _build_strategy(
+        self,
+        ticker: str,
+        rating: str,
+        current_price: float,
+        analysis_result: Dict,
+        risk_tolerance: str
+    ) -> Optional[Dict]:
+        """根据评级生成策略"""
         if rating.upper() == "BUY":
             strategy = self._generate_buy_strategy(
                 ticker, current_price, analysis_result, risk_tolerance
@@ -71,6 +113,127 @@ class StrategyGenerator:
         
         return strategy
     
+    def generate_strategies(
+        self,
+        tickers: List[str],
+        ratings: Union[str, Dict[str, str], List[str]],
+        risk_tolerance: str = "medium",
+        analyses: Optional[Dict[str, Dict]] = None,
+        prices: Optional[Dict[str, float]] = None
+    ) -> pd.DataFrame:
+        """
+        批量生成交易策略（用于观察列表的盘前批量运行）
+        
+        价格一次批量下载，入场价、目标价、止损、仓位和风险回报比全部用数组计算，
+        规则与 generate_strategy() 相同。
+        
+        Args:
+            tickers: 股票代码列表
+            ratings: 统一评级，或 {ticker: rating}，或与 tickers 对齐的评级列表
+                     （重复的股票以第一次出现时的评级为准）
+            risk_tolerance: 风险偏好
+            analyses: {ticker: 结构化分析}（AnalysisSnapshot.to_analysis() 的格式，可选）
+            prices: {ticker: 价格}（可选，已知价格的股票不再下载）
+        
+        Returns:
+            每个生成了策略的股票一行（Hold 或取不到价格的股票不包含），
+            列同 generate_strategy() 的返回值，另有 position_pct（数值仓位）
+        """
+        tickers = [t.upper() for t in tickers]
+        if isinstance(ratings, str):
+            pairs = [(t, ratings) for t in tickers]
+        elif isinstance(ratings, dict):
+            upper_ratings = {k.upper(): v for k, v in ratings.items()}
+            pairs = [(t, upper_ratings.get(t, "Hold")) for t in tickers]
+        else:
+            rating_list = list(ratings)
+            if len(rating_list) != len(tickers):
+                raise ValueError(f"评级数量({len(rating_list)})与股票数量({len(tickers)})不一致")
+            pairs = list(zip(tickers, rating_list))
+        
+        # 先配对再去重，同一股票出现多次时以第一次的评级为准
+        paired = {}
+        for ticker, rating in pairs:
+            paired.setdefault(ticker, rating)
+        tickers, rating_list = list(paired), list(paired.values())
+        
+        frame = pd.DataFrame({
+            'ticker': tickers,
+            'action': [str(r).upper() for r in rating_list]
+        })
+        frame = frame[frame['action'].isin(["BUY", "SELL"])]
+        if frame.empty:
+            return pd.DataFrame(columns=STRATEGY_COLUMNS)
+        
+        # 价格：已知的直接用，其余一次批量下载
+        known = {k.upper(): v for k, v in (prices or {}).items() if v}
+        analyses = {k.upper(): v for k, v in (analyses or {}).items()}
+        for ticker in frame['ticker']:
+            price = (analyses.get(ticker) or {}).get('price')
+            if ticker not in known and price:
+                known[ticker] = price
+        missing = [t for t in frame['ticker'] if t not in known]
+        if missing:
+            try:
+                known.update(get_latest_prices(missing).to_dict())
+            except Exception as e:
+                print(f"[ERROR] 批量获取价格失败: {e}")
+        
+        frame['entry_price'] = frame['ticker'].map(known).astype(float)
+        frame = frame.dropna(subset=['entry_price'])
+        if frame.empty:
+            return pd.DataFrame(columns=STRATEGY_COLUMNS)
+        
+        sections = [
+            {k: v for k, v in (analyses.get(t) or {}).items() if isinstance(v, dict)}
+            for t in frame['ticker']
+        ]
+        
+        price = frame['entry_price'].to_numpy()
+        is_buy = (frame['action'] == "BUY").to_numpy()
+        sign = np.where(is_buy, 1.0, -1.0)
+        
+        risk_params = self._get_risk_parameters(risk_tolerance)
+        stop_pct = np.full(len(frame), risk_params['stop_loss'])
+        target_pct = np.full(len(frame), risk_params['profit_target'])
+        
+        # RSI 超卖时买入目标上调 50%
+        rsi = np.array([
+            s.get('technical', {}).get('rsi') or np.nan for s in sections
+        ], dtype=float)
+        target_pct = np.where(is_buy & (rsi < 30), target_pct * 1.5, target_pct)
+        
+        # 信心度：有数据的维度取均值（基本面 0.8、技术面 0.8、情绪 0.7），都没有为 0.5
+        has_f = np.array([bool(s.get('fundamental')) for s in sections])
+        has_t = np.array([bool(s.get('technical')) for s in sections])
+        has_s = np.array([bool(s.get('sentiment')) for s in sections])
+        count = has_f.astype(int) + has_t + has_s
+        weighted = 0.8 * has_f + 0.8 * has_t + 0.7 * has_s
+        confidence = np.where(count > 0, weighted / np.maximum(count, 1), 0.5)
+        
+        base = BASE_POSITION_PCT.get(risk_tolerance.lower(), 5)
+        position_pct = np.where(
+            confidence > 0.8, POSITION_UP[base],
+            np.where(confidence < 0.5, POSITION_DOWN[base], base)
+        )
+        
+        frame['target_price'] = np.round(price * (1 + sign * target_pct), 2)
+        frame['stop_loss'] = np.round(price * (1 - sign * stop_pct), 2)
+        frame['position_pct'] = position_pct
+        frame['position_size'] = [f"{p}%" for p in position_pct]
+        frame['time_horizon'] = np.select(
+            [target_pct < 0.08, target_pct < 0.15], ["1-2周", "1-2个月"], default="2-6个月"
+        )
+        frame['risk_reward_ratio'] = np.round(target_pct / stop_pct, 2)
+        frame['expected_gain_pct'] = np.round(target_pct * 100, 1)
+        frame['max_loss_pct'] = np.round(stop_pct * 100, 1)
+        frame['reason'] = [
+            self._generate_reason(s, action) for s, action in zip(sections, frame['action'])
+        ]
+        frame['confidence'] = confidence
+        
+        return frame[STRATEGY_COLUMNS].reset_index(drop=True)
+    
     def _generate_buy_strategy(
         self, 
         ticker: str, 
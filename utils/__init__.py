@@ -0,0 +1,3 @@
+"""
+Utils模块 - 跨模块的基础设施（追踪等）
+"""
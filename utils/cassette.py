@@ -0,0 +1,545 @@
+# -*- coding: utf-8 -*-
+"""
+录制/回放外部调用（cassette）
+
+在系统边界拦截所有外部调用：
+    - yf.Ticker(...).info / .history(...)
+    - yf.download(...)
+    - requests（新闻抓取等 HTTP 请求，拦截 requests.Session.request）
+    - ChatOpenAI 的模型调用（拦截 _generate 和 _stream；AgentExecutor 默认走流式调用，
+      录制时把流式输出的各个分块合并后保存，回放时作为一个分块返回）
+
+record 模式下照常访问网络，并把响应写入一个 gzip 压缩的 JSON 文件；
+replay 模式下完全离线，从文件读取响应，可以配置模拟延迟和错误注入，
+用于压测和性能分析时以全速或接近真实的速度跑完整个流程。
+
+用法：
+    with Cassette("cassettes/aapl.json.gz", mode="record"):
+        pipeline.analyze("全面分析AAPL")
+
+    with Cassette("cassettes/aapl.json.gz", mode="replay", latency_scale=1.0, error_rate=0.05):
+        pipeline.analyze("全面分析AAPL")
+
+也可以通过环境变量启用（见 cassette_from_env）：
+    BULLBEAR_CASSETTE=cassettes/run.json.gz
+    BULLBEAR_CASSETTE_MODE=replay          # record / replay / auto
+    BULLBEAR_CASSETTE_LATENCY_SCALE=1.0    # 按录制时的耗时等比例延迟，0 为全速
+    BULLBEAR_CASSETTE_LATENCY=0.05         # 每次调用额外固定延迟（秒）
+    BULLBEAR_CASSETTE_ERROR_RATE=0.1       # 注入错误的概率
+"""
+
+import base64
+import gzip
+import hashlib
+import json
+import os
+import random
+import threading
+import time
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+from utils.lazy_import import lazy_module
+
+yf = lazy_module("yfinance")
+pd = lazy_module("pandas")
+requests = lazy_module("requests")
+
+MODES = ('record', 'replay', 'auto')
+
+# 各边界注入的错误
+INJECTED_ERRORS = {
+    'yfinance': "Injected yfinance error: Too Many Requests. Rate limited.",
+    'http': "Injected HTTP error: connection reset by peer",
+    'llm': "Injected LLM error: rate limit exceeded"
+}
+
+
+class CassetteMissError(KeyError):
+    """replay 模式下找不到录制的响应"""
+
+
+class InjectedError(ConnectionError):
+    """错误注入产生的异常"""
+
+
+def _hash(payload: Any) -> str:
+    text = json.dumps(payload, ensure_ascii=False, sort_keys=True, default=str)
+    return hashlib.sha1(text.encode('utf-8')).hexdigest()[:16]
+
+
+# ========== 序列化 ==========
+
+def _dump_frame(df) -> Dict:
+    """DataFrame → JSON 可序列化的字典（支持时区索引和 MultiIndex 列）"""
+    index = df.index
+    tz = str(index.tz) if getattr(index, 'tz', None) is not None else None
+    if isinstance(index, pd.DatetimeIndex):
+        index_values = [ts.isoformat() for ts in index]
+    else:
+        index_values = list(index)
+
+    return {
+        'index': index_values,
+        'datetime_index': isinstance(index, pd.DatetimeIndex),
+        'tz': tz,
+        'index_name': index.name,
+        'columns': [list(c) if isinstance(c, tuple) else c for c in df.columns],
+        'multi_columns': isinstance(df.columns, pd.MultiIndex),
+        'column_names': list(df.columns.names),
+        'data': df.astype(object).where(df.notna(), None).values.tolist()
+    }
+
+
+def _load_frame(payload: Dict):
+    """_dump_frame 的逆操作"""
+    if payload['multi_columns']:
+        columns = pd.MultiIndex.from_tuples(
+            [tuple(c) for c in payload['columns']], names=payload['column_names']
+        )
+    else:
+        columns = payload['columns']
+
+    if payload['datetime_index']:
+        index = pd.DatetimeIndex(pd.to_datetime(payload['index'], utc=payload['tz'] is not None))
+        if payload['tz']:
+            index = index.tz_convert(payload['tz'])
+    else:
+        index = pd.Index(payload['index'])
+    index.name = payload['index_name']
+
+    df = pd.DataFrame(payload['data'], index=index, columns=columns)
+    # JSON 中的 null 会让数值列变成 object，这里还原成数值类型
+    for column in df.columns:
+        try:
+            df[column] = pd.to_numeric(df[column])
+        except (TypeError, ValueError):
+            pass
+    return df
+
+
+def _dump_response(response) -> Dict:
+    content = response.content or b''
+    try:
+        body = {'text': content.decode('utf-8')}
+    except UnicodeDecodeError:
+        body = {'b64': base64.b64encode(content).decode('ascii')}
+
+    return dict(
+        body,
+        status_code=response.status_code,
+        headers=dict(response.headers),
+        url=response.url,
+        encoding=response.encoding
+    )
+
+
+def _load_response(payload: Dict):
+    from requests.models import Response
+    from requests.structures import CaseInsensitiveDict
+
+    response = Response()
+    response.status_code = payload['status_code']
+    response.headers = CaseInsensitiveDict(payload.get('headers', {}))
+    response.url = payload.get('url')
+    response.encoding = payload.get('encoding')
+    if 'b64' in payload:
+        response._content = base64.b64decode(payload['b64'])
+    else:
+        response._content = payload.get('text', '').encode('utf-8')
+    return response
+
+
+def _message_signature(message) -> List:
+    """
+    用于匹配的消息签名
+
+    只取类型、内容和工具调用（名称+参数），忽略每次运行都会变的 message id。
+    """
+    tool_calls = [
+        [call.get('name'), call.get('args')]
+        for call in (getattr(message, 'tool_calls', None) or [])
+    ]
+    return [message.type, str(message.content), tool_calls]
+
+
+# ========== Cassette ==========
+
+class Cassette:
+    """
+    录制/回放外部调用
+
+    Args:
+        path: cassette 文件路径（gzip 压缩的 JSON）
+        mode: 'record' 访问网络并录制；'replay' 只读 cassette；
+              'auto' 命中则回放，未命中则访问网络并录制
+        latency_scale: 回放时按录制耗时的倍数延迟（0 = 全速，1 = 真实速度）
+        latency: 回放时每次调用额外的固定延迟（秒）
+        error_rate: 回放时注入错误的概率（0~1）
+        error_targets: 注入错误的边界，默认全部（'yfinance' / 'http' / 'llm'）
+        seed: 错误注入的随机种子，保证可重复
+    """
+
+    def __init__(
+        self,
+        path: str,
+        mode: str = "replay",
+        latency_scale: float = 0.0,
+        latency: float = 0.0,
+        error_rate: float = 0.0,
+        error_targets: Optional[List[str]] = None,
+        seed: int = 0
+    ):
+        if mode not in MODES:
+            raise ValueError(f"mode 必须是 {MODES} 之一: {mode}")
+
+        self.path = path
+        self.mode = mode
+        self.latency_scale = latency_scale
+        self.latency = latency
+        self.error_rate = error_rate
+        self.error_targets = set(error_targets or INJECTED_ERRORS.keys())
+
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._entries: Dict[str, Dict] = {}
+        self._dirty = False
+        self._patches = []
+        self.stats = {'recorded': 0, 'replayed': 0, 'injected_errors': 0, 'misses': 0}
+
+        self._load()
+
+    # ---------- 文件 ----------
+
+    def _load(self) -> None:
+        if not os.path.exists(self.path):
+            if self.mode == 'replay':
+                raise FileNotFoundError(f"cassette 文件不存在: {self.path}")
+            return
+
+        with gzip.open(self.path, 'rt', encoding='utf-8') as f:
+            self._entries = json.load(f).get('entries', {})
+
+    def save(self) -> None:
+        """写回 cassette 文件（只有录制了新响应时才写）"""
+        with self._lock:
+            if not self._dirty:
+                return
+            payload = {
+                'version': 1,
+                'saved_at': datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+                'entries': self._entries
+            }
+            self._dirty = False
+
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        tmp_path = self.path + ".tmp"
+        with gzip.open(tmp_path, 'wt', encoding='utf-8') as f:
+            json.dump(payload, f, ensure_ascii=False, separators=(',', ':'), default=str)
+        os.replace(tmp_path, self.path)
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    # ---------- 录制/回放核心 ----------
+
+    def _call(self, target: str, key: str, fetch, dump, load, fallback_key: Optional[str] = None):
+        """
+        统一的录制/回放逻辑
+
+        Args:
+            target: 边界名（'yfinance' / 'http' / 'llm'）
+            key: 精确匹配的键
+            fetch: 访问真实服务的函数
+            dump / load: 响应的序列化/反序列化
+            fallback_key: 精确匹配失败时使用的备用键
+        """
+        if self.mode != 'record':
+            entry = self._entries.get(key)
+            if entry is None and fallback_key:
+                entry = self._entries.get(f"fallback:{fallback_key}")
+
+            if entry is not None:
+                self._simulate(target, entry.get('elapsed', 0.0))
+                with self._lock:
+                    self.stats['replayed'] += 1
+                if 'error' in entry:
+                    raise InjectedError(entry['error'])
+                return load(entry['response'])
+
+            if self.mode == 'replay':
+                with self._lock:
+                    self.stats['misses'] += 1
+                raise CassetteMissError(f"cassette 中没有 {target} 响应: {key}")
+
+        # 录制：边界内部的嵌套调用（例如 yfinance 自己发出的 HTTP 请求）不重复录制
+        self._local.depth = getattr(self._local, 'depth', 0) + 1
+        start = time.perf_counter()
+        entry = None
+        try:
+            response = fetch()
+        except Exception as e:
+            entry = {'error': f"{type(e).__name__}: {e}"}
+            raise
+        else:
+            entry = {'response': dump(response)}
+        finally:
+            self._local.depth -= 1
+            # KeyboardInterrupt 等 BaseException 没有可录制的结果
+            if entry is not None:
+                entry['elapsed'] = round(time.perf_counter() - start, 4)
+                entry['target'] = target
+                with self._lock:
+                    self._entries[key] = entry
+                    if fallback_key:
+                        self._entries[f"fallback:{fallback_key}"] = entry
+                    self.stats['recorded'] += 1
+                    self._dirty = True
+
+        return response
+
+    def _simulate(self, target: str, recorded_elapsed: float) -> None:
+        """回放时的模拟延迟和错误注入"""
+        delay = self.latency + recorded_elapsed * self.latency_scale
+        if delay > 0:
+            time.sleep(delay)
+
+        if self.error_rate and target in self.error_targets:
+            with self._lock:
+                inject = self._random.random() < self.error_rate
+                if inject:
+                    self.stats['injected_errors'] += 1
+            if inject:
+                raise InjectedError(INJECTED_ERRORS[target])
+
+    def _nested(self) -> bool:
+        return getattr(self._local, 'depth', 0) > 0
+
+    # ---------- 各边界 ----------
+
+    def ticker_info(self, real_ticker_factory, symbol: str) -> Dict:
+        symbol = symbol.upper()
+        return self._call(
+            'yfinance', f"yf.info:{symbol}",
+            lambda: real_ticker_factory(symbol).info,
+            dict, dict
+        )
+
+    def ticker_history(self, real_ticker_factory, symbol: str, args, kwargs):
+        symbol = symbol.upper()
+        key = f"yf.history:{symbol}:{_hash([args, kwargs])}"
+        return self._call(
+            'yfinance', key,
+            lambda: real_ticker_factory(symbol).history(*args, **kwargs),
+            _dump_frame, _load_frame
+        )
+
+    def download(self, real_download, tickers, args, kwargs):
+        if isinstance(tickers, str):
+            tickers = tickers.replace(',', ' ').split()
+        symbols = sorted(t.upper() for t in tickers)
+        key = f"yf.download:{_hash([symbols, args, kwargs])}"
+        return self._call(
+            'yfinance', key,
+            lambda: real_download(symbols, *args, **kwargs),
+            _dump_frame, _load_frame
+        )
+
+    def http(self, real_request, session, method: str, url: str, kwargs):
+        if self._nested():
+            return real_request(session, method, url, **kwargs)
+
+        key = f"http:{method.upper()}:{url}:{_hash([kwargs.get('params'), kwargs.get('data'), kwargs.get('json')])}"
+        return self._call(
+            'http', key,
+            lambda: real_request(session, method, url, **kwargs),
+            _dump_response, _load_response
+        )
+
+    @staticmethod
+    def _llm_keys(model, messages, stop, kwargs):
+        """LLM 调用的精确匹配键和备用键（_generate 和 _stream 共用，录制的响应可以互相回放）"""
+        signature = [_message_signature(m) for m in messages]
+        tools = [
+            tool.get('function', {}).get('name') if isinstance(tool, dict) else str(tool)
+            for tool in kwargs.get('tools', [])
+        ]
+        key = f"llm:{getattr(model, 'model_name', '')}:{_hash([signature, tools, stop])}"
+        # 工具输出里可能带有时间戳等易变内容，精确匹配失败时按
+        # （系统提示词 + 用户问题 + 第几轮）匹配
+        fallback = f"llm:{_hash([signature[:2], len(signature), tools])}"
+        return key, fallback
+
+    def llm(self, real_generate, model, messages, stop, run_manager, kwargs):
+        from langchain_core.messages import messages_from_dict, message_to_dict
+        from langchain_core.outputs import ChatGeneration, ChatResult
+
+        key, fallback = self._llm_keys(model, messages, stop, kwargs)
+
+        def dump(result):
+            return {
+                'generations': [message_to_dict(g.message) for g in result.generations],
+                'llm_output': result.llm_output
+            }
+
+        def load(payload):
+            generations = [
+                ChatGeneration(message=message)
+                for message in messages_from_dict(payload['generations'])
+            ]
+            return ChatResult(generations=generations, llm_output=payload.get('llm_output'))
+
+        return self._call(
+            'llm', key,
+            lambda: real_generate(model, messages, stop=stop, run_manager=run_manager, **kwargs),
+            dump, load, fallback_key=fallback
+        )
+
+    def llm_stream(self, real_stream, model, messages, stop, run_manager, kwargs):
+        """
+        流式调用：录制时把所有分块合并成一条消息保存（格式与 llm() 相同），
+        回放时作为一个分块返回
+        """
+        from langchain_core.messages import AIMessageChunk, messages_from_dict, message_to_dict
+        from langchain_core.outputs import ChatGenerationChunk
+
+        key, fallback = self._llm_keys(model, messages, stop, kwargs)
+
+        def fetch():
+            merged = None
+            for chunk in real_stream(model, messages, stop=stop, run_manager=run_manager, **kwargs):
+                merged = chunk if merged is None else merged + chunk
+            return merged
+
+        def dump(merged):
+            generations = [message_to_dict(merged.message)] if merged is not None else []
+            return {'generations': generations, 'llm_output': None}
+
+        def load(payload):
+            loaded = messages_from_dict(payload['generations'])
+            if not loaded:
+                return None
+            message = loaded[0]
+            if not isinstance(message, AIMessageChunk):
+                # 非流式调用录制的 AIMessage 转成分块
+                tool_call_chunks = [
+                    {'name': call['name'], 'args': json.dumps(call['args'], ensure_ascii=False),
+                     'id': call.get('id'), 'index': i}
+                    for i, call in enumerate(getattr(message, 'tool_calls', None) or [])
+                ]
+                message = AIMessageChunk(
+                    content=message.content,
+                    additional_kwargs=message.additional_kwargs,
+                    tool_call_chunks=tool_call_chunks
+                )
+            return ChatGenerationChunk(message=message)
+
+        replayed = self.mode != 'record' and (key in self._entries or f"fallback:{fallback}" in self._entries)
+        chunk = self._call('llm', key, fetch, dump, load, fallback_key=fallback)
+        if chunk is None:
+            return
+        if replayed and run_manager:
+            # 真实的流式调用会逐块触发回调，回放时补一次
+            run_manager.on_llm_new_token(chunk.text, chunk=chunk)
+        yield chunk
+
+    # ---------- 安装/卸载 ----------
+
+    def _patch(self, owner, name: str, replacement) -> None:
+        self._patches.append((owner, name, getattr(owner, name)))
+        setattr(owner, name, replacement)
+
+    def install(self) -> "Cassette":
+        """替换各边界的实现"""
+        from langchain_openai import ChatOpenAI
+
+        cassette = self
+        real_ticker = yf.Ticker
+        real_download = yf.download
+        real_request = requests.Session.request
+        real_generate = ChatOpenAI._generate
+        real_stream = ChatOpenAI._stream
+
+        class CassetteTicker:
+            """替代 yf.Ticker，拦截 info / history，其余属性直接访问真实对象"""
+
+            def __init__(self, ticker: str, *args, **kwargs):
+                self.ticker = ticker
+                self._args = args
+                self._kwargs = kwargs
+
+            def _real(self, symbol: str):
+                return real_ticker(symbol, *self._args, **self._kwargs)
+
+            @property
+            def info(self) -> Dict:
+                return cassette.ticker_info(self._real, self.ticker)
+
+            def history(self, *args, **kwargs):
+                return cassette.ticker_history(self._real, self.ticker, args, kwargs)
+
+            def __getattr__(self, attr: str):
+                if cassette.mode == 'replay':
+                    raise CassetteMissError(f"cassette 不支持 yf.Ticker.{attr}")
+                return getattr(self._real(self.ticker), attr)
+
+        def download(tickers, *args, **kwargs):
+            return cassette.download(real_download, tickers, args, kwargs)
+
+        def request(session, method, url, **kwargs):
+            return cassette.http(real_request, session, method, url, kwargs)
+
+        def generate(model, messages, stop=None, run_manager=None, **kwargs):
+            return cassette.llm(real_generate, model, messages, stop, run_manager, kwargs)
+
+        def stream(model, messages, stop=None, run_manager=None, **kwargs):
+            return cassette.llm_stream(real_stream, model, messages, stop, run_manager, kwargs)
+
+        self._patch(yf._load(), 'Ticker', CassetteTicker)
+        self._patch(yf._load(), 'download', download)
+        self._patch(requests.Session, 'request', request)
+        self._patch(ChatOpenAI, '_generate', generate)
+        self._patch(ChatOpenAI, '_stream', stream)
+        return self
+
+    def uninstall(self) -> None:
+        """恢复原始实现并保存录制结果"""
+        while self._patches:
+            owner, name, original = self._patches.pop()
+            setattr(owner, name, original)
+        self.save()
+
+    def __enter__(self) -> "Cassette":
+        return self.install()
+
+    def __exit__(self, *exc) -> None:
+        self.uninstall()
+
+    def format_stats(self) -> str:
+        return (
+            f"📼 cassette {self.mode}: 录制 {self.stats['recorded']} | 回放 {self.stats['replayed']} | "
+            f"未命中 {self.stats['misses']} | 注入错误 {self.stats['injected_errors']}"
+        )
+
+
+def cassette_from_env() -> Optional[Cassette]:
+    """
+    根据环境变量创建 cassette（未设置 BULLBEAR_CASSETTE 时返回 None）
+
+    调用方负责 install() / uninstall()。
+    """
+    path = os.getenv("BULLBEAR_CASSETTE")
+    if not path:
+        return None
+
+    return Cassette(
+        path,
+        mode=os.getenv("BULLBEAR_CASSETTE_MODE", "replay"),
+        latency_scale=float(os.getenv("BULLBEAR_CASSETTE_LATENCY_SCALE", "0")),
+        latency=float(os.getenv("BULLBEAR_CASSETTE_LATENCY", "0")),
+        error_rate=float(os.getenv("BULLBEAR_CASSETTE_ERROR_RATE", "0")),
+        seed=int(os.getenv("BULLBEAR_CASSETTE_SEED", "0"))
+    )
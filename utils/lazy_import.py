@@ -0,0 +1,51 @@
+# -*- coding: utf-8 -*-
+"""
+延迟导入
+重量级依赖（yfinance、pandas、plotly、langchain 等）在第一次使用时才导入，
+导入耗时记录到启动耗时报告中。
+
+用法：
+    yf = lazy_module("yfinance")
+    yf.Ticker("AAPL")   # 此时才真正导入 yfinance
+"""
+
+import importlib
+import threading
+import time
+import types
+
+from utils.startup_profile import record
+
+
+class _LazyModule(types.ModuleType):
+    """模块代理：第一次访问属性时导入真实模块"""
+    
+    def __init__(self, name: str):
+        super().__init__(name)
+        self.__dict__['_lazy_lock'] = threading.Lock()
+        self.__dict__['_lazy_module'] = None
+    
+    def _load(self):
+        module = self.__dict__['_lazy_module']
+        if module is not None:
+            return module
+        
+        with self.__dict__['_lazy_lock']:
+            module = self.__dict__['_lazy_module']
+            if module is None:
+                start = time.perf_counter()
+                module = importlib.import_module(self.__name__)
+                record('import', self.__name__, time.perf_counter() - start)
+                self.__dict__['_lazy_module'] = module
+        return module
+    
+    def __getattr__(self, attr: str):
+        return getattr(self._load(), attr)
+    
+    def __dir__(self):
+        return dir(self._load())
+
+
+def lazy_module(name: str) -> types.ModuleType:
+    """返回延迟导入的模块代理"""
+    return _LazyModule(name)
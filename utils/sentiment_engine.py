@@ -0,0 +1,251 @@
+# -*- coding: utf-8 -*-
+"""
+情感词典引擎
+新闻情绪和投资评分共用的一套加权中英文词典。
+
+词典、否定词和程度副词编译成一个 Aho-Corasick 自动机，
+每段文本只需扫描一遍即可找出全部命中（而不是每个关键词各扫一遍）。
+
+规则：
+    - 重叠命中取最左最长（"不及预期" 优先于 "预期"、"下跌" 优先于 "跌"）
+    - 英文词需要完整单词匹配
+    - 否定词翻转紧随其后的情感词，程度副词放大/减弱紧随其后的情感词
+    - 遇到标点（句子/分句边界）后修饰词失效
+"""
+
+import threading
+from collections import deque
+from typing import Dict, List, Optional
+
+# 情感词 → 权重（正数积极，负数消极）
+LEXICON = {
+    # 中文 - 积极
+    '涨': 1.0, '上涨': 1.0, '大涨': 1.5, '增长': 1.0, '突破': 1.0, '创新高': 1.5,
+    '看好': 1.0, '利好': 1.0, '强劲': 1.0, '超预期': 1.5, '优秀': 1.0, '看涨': 1.0,
+    '买入': 1.0, '积极': 1.0, '上调': 1.0, '反弹': 0.8, '稳健': 0.8, '盈利': 0.8,
+    # 中文 - 消极
+    '跌': -1.0, '下跌': -1.0, '大跌': -1.5, '暴跌': -2.0, '亏损': -1.0, '风险': -1.0,
+    '警告': -1.0, '下调': -1.0, '利空': -1.0, '疲软': -1.0, '不及预期': -1.5,
+    '看跌': -1.0, '卖出': -1.0, '担忧': -1.0, '消极': -1.0, '裁员': -1.0, '诉讼': -1.0,
+    '召回': -1.0, '调查': -0.8,
+    # 英文 - 积极
+    'beat': 1.0, 'beats': 1.0, 'surge': 1.5, 'surges': 1.5, 'soar': 1.5, 'soars': 1.5,
+    'rally': 1.0, 'rallies': 1.0, 'gain': 0.8, 'gains': 0.8, 'rise': 0.8, 'rises': 0.8,
+    'upgrade': 1.0, 'upgraded': 1.0, 'record high': 1.5, 'bullish': 1.0, 'outperform': 1.0,
+    'strong': 0.8, 'growth': 0.8, 'buy': 0.8,
+    # 英文 - 消极
+    'miss': -1.0, 'misses': -1.0, 'plunge': -1.5, 'plunges': -1.5, 'slump': -1.5,
+    'fall': -0.8, 'falls': -0.8, 'drop': -0.8, 'drops': -0.8, 'downgrade': -1.0,
+    'downgraded': -1.0, 'bearish': -1.0, 'underperform': -1.0, 'weak': -0.8,
+    'lawsuit': -1.0, 'recall': -1.0, 'probe': -0.8, 'layoffs': -1.0, 'sell': -0.8
+}
+
+# 否定词：翻转后面的情感词
+NEGATORS = [
+    '不', '未', '没有', '并非', '无', '难以',
+    'not', 'no', 'never', 'without', "don't", "doesn't", "didn't", "isn't", "wasn't",
+    "aren't", "won't", "can't", "fails to", 'failed to'
+]
+
+# 含否定字但不表示否定的词（最左最长匹配会优先命中它们，从而屏蔽单字否定词）
+NEUTRAL_PHRASES = ['不断', '不仅', '不少', '不过', '无论', '无疑', '毫无疑问', '未来', '不可否认']
+
+# 程度副词 → 倍数
+INTENSIFIERS = {
+    '非常': 1.5, '大幅': 1.5, '显著': 1.5, '强烈': 1.5, '持续': 1.2,
+    '略': 0.5, '小幅': 0.5, '稍微': 0.5,
+    'very': 1.5, 'sharply': 1.5, 'strongly': 1.5, 'significantly': 1.5,
+    'slightly': 0.5, 'modestly': 0.5
+}
+
+# 修饰词与情感词之间最多相隔的字符数
+MODIFIER_WINDOW = 6
+CLAUSE_BREAKS = set('，。；！？,.;!?\n')
+
+
+class _Automaton:
+    """Aho-Corasick 多模式匹配自动机"""
+
+    def __init__(self, patterns: Dict[str, object]):
+        self._goto: List[Dict[str, int]] = [{}]
+        self._fail: List[int] = [0]
+        self._output: List[List[str]] = [[]]
+        self._payload = dict(patterns)
+
+        for pattern in patterns:
+            self._insert(pattern)
+        self._build()
+
+    def _insert(self, pattern: str) -> None:
+        state = 0
+        for char in pattern:
+            next_state = self._goto[state].get(char)
+            if next_state is None:
+                next_state = len(self._goto)
+                self._goto[state][char] = next_state
+                self._goto.append({})
+                self._fail.append(0)
+                self._output.append([])
+            state = next_state
+        self._output[state].append(pattern)
+
+    def _build(self) -> None:
+        """广度优先计算失败指针（根节点的子节点失败指针为根）"""
+        queue = deque(self._goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for char, next_state in self._goto[state].items():
+                queue.append(next_state)
+                fail = self._fail[state]
+                while fail and char not in self._goto[fail]:
+                    fail = self._fail[fail]
+                self._fail[next_state] = self._goto[fail].get(char, 0)
+                self._output[next_state] = self._output[next_state] + self._output[self._fail[next_state]]
+
+    def search(self, text: str):
+        """生成 (start, end, pattern, payload)"""
+        state = 0
+        goto, fail, output = self._goto, self._fail, self._output
+        for i, char in enumerate(text):
+            while state and char not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(char, 0)
+            for pattern in output[state]:
+                yield i + 1 - len(pattern), i + 1, pattern, self._payload[pattern]
+
+
+def _is_word_char(char: str) -> bool:
+    return char.isascii() and (char.isalnum() or char == "'")
+
+
+class SentimentEngine:
+    """编译好的情感词典"""
+
+    def __init__(
+        self,
+        lexicon: Optional[Dict[str, float]] = None,
+        negators: Optional[List[str]] = None,
+        intensifiers: Optional[Dict[str, float]] = None
+    ):
+        patterns = {}
+        for term in NEUTRAL_PHRASES:
+            patterns[term] = ('neutral', 1.0)
+        for term, multiplier in (intensifiers or INTENSIFIERS).items():
+            patterns[term.lower()] = ('intensifier', multiplier)
+        for term in (negators or NEGATORS):
+            patterns[term.lower()] = ('negator', -1.0)
+        for term, weight in (lexicon or LEXICON).items():
+            patterns[term.lower()] = ('term', weight)
+
+        self._automaton = _Automaton(patterns)
+
+    def _matches(self, text: str) -> List[tuple]:
+        """全部命中，重叠时取最左最长，英文要求完整单词"""
+        candidates = []
+        for start, end, pattern, payload in self._automaton.search(text):
+            if pattern.isascii() and pattern[0].isalnum():
+                before = text[start - 1] if start > 0 else ' '
+                after = text[end] if end < len(text) else ' '
+                if _is_word_char(before) or _is_word_char(after):
+                    continue
+            candidates.append((start, end, pattern, payload))
+
+        candidates.sort(key=lambda m: (m[0], -(m[1] - m[0])))
+        selected = []
+        last_end = 0
+        for match in candidates:
+            if match[0] >= last_end:
+                selected.append(match)
+                last_end = match[1]
+        return selected
+
+    def score(self, text: str, unique_terms: bool = False) -> Dict:
+        """
+        计算单段文本的情感分
+
+        Args:
+            text: 文本
+            unique_terms: 每个情感词只计一次（长文本中反复出现的词不重复加分）
+
+        Returns:
+            {
+                'score': 加权总分（正数积极，负数消极）,
+                'positive': 积极部分之和,
+                'negative': 消极部分之和（正数）,
+                'label': '积极' / '消极' / '中性',
+                'matches': [{'term', 'start', 'end', 'weight'}]
+            }
+        """
+        text = str(text or '')
+        lowered = text.lower()
+
+        positive = 0.0
+        negative = 0.0
+        matches = []
+        seen_terms = set()
+        modifier = 1.0
+        modifier_end = None
+
+        for start, end, pattern, (kind, value) in self._matches(lowered):
+            # 修饰词只作用于同一分句内、距离足够近的情感词
+            if modifier_end is not None and (
+                start - modifier_end > MODIFIER_WINDOW
+                or any(c in CLAUSE_BREAKS for c in lowered[modifier_end:start])
+            ):
+                modifier, modifier_end = 1.0, None
+
+            if kind == 'neutral':
+                continue
+
+            if kind != 'term':
+                modifier *= value
+                modifier_end = end
+                continue
+
+            weight = value * modifier
+            modifier, modifier_end = 1.0, None
+
+            if unique_terms:
+                if pattern in seen_terms:
+                    continue
+                seen_terms.add(pattern)
+
+            if weight > 0:
+                positive += weight
+            else:
+                negative -= weight
+            matches.append({'term': text[start:end], 'start': start, 'end': end, 'weight': round(weight, 3)})
+
+        total = positive - negative
+        if total > 0:
+            label = '积极'
+        elif total < 0:
+            label = '消极'
+        else:
+            label = '中性'
+
+        return {
+            'score': round(total, 3),
+            'positive': round(positive, 3),
+            'negative': round(negative, 3),
+            'label': label,
+            'matches': matches
+        }
+
+    def score_batch(self, texts: List[str], unique_terms: bool = False) -> List[Dict]:
+        """批量计算，返回与输入顺序一致的结果列表"""
+        return [self.score(text, unique_terms=unique_terms) for text in texts]
+
+
+_engine: Optional[SentimentEngine] = None
+_engine_lock = threading.Lock()
+
+
+def get_sentiment_engine() -> SentimentEngine:
+    """进程内共享的默认引擎（第一次使用时编译）"""
+    global _engine
+    if _engine is None:
+        with _engine_lock:
+            if _engine is None:
+                _engine = SentimentEngine()
+    return _engine
@@ -0,0 +1,84 @@
+# -*- coding: utf-8 -*-
+"""
+启动耗时记录
+记录模块导入和组件构建的耗时，用于分析冷启动和首个问题的延迟
+"""
+
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, List
+
+_process_start = time.time()
+_records: List[Dict] = []
+_lock = threading.Lock()
+
+
+def record(kind: str, name: str, seconds: float) -> None:
+    """
+    记录一次耗时
+    
+    Args:
+        kind: 'import'（模块导入）或 'construct'（组件构建）
+        name: 模块名或组件名
+        seconds: 耗时（秒）
+    """
+    with _lock:
+        _records.append({
+            'kind': kind,
+            'name': name,
+            'seconds': round(seconds, 4),
+            'at': round(time.time() - _process_start, 3)
+        })
+
+
+@contextmanager
+def timed(kind: str, name: str):
+    """计时上下文"""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        record(kind, name, time.perf_counter() - start)
+
+
+def get_report() -> Dict:
+    """
+    汇总启动耗时
+    
+    Returns:
+        {
+            'records': 按耗时降序排列的记录,
+            'import_seconds': 导入总耗时,
+            'construct_seconds': 构建总耗时,
+            'uptime_seconds': 进程已运行时间
+        }
+    """
+    with _lock:
+        records = sorted(_records, key=lambda r: r['seconds'], reverse=True)
+    
+    return {
+        'records': records,
+        'import_seconds': round(sum(r['seconds'] for r in records if r['kind'] == 'import'), 4),
+        'construct_seconds': round(sum(r['seconds'] for r in records if r['kind'] == 'construct'), 4),
+        'uptime_seconds': round(time.time() - _process_start, 3)
+    }
+
+
+def format_report() -> str:
+    """格式化为文本表格"""
+    report = get_report()
+    kind_names = {'import': '导入', 'construct': '构建'}
+    
+    lines = [
+        "🚀 启动耗时报告",
+        "━━━━━━━━━━━━━━━━━━━━━━━━━━━━",
+        f"  • 模块导入: {report['import_seconds']:.3f}秒",
+        f"  • 组件构建: {report['construct_seconds']:.3f}秒",
+        f"  • 已运行: {report['uptime_seconds']:.1f}秒",
+        ""
+    ]
+    for r in report['records']:
+        lines.append(f"  {kind_names.get(r['kind'], r['kind'])} {r['name']:<36} {r['seconds']*1000:>9.1f}ms")
+    
+    return "\n".join(lines)
@@ -0,0 +1,274 @@
+# -*- coding: utf-8 -*-
+"""
+请求级追踪（Span）
+
+一个请求对应一个 Trace，流程中的每个阶段是一个 Span，Span 可以嵌套：
+    request
+    ├── route
+    ├── agent:technical
+    │   ├── llm
+    │   └── tool:technical_indicators
+    │       └── upstream:yfinance.history  (cache=miss)
+    ├── judge
+    └── chart
+
+用法：
+    with start_trace(request_id) as trace:
+        with span("route"):
+            ...
+        annotate(cache="hit")   # 给当前 Span 加属性
+
+没有活动 Trace 时 span()/annotate() 都是空操作，开销可以忽略。
+
+环境变量：
+    BULLBEAR_TRACE_FILE    追踪结束后追加写入的文件路径（不设置则不导出）
+    BULLBEAR_TRACE_FORMAT  jsonl（默认，每行一个 Span）或 otlp（OpenTelemetry OTLP/JSON）
+"""
+
+import json
+import os
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Dict, List, Optional
+
+_current_trace: ContextVar[Optional["Trace"]] = ContextVar("bullbear_trace", default=None)
+_current_span: ContextVar[Optional["Span"]] = ContextVar("bullbear_span", default=None)
+
+
+class Span:
+    """一个计时区间"""
+    
+    def __init__(self, name: str, trace_id: str, parent_id: Optional[str] = None, attributes: Dict = None):
+        self.name = name
+        self.trace_id = trace_id
+        self.span_id = uuid.uuid4().hex[:16]
+        self.parent_id = parent_id
+        self.attributes = dict(attributes or {})
+        self.start_ns = time.time_ns()
+        self.end_ns: Optional[int] = None
+        self.status = "ok"
+    
+    def set_attribute(self, key: str, value: Any) -> None:
+        self.attributes[key] = value
+    
+    def set_attributes(self, **attributes) -> None:
+        self.attributes.update(attributes)
+    
+    def end(self) -> None:
+        if self.end_ns is None:
+            self.end_ns = time.time_ns()
+    
+    @property
+    def duration_ms(self) -> float:
+        end_ns = self.end_ns if self.end_ns is not None else time.time_ns()
+        return (end_ns - self.start_ns) / 1e6
+    
+    def to_dict(self) -> Dict:
+        return {
+            'name': self.name,
+            'trace_id': self.trace_id,
+            'span_id': self.span_id,
+            'parent_id': self.parent_id,
+            'start_ns': self.start_ns,
+            'end_ns': self.end_ns,
+            'duration_ms': round(self.duration_ms, 3),
+            'status': self.status,
+            'attributes': self.attributes
+        }
+
+
+class _NullSpan:
+    """没有活动 Trace 时使用的空 Span"""
+    
+    def set_attribute(self, key: str, value: Any) -> None:
+        pass
+    
+    def set_attributes(self, **attributes) -> None:
+        pass
+
+
+_NULL_SPAN = _NullSpan()
+
+
+class Trace:
+    """一个请求的全部 Span"""
+    
+    def __init__(self, request_id: Optional[str] = None):
+        self.request_id = request_id or uuid.uuid4().hex[:16]
+        self.trace_id = uuid.uuid4().hex
+        self.spans: List[Span] = []
+        self._lock = threading.Lock()
+    
+    def new_span(self, name: str, parent: Optional[Span], attributes: Dict = None) -> Span:
+        new = Span(name, self.trace_id, parent.span_id if parent else None, attributes)
+        new.set_attribute('request_id', self.request_id)
+        with self._lock:
+            self.spans.append(new)
+        return new
+    
+    def to_dicts(self) -> List[Dict]:
+        with self._lock:
+            return [s.to_dict() for s in self.spans]
+
+
+def current_trace() -> Optional[Trace]:
+    """当前上下文中的 Trace"""
+    return _current_trace.get()
+
+
+def current_span():
+    """当前上下文中的 Span（没有时返回空 Span）"""
+    return _current_span.get() or _NULL_SPAN
+
+
+@contextmanager
+def start_trace(request_id: Optional[str] = None, name: str = "request", **attributes):
+    """
+    开始一个请求级 Trace
+    
+    如果已经处于某个 Trace 中，则作为子 Span 继续使用外层 Trace。
+    """
+    outer = _current_trace.get()
+    if outer is not None:
+        with span(name, **attributes):
+            yield outer
+        return
+    
+    trace = Trace(request_id)
+    trace_token = _current_trace.set(trace)
+    root = trace.new_span(name, None, attributes)
+    span_token = _current_span.set(root)
+    try:
+        yield trace
+    except Exception as e:
+        root.status = "error"
+        root.set_attribute('error', str(e))
+        raise
+    finally:
+        root.end()
+        _current_span.reset(span_token)
+        _current_trace.reset(trace_token)
+        export_trace(trace)
+
+
+@contextmanager
+def span(name: str, **attributes):
+    """在当前 Trace 中创建子 Span"""
+    trace = _current_trace.get()
+    if trace is None:
+        yield _NULL_SPAN
+        return
+    
+    new = trace.new_span(name, _current_span.get(), attributes)
+    token = _current_span.set(new)
+    try:
+        yield new
+    except Exception as e:
+        new.status = "error"
+        new.set_attribute('error', str(e))
+        raise
+    finally:
+        new.end()
+        _current_span.reset(token)
+
+
+def annotate(**attributes) -> None:
+    """给当前 Span 添加属性"""
+    current_span().set_attributes(**attributes)
+
+
+# ========== 导出 ==========
+
+def export_trace(trace: Trace) -> None:
+    """根据环境变量把 Trace 追加写入文件"""
+    path = os.getenv("BULLBEAR_TRACE_FILE")
+    if not path:
+        return
+    
+    try:
+        if os.getenv("BULLBEAR_TRACE_FORMAT", "jsonl").lower() == "otlp":
+            export_otlp_json(trace, path)
+        else:
+            export_jsonl(trace, path)
+    except Exception as e:
+        print(f"[WARNING] 导出追踪数据失败: {e}")
+
+
+def export_jsonl(trace: Trace, path: str) -> None:
+    """每个 Span 一行 JSON"""
+    with open(path, 'a', encoding='utf-8') as f:
+        for item in trace.to_dicts():
+            f.write(json.dumps(item, ensure_ascii=False, default=str) + '\n')
+
+
+def _otlp_value(value: Any) -> Dict:
+    if isinstance(value, bool):
+        return {'boolValue': value}
+    if isinstance(value, int):
+        return {'intValue': str(value)}
+    if isinstance(value, float):
+        return {'doubleValue': value}
+    return {'stringValue': str(value)}
+
+
+def to_otlp(trace: Trace, service_name: str = "bullbearqa") -> Dict:
+    """转换为 OpenTelemetry OTLP/JSON（ExportTraceServiceRequest）格式"""
+    spans = []
+    for item in trace.to_dicts():
+        otlp_span = {
+            'traceId': item['trace_id'],
+            'spanId': item['span_id'],
+            'name': item['name'],
+            'kind': 1,  # SPAN_KIND_INTERNAL
+            'startTimeUnixNano': str(item['start_ns']),
+            'endTimeUnixNano': str(item['end_ns'] or item['start_ns']),
+            'attributes': [
+                {'key': k, 'value': _otlp_value(v)} for k, v in item['attributes'].items()
+            ],
+            'status': {'code': 2 if item['status'] == 'error' else 1}
+        }
+        if item['parent_id']:
+            otlp_span['parentSpanId'] = item['parent_id']
+        spans.append(otlp_span)
+    
+    return {
+        'resourceSpans': [{
+            'resource': {
+                'attributes': [{'key': 'service.name', 'value': {'stringValue': service_name}}]
+            },
+            'scopeSpans': [{
+                'scope': {'name': 'bullbearqa.tracing'},
+                'spans': spans
+            }]
+        }]
+    }
+
+
+def export_otlp_json(trace: Trace, path: str) -> None:
+    """每个 Trace 一行 OTLP/JSON（可被 OpenTelemetry Collector 的 file receiver 读取）"""
+    with open(path, 'a', encoding='utf-8') as f:
+        f.write(json.dumps(to_otlp(trace), ensure_ascii=False) + '\n')
+
+
+# ========== LangChain 回调 ==========
+
+_handler = None
+_handler_lock = threading.Lock()
+
+
+def get_tracing_handler():
+    """
+    全局共享的 LangChain 回调（没有活动 Trace 时不做任何事）
+    
+    回调类依赖 langchain_core，第一次需要时才导入，避免拖慢冷启动。
+    """
+    global _handler
+    if _handler is None:
+        with _handler_lock:
+            if _handler is None:
+                from utils.tracing_callbacks import TracingCallbackHandler
+                _handler = TracingCallbackHandler()
+    return _handler
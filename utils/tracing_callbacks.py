@@ -0,0 +1,81 @@
+# -*- coding: utf-8 -*-
+"""
+追踪的 LangChain 回调
+把 LLM 调用和工具调用记录为 utils.tracing 中的 Span
+"""
+
+from typing import Any, Dict, Optional
+
+from langchain_core.callbacks import BaseCallbackHandler
+
+from utils.tracing import Span, _current_span, _current_trace
+
+
+class TracingCallbackHandler(BaseCallbackHandler):
+    """
+    把 LLM 调用和工具调用记录为 Span
+    
+    LLM Span 属性：模型名、输入/输出 token 数、首 token 耗时（非流式调用时等于总耗时）。
+    工具 Span 会成为当前 Span，工具内部的缓存命中和上游调用会嵌套在它下面。
+    """
+    
+    def __init__(self):
+        self._spans: Dict[Any, tuple] = {}
+    
+    def _open(self, run_id, name: str, **attributes) -> None:
+        trace = _current_trace.get()
+        if trace is None:
+            return
+        parent = _current_span.get()
+        new = trace.new_span(name, parent, attributes)
+        self._spans[run_id] = (new, parent)
+        _current_span.set(new)
+    
+    def _close(self, run_id, error: Optional[BaseException] = None) -> Optional[Span]:
+        entry = self._spans.pop(run_id, None)
+        if entry is None:
+            return None
+        closed, parent = entry
+        if error is not None:
+            closed.status = "error"
+            closed.set_attribute('error', str(error))
+        closed.end()
+        _current_span.set(parent)
+        return closed
+    
+    def on_chat_model_start(self, serialized, messages, *, run_id, **kwargs) -> None:
+        model = (kwargs.get('invocation_params') or {}).get('model_name') or (kwargs.get('invocation_params') or {}).get('model')
+        self._open(run_id, "llm", model=model or 'unknown')
+    
+    def on_llm_start(self, serialized, prompts, *, run_id, **kwargs) -> None:
+        self._open(run_id, "llm", model=(kwargs.get('invocation_params') or {}).get('model_name', 'unknown'))
+    
+    def on_llm_new_token(self, token: str, *, run_id, **kwargs) -> None:
+        entry = self._spans.get(run_id)
+        if entry and 'time_to_first_token_ms' not in entry[0].attributes:
+            entry[0].set_attribute('time_to_first_token_ms', round(entry[0].duration_ms, 3))
+    
+    def on_llm_end(self, response, *, run_id, **kwargs) -> None:
+        entry = self._spans.get(run_id)
+        if entry:
+            llm_span = entry[0]
+            usage = (response.llm_output or {}).get('token_usage') or {}
+            llm_span.set_attributes(
+                tokens_in=usage.get('prompt_tokens', 0),
+                tokens_out=usage.get('completion_tokens', 0)
+            )
+            if 'time_to_first_token_ms' not in llm_span.attributes:
+                llm_span.set_attributes(time_to_first_token_ms=round(llm_span.duration_ms, 3), streaming=False)
+        self._close(run_id)
+    
+    def on_llm_error(self, error, *, run_id, **kwargs) -> None:
+        self._close(run_id, error)
+    
+    def on_tool_start(self, serialized, input_str, *, run_id, **kwargs) -> None:
+        self._open(run_id, f"tool:{(serialized or {}).get('name', 'unknown')}", input=str(input_str)[:100])
+    
+    def on_tool_end(self, output, *, run_id, **kwargs) -> None:
+        self._close(run_id)
+    
+    def on_tool_error(self, error, *, run_id, **kwargs) -> None:
+        self._close(run_id, error)
@@ -3,5 +3,6 @@
 """
 
 from .candlestick_chart import CandlestickChart
+from .trace_waterfall import create_trace_waterfall
 
-__all__ = ['CandlestickChart']
+__all__ = ['CandlestickChart', 'create_trace_waterfall']
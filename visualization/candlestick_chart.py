@@ -3,15 +3,38 @@ K线图可视化模块
 提供交互式股价图表、对比图表等功能
 """
 
-import plotly.graph_objects as go
-from plotly.subplots import make_subplots
-import yfinance as yf
+from __future__ import annotations
+
 from datetime import datetime, timedelta
-import pandas as pd
+from data.market_data import get_aligned_closes
+from utils.lazy_import import lazy_module
+from utils.tracing import span
+
+# 重量级依赖在第一次画图时才导入
+go = lazy_module("plotly.graph_objects")
+plotly_subplots = lazy_module("plotly.subplots")
+yf = lazy_module("yfinance")
+pd = lazy_module("pandas")
 
 class CandlestickChart:
     """交互式K线图生成器"""
     
+    # 时间周期从短到长排列（用于选出需要下载的最长周期）
+    PERIOD_ORDER = ["1d", "5d", "1mo", "3mo", "6mo", "ytd", "1y", "2y", "5y", "10y", "max"]
+    
+    # 各时间周期对应的回溯跨度（pd.DateOffset 参数，用于从同一份数据中截取图表区间）
+    PERIOD_OFFSETS = {
+        "1d": {'days': 1},
+        "5d": {'days': 5},
+        "1mo": {'months': 1},
+        "3mo": {'months': 3},
+        "6mo": {'months': 6},
+        "1y": {'years': 1},
+        "2y": {'years': 2},
+        "5y": {'years': 5},
+        "10y": {'years': 10}
+    }
+    
     def __init__(self):
         self.colors = {
             'background': '#0e1117',
@@ -47,109 +70,187 @@ class CandlestickChart:
             # 计算技术指标
             df = self._calculate_indicators(df)
             
-            # 创建子图（K线图 + 成交量）
-            fig = make_subplots(
-                rows=2, cols=1,
-                shared_xaxes=True,
-                vertical_spacing=0.03,
-                row_heights=[0.7, 0.3],
-                subplot_titles=(f'{ticker} 股价走势', '成交量')
-            )
-            
-            # 1. 添加K线图
-            fig.add_trace(
-                go.Candlestick(
-                    x=df.index,
-                    open=df['Open'],
-                    high=df['High'],
-                    low=df['Low'],
-                    close=df['Close'],
-                    name=ticker,
-                    increasing_line_color=self.colors['up'],
-                    decreasing_line_color=self.colors['down']
-                ),
-                row=1, col=1
-            )
-            
-            # 2. 添加20日均线
-            fig.add_trace(
-                go.Scatter(
-                    x=df.index,
-                    y=df['MA20'],
-                    name='MA20',
-                    line=dict(color=self.colors['ma20'], width=1.5),
-                    opacity=0.8
-                ),
-                row=1, col=1
-            )
-            
-            # 3. 添加50日均线
-            fig.add_trace(
-                go.Scatter(
-                    x=df.index,
-                    y=df['MA50'],
-                    name='MA50',
-                    line=dict(color=self.colors['ma50'], width=1.5),
-                    opacity=0.8
-                ),
-                row=1, col=1
-            )
-            
-            # 4. 添加成交量柱状图
-            colors = [self.colors['up'] if row['Close'] >= row['Open'] 
-                     else self.colors['down'] for _, row in df.iterrows()]
-            
-            fig.add_trace(
-                go.Bar(
-                    x=df.index,
-                    y=df['Volume'],
-                    name='Volume',
-                    marker_color=colors,
-                    opacity=0.5
-                ),
-                row=2, col=1
-            )
-            
-            # 5. 布局设置
-            fig.update_layout(
-                title={
-                    'text': f'<b>{ticker}</b> - 股价走势分析',
-                    'font': {'size': 24, 'color': 'white'}
-                },
-                template='plotly_dark',
-                height=700,
-                xaxis_rangeslider_visible=False,
-                hovermode='x unified',
-                showlegend=True,
-                legend=dict(
-                    orientation="h",
-                    yanchor="bottom",
-                    y=1.02,
-                    xanchor="right",
-                    x=1,
-                    bgcolor='rgba(0,0,0,0.5)'
-                ),
-                plot_bgcolor=self.colors['background'],
-                paper_bgcolor=self.colors['background']
-            )
-            
-            # 6. Y轴设置
-            fig.update_yaxes(title_text="价格 (USD)", row=1, col=1)
-            fig.update_yaxes(title_text="成交量", row=2, col=1)
-            
-            # 7. X轴设置
-            fig.update_xaxes(
-                title_text="日期",
-                row=2, col=1,
-                gridcolor=self.colors['grid']
-            )
-            
-            return fig
+            return self._build_candlestick_figure(ticker, df)
             
         except Exception as e:
             print(f"[ERROR] 生成K线图失败: {str(e)}")
             return None
     
+    def get_chart_bundle(self, ticker: str, period: str = "3mo") -> dict:
+        """
+        一次下载，同时生成K线图、价格变动和52周区间
+        
+        只下载一次所需的最长历史（至少1年，保证52周区间准确），
+        K线图、涨跌幅和52周高低点都从同一份内存数据中计算。
+        
+        Args:
+            ticker: 股票代码
+            period: K线图显示的时间周期
+        
+        Returns:
+            {
+                'figure': plotly Figure 或 None,
+                'price_info': 价格信息字典 或 None（格式同 get_price_change）
+            }
+            数据获取失败时返回 None
+        """
+        try:
+            with span("chart:candlestick", ticker=ticker, period=period):
+                fetch_period = self._longest_period(period, "1y")
+                with span("upstream:yfinance.history", ticker=ticker, period=fetch_period):
+                    stock = yf.Ticker(ticker)
+                    df = stock.history(period=fetch_period)
+                
+                if df.empty:
+                    print(f"[ERROR] 无法获取 {ticker} 的数据")
+                    return None
+                
+                # 均线在完整数据上计算，截取后图表起点的MA50也是有效值
+                df = self._calculate_indicators(df)
+                chart_df = self._slice_period(df, period)
+                
+                return {
+                    'figure': self._build_candlestick_figure(ticker, chart_df),
+                    'price_info': self._compute_price_info(df)
+                }
+            
+        except Exception as e:
+            print(f"[ERROR] 生成K线图数据包失败: {str(e)}")
+            return None
+    
+    def _longest_period(self, *periods: str) -> str:
+        """返回给定周期中最长的一个"""
+        known = [p for p in periods if p in self.PERIOD_ORDER]
+        if not known:
+            return periods[0]
+        return max(known, key=self.PERIOD_ORDER.index)
+    
+    def _slice_period(self, df: pd.DataFrame, period: str) -> pd.DataFrame:
+        """从较长的历史数据中截取指定周期"""
+        if df.empty:
+            return df
+        
+        last_date = df.index[-1]
+        if period == "ytd":
+            start = last_date.replace(month=1, day=1, hour=0, minute=0, second=0, microsecond=0)
+        elif period in self.PERIOD_OFFSETS:
+            start = last_date - pd.DateOffset(**self.PERIOD_OFFSETS[period])
+        else:
+            # max 或未知周期：使用全部数据
+            return df
+        
+        return df[df.index >= start]
+    
+    def _build_candlestick_figure(self, ticker: str, df: pd.DataFrame):
+        """
+        根据已计算均线的数据绘制K线图
+        
+        Args:
+            ticker: 股票代码
+            df: 包含 OHLCV 以及 MA20/MA50 的DataFrame
+        
+        Returns:
+            plotly.graph_objects.Figure
+        """
+        # 创建子图（K线图 + 成交量）
+        fig = plotly_subplots.make_subplots(
+            rows=2, cols=1,
+            shared_xaxes=True,
+            vertical_spacing=0.03,
+            row_heights=[0.7, 0.3],
+            subplot_titles=(f'{ticker} 股价走势', '成交量')
+        )
+        
+        # 1. 添加K线图
+        fig.add_trace(
+            go.Candlestick(
+                x=df.index,
+                open=df['Open'],
+                high=df['High'],
+                low=df['Low'],
+                close=df['Close'],
+                name=ticker,
+                increasing_line_color=self.colors['up'],
+                decreasing_line_color=self.colors['down']
+            ),
+            row=1, col=1
+        )
+        
+        # 2. 添加20日均线
+        fig.add_trace(
+            go.Scatter(
+                x=df.index,
+                y=df['MA20'],
+                name='MA20',
+                line=dict(color=self.colors['ma20'], width=1.5),
+                opacity=0.8
+            ),
+            row=1, col=1
+        )
+        
+        # 3. 添加50日均线
+        fig.add_trace(
+            go.Scatter(
+                x=df.index,
+                y=df['MA50'],
+                name='MA50',
+                line=dict(color=self.colors['ma50'], width=1.5),
+                opacity=0.8
+            ),
+            row=1, col=1
+        )
+        
+        # 4. 添加成交量柱状图
+        colors = [self.colors['up'] if close >= open_ else self.colors['down']
+                  for open_, close in zip(df['Open'], df['Close'])]
+        
+        fig.add_trace(
+            go.Bar(
+                x=df.index,
+                y=df['Volume'],
+                name='Volume',
+                marker_color=colors,
+                opacity=0.5
+            ),
+            row=2, col=1
+        )
+        
+        # 5. 布局设置
+        fig.update_layout(
+            title={
+                'text': f'<b>{ticker}</b> - 股价走势分析',
+                'font': {'size': 24, 'color': 'white'}
+            },
+            template='plotly_dark',
+            height=700,
+            xaxis_rangeslider_visible=False,
+            hovermode='x unified',
+            showlegend=True,
+            legend=dict(
+                orientation="h",
+                yanchor="bottom",
+                y=1.02,
+                xanchor="right",
+                x=1,
+                bgcolor='rgba(0,0,0,0.5)'
+            ),
+            plot_bgcolor=self.colors['background'],
+            paper_bgcolor=self.colors['background']
+        )
+        
+        # 6. Y轴设置
+        fig.update_yaxes(title_text="价格 (USD)", row=1, col=1)
+        fig.update_yaxes(title_text="成交量", row=2, col=1)
+        
+        # 7. X轴设置
+        fig.update_xaxes(
+            title_text="日期",
+            row=2, col=1,
+            gridcolor=self.colors['grid']
+        )
+        
+        return fig
+    
     def create_comparison_chart(self, tickers: list, period: str = "1y"):
         """
         生成多股票对比图（归一化）
@@ -161,68 +262,132 @@ class CandlestickChart:
         Returns:
             plotly.graph_objects.Figure 或 None
         """
+        bundle = self.get_comparison_bundle(tickers, period)
+        return bundle['figure'] if bundle else None
+    
+    def get_comparison_bundle(self, tickers: list, period: str = "1y") -> dict:
+        """
+        一次批量下载，同时生成对比图和价格指标
+        
+        所有股票的收盘价对齐到同一个 日期 × 股票 矩阵，
+        归一化、相对表现和价格指标都基于这个矩阵向量化计算。
+        
+        Args:
+            tickers: 股票代码列表
+            period: 时间周期
+        
+        Returns:
+            {
+                'figure': plotly Figure,
+                'metrics': {ticker: {'current_price', 'change', 'change_pct',
+                                     'total_return_pct', 'relative_pct'}},
+                'closes': 对齐后的收盘价矩阵
+            }
+            数据获取失败时返回 None
+        """
         try:
-            fig = go.Figure()
-            
-            # 预定义颜色
-            colors = ['#00d4ff', '#ff6b6b', '#4ecdc4', '#ffe66d', '#a8dadc']
-            
-            for i, ticker in enumerate(tickers):
-                stock = yf.Ticker(ticker)
-                df = stock.history(period=period)
+            with span("chart:comparison", tickers=",".join(tickers), period=period):
+                with span("upstream:yfinance.download", tickers=",".join(tickers), period=period):
+                    closes = get_aligned_closes(tickers, period)
                 
-                if not df.empty:
-                    # 归一化（以第一天为基准100）
-                    normalized = (df['Close'] / df['Close'].iloc[0]) * 100
-                    
-                    fig.add_trace(go.Scatter(
-                        x=df.index,
-                        y=normalized,
-                        name=ticker,
-                        mode='lines',
-                        line=dict(width=2.5, color=colors[i % len(colors)]),
-                        hovertemplate=f'<b>{ticker}</b><br>日期: %{{x}}<br>涨跌: %{{y:.2f}}%<extra></extra>'
-                    ))
-            
-            # 添加基准线（100%）
-            if fig.data:
-                x_range = [fig.data[0].x[0], fig.data[0].x[-1]]
-                fig.add_trace(go.Scatter(
-                    x=x_range,
-                    y=[100, 100],
-                    name='基准线',
-                    line=dict(color='gray', width=1, dash='dash'),
-                    showlegend=False
-                ))
-            
-            fig.update_layout(
-                title={
-                    'text': '<b>股票走势对比</b>（归一化）',
-                    'font': {'size': 20, 'color': 'white'}
-                },
-                yaxis_title='相对涨跌幅 (%)',
-                xaxis_title='日期',
-                template='plotly_dark',
-                height=550,
-                hovermode='x unified',
-                legend=dict(
-                    orientation="v",
-                    yanchor="top",
-                    y=0.99,
-                    xanchor="left",
-                    x=0.01,
-                    bgcolor='rgba(0,0,0,0.5)'
-                ),
-                plot_bgcolor=self.colors['background'],
-                paper_bgcolor=self.colors['background']
-            )
-            
-            return fig
+                if closes.empty or len(closes) < 2:
+                    print(f"[ERROR] 无法获取对比数据: {', '.join(tickers)}")
+                    return None
+                
+                # 归一化（以共同基准日为100）
+                normalized = closes.div(closes.iloc[0]) * 100
+                # 相对表现：相对于等权平均的超额涨跌幅
+                relative = normalized.sub(normalized.mean(axis=1), axis=0)
+                
+                return {
+                    'figure': self._build_comparison_figure(normalized, relative),
+                    'metrics': self._compute_comparison_metrics(closes, normalized, relative),
+                    'closes': closes
+                }
             
         except Exception as e:
             print(f"[ERROR] 生成对比图失败: {str(e)}")
             return None
     
+    def _compute_comparison_metrics(
+        self,
+        closes: pd.DataFrame,
+        normalized: pd.DataFrame,
+        relative: pd.DataFrame
+    ) -> dict:
+        """基于对齐矩阵计算每只股票的价格指标"""
+        current = closes.iloc[-1]
+        previous = closes.iloc[-2]
+        change = current - previous
+        change_pct = change / previous * 100
+        total_return = normalized.iloc[-1] - 100
+        relative_last = relative.iloc[-1]
+        
+        return {
+            ticker: {
+                'current_price': current[ticker],
+                'change': change[ticker],
+                'change_pct': change_pct[ticker],
+                'total_return_pct': total_return[ticker],
+                'relative_pct': relative_last[ticker]
+            }
+            for ticker in closes.columns
+        }
+    
+    def _build_comparison_figure(self, normalized: pd.DataFrame, relative: pd.DataFrame):
+        """根据归一化矩阵绘制对比图"""
+        fig = go.Figure()
+        
+        # 预定义颜色
+        colors = ['#00d4ff', '#ff6b6b', '#4ecdc4', '#ffe66d', '#a8dadc']
+        
+        for i, ticker in enumerate(normalized.columns):
+            fig.add_trace(go.Scatter(
+                x=normalized.index,
+                y=normalized[ticker],
+                customdata=relative[ticker],
+                name=ticker,
+                mode='lines',
+                line=dict(width=2.5, color=colors[i % len(colors)]),
+                hovertemplate=(
+                    f'<b>{ticker}</b><br>日期: %{{x}}<br>相对基准: %{{y:.2f}}%'
+                    '<br>相对均值: %{customdata:+.2f}%<extra></extra>'
+                )
+            ))
+        
+        # 添加基准线（100%），覆盖对齐后的完整日期区间
+        fig.add_trace(go.Scatter(
+            x=[normalized.index[0], normalized.index[-1]],
+            y=[100, 100],
+            name='基准线',
+            line=dict(color='gray', width=1, dash='dash'),
+            showlegend=False
+        ))
+        
+        fig.update_layout(
+            title={
+                'text': '<b>股票走势对比</b>（归一化）',
+                'font': {'size': 20, 'color': 'white'}
+            },
+            yaxis_title='相对涨跌幅 (%)',
+            xaxis_title='日期',
+            template='plotly_dark',
+            height=550,
+            hovermode='x unified',
+            legend=dict(
+                orientation="v",
+                yanchor="top",
+                y=0.99,
+                xanchor="left",
+                x=0.01,
+                bgcolor='rgba(0,0,0,0.5)'
+            ),
+            plot_bgcolor=self.colors['background'],
+            paper_bgcolor=self.colors['background']
+        )
+        
+        return fig
+    
     def create_mini_chart(self, ticker: str, period: str = "1mo"):
         """
         生成简化版K线图（用于侧边栏或小卡片）
@@ -303,25 +468,40 @@ class CandlestickChart:
         """
         try:
             stock = yf.Ticker(ticker)
-            df = stock.history(period="5d")
-            
-            if df.empty or len(df) < 2:
-                return None
-            
-            current_price = df['Close'].iloc[-1]
-            previous_close = df['Close'].iloc[-2]
-            change = current_price - previous_close
-            change_pct = (change / previous_close) * 100
-            
-            return {
-                'current_price': current_price,
-                'previous_close': previous_close,
-                'change': change,
-                'change_pct': change_pct,
-                'high_52w': df['High'].max(),
-                'low_52w': df['Low'].min()
-            }
+            # 52周区间需要一整年的数据
+            df = stock.history(period="1y")
+            return self._compute_price_info(df)
             
         except Exception as e:
             print(f"[ERROR] 获取价格失败: {str(e)}")
             return None
+    
+    def _compute_price_info(self, df: pd.DataFrame) -> dict:
+        """
+        从历史数据计算价格变动和52周区间
+        
+        Args:
+            df: 股票历史数据（应至少覆盖最近一年）
+        
+        Returns:
+            包含价格信息的字典，数据不足时返回 None
+        """
+        if df is None or df.empty or len(df) < 2:
+            return None
+        
+        current_price = df['Close'].iloc[-1]
+        previous_close = df['Close'].iloc[-2]
+        change = current_price - previous_close
+        change_pct = (change / previous_close) * 100
+        
+        # 只取最近52周计算区间
+        last_52w = df[df.index >= df.index[-1] - pd.DateOffset(weeks=52)]
+        
+        return {
+            'current_price': current_price,
+            'previous_close': previous_close,
+            'change': change,
+            'change_pct': change_pct,
+            'high_52w': last_52w['High'].max(),
+            'low_52w': last_52w['Low'].min()
+        }
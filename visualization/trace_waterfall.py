@@ -0,0 +1,87 @@
+"""
+追踪瀑布图
+把一次请求的 Span 画成按时间排列的横向条形图，直观显示耗时分布
+"""
+
+from typing import Dict, List
+
+from utils.lazy_import import lazy_module
+
+go = lazy_module("plotly.graph_objects")
+
+# 按 Span 名称前缀着色
+SPAN_COLORS = {
+    'llm': '#ab47bc',
+    'tool': '#26a69a',
+    'upstream': '#ffa726',
+    'agent': '#42a5f5',
+    'chart': '#8d6e63',
+    'judge': '#ef5350'
+}
+DEFAULT_COLOR = '#78909c'
+
+
+def _span_depths(spans: List[Dict]) -> Dict[str, int]:
+    """计算每个 Span 的嵌套深度（用于缩进显示）"""
+    parents = {s['span_id']: s['parent_id'] for s in spans}
+    depths = {}
+    for span_id in parents:
+        depth, parent = 0, parents[span_id]
+        while parent in parents:
+            depth += 1
+            parent = parents[parent]
+        depths[span_id] = depth
+    return depths
+
+
+def create_trace_waterfall(spans: List[Dict]):
+    """
+    生成瀑布图
+    
+    Args:
+        spans: Trace.to_dicts() 的结果
+    
+    Returns:
+        plotly.graph_objects.Figure 或 None（没有数据时）
+    """
+    if not spans:
+        return None
+    
+    spans = sorted(spans, key=lambda s: s['start_ns'])
+    origin = spans[0]['start_ns']
+    depths = _span_depths(spans)
+    
+    labels, starts, durations, colors, hover = [], [], [], [], []
+    for i, s in enumerate(spans):
+        label = "　" * depths[s['span_id']] + s['name']
+        # 同名 Span 用序号区分，避免纵轴合并
+        labels.append(f"{label} #{i}")
+        starts.append((s['start_ns'] - origin) / 1e6)
+        durations.append(s['duration_ms'])
+        colors.append(SPAN_COLORS.get(s['name'].split(':')[0], DEFAULT_COLOR))
+        attrs = "<br>".join(
+            f"{k}: {v}" for k, v in s['attributes'].items() if k != 'request_id'
+        )
+        hover.append(f"<b>{s['name']}</b><br>{s['duration_ms']:.1f} ms<br>{attrs}")
+    
+    fig = go.Figure(go.Bar(
+        y=labels,
+        x=durations,
+        base=starts,
+        orientation='h',
+        marker_color=colors,
+        hovertext=hover,
+        hoverinfo='text'
+    ))
+    
+    fig.update_layout(
+        template='plotly_dark',
+        height=max(200, 24 * len(spans) + 60),
+        margin=dict(l=0, r=0, t=30, b=0),
+        showlegend=False,
+        xaxis_title='毫秒',
+        yaxis=dict(autorange='reversed', showticklabels=True, tickfont=dict(size=10)),
+        title={'text': f"请求 {spans[0]['attributes'].get('request_id', '')}", 'font': {'size': 12}}
+    )
+    
+    return fig